@@ -0,0 +1,33 @@
+"""unique valuation key for bulk upserts
+
+Revision ID: 0002_valuation_upsert_key
+Revises: 0001_initial
+Create Date: 2024-02-01 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "0002_valuation_upsert_key"
+down_revision = "0001_initial"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM valuations
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM valuations
+            GROUP BY account_id, COALESCE(instrument_id, 0), valuation_date
+        )
+        """
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX uq_valuations_account_instrument_date "
+        "ON valuations (account_id, COALESCE(instrument_id, 0), valuation_date)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_valuations_account_instrument_date", table_name="valuations")
@@ -0,0 +1,43 @@
+"""indexes for portfolio read paths
+
+Revision ID: 0003_read_path_indexes
+Revises: 0002_valuation_upsert_key
+Create Date: 2024-02-15 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "0003_read_path_indexes"
+down_revision = "0002_valuation_upsert_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_valuations_date_instrument_value",
+        "valuations",
+        ["valuation_date", "instrument_id", "value_jpy"],
+    )
+    op.create_index(
+        "ix_instrument_classifications_instrument_node",
+        "instrument_classifications",
+        ["instrument_id", "taxonomy_node_id"],
+    )
+    op.create_index(
+        "ix_instrument_classifications_node_instrument",
+        "instrument_classifications",
+        ["taxonomy_node_id", "instrument_id"],
+    )
+    op.create_index("ix_taxonomy_nodes_taxonomy", "taxonomy_nodes", ["taxonomy_id"])
+    op.create_index("ix_target_allocations_taxonomy", "target_allocations", ["taxonomy_id"])
+    op.create_index("ix_prices_instrument_date", "prices", ["instrument_id", "price_date"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_prices_instrument_date", table_name="prices")
+    op.drop_index("ix_target_allocations_taxonomy", table_name="target_allocations")
+    op.drop_index("ix_taxonomy_nodes_taxonomy", table_name="taxonomy_nodes")
+    op.drop_index("ix_instrument_classifications_node_instrument", table_name="instrument_classifications")
+    op.drop_index("ix_instrument_classifications_instrument_node", table_name="instrument_classifications")
+    op.drop_index("ix_valuations_date_instrument_value", table_name="valuations")
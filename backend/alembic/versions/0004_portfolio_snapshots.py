@@ -0,0 +1,48 @@
+"""daily portfolio snapshot rollups
+
+Revision ID: 0004_portfolio_snapshots
+Revises: 0003_read_path_indexes
+Create Date: 2024-03-01 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_portfolio_snapshots"
+down_revision = "0003_read_path_indexes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "portfolio_snapshots",
+        sa.Column("snapshot_date", sa.Date(), primary_key=True),
+        sa.Column("taxonomy_node_id", sa.Integer(), sa.ForeignKey("taxonomy_nodes.id"), primary_key=True),
+        sa.Column("value_jpy", sa.Float(), nullable=False),
+    )
+    op.create_table(
+        "portfolio_snapshot_totals",
+        sa.Column("snapshot_date", sa.Date(), primary_key=True),
+        sa.Column("total_value_jpy", sa.Float(), nullable=False),
+    )
+    op.execute(
+        """
+        INSERT INTO portfolio_snapshots (snapshot_date, taxonomy_node_id, value_jpy)
+        SELECT v.valuation_date, c.taxonomy_node_id, SUM(v.value_jpy)
+        FROM valuations v
+        JOIN instrument_classifications c ON c.instrument_id = v.instrument_id
+        GROUP BY v.valuation_date, c.taxonomy_node_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO portfolio_snapshot_totals (snapshot_date, total_value_jpy)
+        SELECT valuation_date, SUM(value_jpy) FROM valuations GROUP BY valuation_date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("portfolio_snapshot_totals")
+    op.drop_table("portfolio_snapshots")
@@ -0,0 +1,45 @@
+"""closure table over taxonomy nodes
+
+Revision ID: 0005_taxonomy_node_paths
+Revises: 0004_portfolio_snapshots
+Create Date: 2024-03-15 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_taxonomy_node_paths"
+down_revision = "0004_portfolio_snapshots"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "taxonomy_node_paths",
+        sa.Column("ancestor_id", sa.Integer(), sa.ForeignKey("taxonomy_nodes.id"), primary_key=True),
+        sa.Column("descendant_id", sa.Integer(), sa.ForeignKey("taxonomy_nodes.id"), primary_key=True),
+        sa.Column("depth", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "ix_taxonomy_node_paths_descendant",
+        "taxonomy_node_paths",
+        ["descendant_id", "ancestor_id", "depth"],
+    )
+    op.execute(
+        """
+        WITH RECURSIVE paths (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM taxonomy_nodes
+            UNION ALL
+            SELECT paths.ancestor_id, taxonomy_nodes.id, paths.depth + 1
+            FROM taxonomy_nodes JOIN paths ON taxonomy_nodes.parent_id = paths.descendant_id
+        )
+        INSERT INTO taxonomy_node_paths (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM paths
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_taxonomy_node_paths_descendant", table_name="taxonomy_node_paths")
+    op.drop_table("taxonomy_node_paths")
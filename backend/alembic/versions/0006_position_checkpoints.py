@@ -0,0 +1,44 @@
+"""ledger checkpoints per account, instrument and date
+
+Revision ID: 0006_position_checkpoints
+Revises: 0005_taxonomy_node_paths
+Create Date: 2024-04-01 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_position_checkpoints"
+down_revision = "0005_taxonomy_node_paths"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "position_checkpoints",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("accounts.id"), nullable=False),
+        sa.Column("instrument_id", sa.Integer(), sa.ForeignKey("instruments.id"), nullable=False),
+        sa.Column("checkpoint_date", sa.Date(), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("cost_basis_jpy", sa.Float(), nullable=False),
+        sa.Column("last_transaction_id", sa.Integer(), nullable=False),
+    )
+    op.create_index(
+        "uq_position_checkpoints_account_instrument_date",
+        "position_checkpoints",
+        ["account_id", "instrument_id", "checkpoint_date"],
+        unique=True,
+    )
+    op.create_index(
+        "ix_transactions_account_instrument_date",
+        "transactions",
+        ["account_id", "instrument_id", "transaction_date"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_account_instrument_date", table_name="transactions")
+    op.drop_index("uq_position_checkpoints_account_instrument_date", table_name="position_checkpoints")
+    op.drop_table("position_checkpoints")
@@ -0,0 +1,25 @@
+"""index for cash-flow lookups by type and date
+
+Revision ID: 0007_transaction_flow_index
+Revises: 0006_position_checkpoints
+Create Date: 2024-04-15 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "0007_transaction_flow_index"
+down_revision = "0006_position_checkpoints"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_transactions_type_date",
+        "transactions",
+        ["transaction_type", "transaction_date", "amount_jpy"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_type_date", table_name="transactions")
@@ -0,0 +1,30 @@
+"""daily FX rates for converting non-JPY prices
+
+Revision ID: 0008_fx_rates
+Revises: 0007_transaction_flow_index
+Create Date: 2024-04-22 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_fx_rates"
+down_revision = "0007_transaction_flow_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fx_rates",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("currency", sa.String(), nullable=False),
+        sa.Column("rate_date", sa.Date(), nullable=False),
+        sa.Column("rate_jpy", sa.Float(), nullable=False),
+    )
+    op.create_index("uq_fx_rates_currency_date", "fx_rates", ["currency", "rate_date"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uq_fx_rates_currency_date", table_name="fx_rates")
+    op.drop_table("fx_rates")
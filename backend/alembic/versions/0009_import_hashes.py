@@ -0,0 +1,28 @@
+"""dedup hashes for rows written by statement imports
+
+Revision ID: 0009_import_hashes
+Revises: 0008_fx_rates
+Create Date: 2024-05-01 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_import_hashes"
+down_revision = "0008_fx_rates"
+branch_labels = None
+depends_on = None
+
+TABLES = ("transactions", "valuations", "prices")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column("import_hash", sa.String(), nullable=True))
+        op.create_index(f"uq_{table}_import_hash", table, ["import_hash"], unique=True)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"uq_{table}_import_hash", table_name=table)
+        op.drop_column(table, "import_hash")
@@ -0,0 +1,32 @@
+"""one price per instrument and date
+
+Revision ID: 0011_price_upsert_key
+Revises: 0010_jobs
+Create Date: 2024-05-20 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "0011_price_upsert_key"
+down_revision = "0010_jobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        DELETE FROM prices
+        WHERE id NOT IN (
+            SELECT MAX(id) FROM prices
+            GROUP BY instrument_id, price_date
+        )
+        """
+    )
+    op.drop_index("ix_prices_instrument_date", table_name="prices")
+    op.create_index("uq_prices_instrument_date", "prices", ["instrument_id", "price_date"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uq_prices_instrument_date", table_name="prices")
+    op.create_index("ix_prices_instrument_date", "prices", ["instrument_id", "price_date"])
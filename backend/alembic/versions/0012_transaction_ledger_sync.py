@@ -0,0 +1,41 @@
+"""per-transaction ledger sync flag
+
+Revision ID: 0012_transaction_ledger_sync
+Revises: 0011_price_upsert_key
+Create Date: 2024-05-27 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_transaction_ledger_sync"
+down_revision = "0011_price_upsert_key"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "transactions",
+        sa.Column("ledger_synced", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+    # Rows up to the old global watermark count as replayed; anything above it
+    # is picked up by the next sync.
+    op.execute(
+        """
+        UPDATE transactions SET ledger_synced = TRUE
+        WHERE id <= (SELECT COALESCE(MAX(last_transaction_id), 0) FROM position_checkpoints)
+        """
+    )
+    op.create_index(
+        "ix_transactions_ledger_pending",
+        "transactions",
+        ["id"],
+        sqlite_where=sa.text("ledger_synced = 0"),
+        postgresql_where=sa.text("NOT ledger_synced"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_ledger_pending", table_name="transactions")
+    op.drop_column("transactions", "ledger_synced")
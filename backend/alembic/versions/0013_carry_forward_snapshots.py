@@ -0,0 +1,56 @@
+"""rebuild snapshots with carried-forward holdings
+
+Revision ID: 0013_carry_forward_snapshots
+Revises: 0012_transaction_ledger_sync
+Create Date: 2024-06-03 00:00:00.000000
+"""
+
+from alembic import op
+
+revision = "0013_carry_forward_snapshots"
+down_revision = "0012_transaction_ledger_sync"
+branch_labels = None
+depends_on = None
+
+# Every holding's latest valuation on or before each valuation date, the same
+# as-of rows SnapshotWindows sums. 0004 backfilled plain per-date sums, which
+# drop holdings that were not revalued on a date.
+IN_FORCE = """
+    SELECT d.snapshot_date, v.instrument_id, v.value_jpy
+    FROM (SELECT DISTINCT valuation_date AS snapshot_date FROM valuations) d
+    JOIN valuations v ON v.valuation_date = (
+        SELECT MAX(latest.valuation_date)
+        FROM valuations latest
+        WHERE latest.account_id = v.account_id
+          AND COALESCE(latest.instrument_id, 0) = COALESCE(v.instrument_id, 0)
+          AND latest.valuation_date <= d.snapshot_date
+    )
+"""
+
+
+def _replace_snapshots(rows: str) -> None:
+    op.execute("DELETE FROM portfolio_snapshots")
+    op.execute("DELETE FROM portfolio_snapshot_totals")
+    op.execute(
+        f"""
+        INSERT INTO portfolio_snapshots (snapshot_date, taxonomy_node_id, value_jpy)
+        SELECT r.snapshot_date, c.taxonomy_node_id, SUM(r.value_jpy)
+        FROM ({rows}) r
+        JOIN instrument_classifications c ON c.instrument_id = r.instrument_id
+        GROUP BY r.snapshot_date, c.taxonomy_node_id
+        """
+    )
+    op.execute(
+        f"""
+        INSERT INTO portfolio_snapshot_totals (snapshot_date, total_value_jpy)
+        SELECT r.snapshot_date, SUM(r.value_jpy) FROM ({rows}) r GROUP BY r.snapshot_date
+        """
+    )
+
+
+def upgrade() -> None:
+    _replace_snapshots(IN_FORCE)
+
+
+def downgrade() -> None:
+    _replace_snapshots("SELECT valuation_date AS snapshot_date, instrument_id, value_jpy FROM valuations")
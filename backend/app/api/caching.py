@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from datetime import date
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import response_cache
+from app.core.config import get_fast_json_enabled
+from app.db.reads import Reads, run_reads, run_reads_async
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+# Service output for these routes is built from typed columns, so the fast path
+# trusts its shape and skips the per-item validation pass.
+FAST_JSON = get_fast_json_enabled() and orjson is not None
+
+# Encoding runs about 5us per item; below this a hop to a worker thread costs
+# more than it keeps off the event loop.
+THREADPOOL_ENCODE_ITEMS = 200
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _without_none(items: list) -> list:
+    return [
+        {
+            key: _without_none(value) if value.__class__ is list else value
+            for key, value in item.items()
+            if value is not None
+        }
+        for item in items
+    ]
+
+
+def encode_json(value: object, adapter: TypeAdapter, exclude_none: bool = False, fast: bool | None = None) -> bytes:
+    if fast is None:
+        fast = FAST_JSON
+    if fast:
+        return orjson.dumps(_without_none(value) if exclude_none else value, option=orjson.OPT_SERIALIZE_NUMPY)
+    return adapter.dump_json(adapter.validate_python(value), exclude_none=exclude_none)
+
+
+@dataclass(frozen=True)
+class CachedQuery:
+    # One portfolio read: its cache key, the statements that compute it, and
+    # what a write has to touch to invalidate it. Shared by the sync and async routes.
+    key: Hashable
+    reads: Callable[[], Reads]
+    adapter: TypeAdapter
+    kind: str
+    taxonomy: str | None
+    start: date
+    end: date
+    exclude_none: bool = False
+
+
+def _items(value: object) -> int:
+    if isinstance(value, dict):
+        # Matrices: one cell per date and node.
+        return len(value["dates"]) * max(len(value["nodes"]), 1)
+    return len(value)
+
+
+def _store(query: CachedQuery, value: object, generation: int) -> tuple[bytes, str]:
+    body = encode_json(value, query.adapter, query.exclude_none)
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    response_cache.set(
+        query.key,
+        body,
+        etag,
+        kind=query.kind,
+        taxonomy=query.taxonomy,
+        start=query.start,
+        end=query.end,
+        generation=generation,
+    )
+    return body, etag
+
+
+def _respond(request: Request, body: bytes, etag: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def cached_json_response(request: Request, query: CachedQuery, db: Session) -> Response:
+    entry = response_cache.get(query.key)
+    if entry is None:
+        # Captured before computing: a write that lands meanwhile invalidates,
+        # and the possibly stale result is then served but not cached.
+        generation = response_cache.generation
+        body, etag = _store(query, run_reads(db, query.reads()), generation)
+    else:
+        body, etag = entry.value, entry.etag
+    return _respond(request, body, etag)
+
+
+async def cached_json_response_async(request: Request, query: CachedQuery, db: AsyncSession) -> Response:
+    entry = response_cache.get(query.key)
+    if entry is None:
+        generation = response_cache.generation
+        value = await run_reads_async(db, query.reads())
+        if _items(value) >= THREADPOOL_ENCODE_ITEMS:
+            body, etag = await run_in_threadpool(_store, query, value, generation)
+        else:
+            body, etag = _store(query, value, generation)
+    else:
+        body, etag = entry.value, entry.etag
+    return _respond(request, body, etag)
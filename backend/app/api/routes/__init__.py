@@ -1,3 +1,31 @@
-from app.api.routes import accounts, instruments, portfolio, simulations, valuations
+from app.api.routes import (
+    accounts,
+    exports,
+    fx_rates,
+    imports,
+    instruments,
+    jobs,
+    metrics,
+    portfolio,
+    portfolio_async,
+    simulations,
+    taxonomies,
+    transactions,
+    valuations,
+)
 
-__all__ = ["accounts", "instruments", "portfolio", "simulations", "valuations"]
+__all__ = [
+    "accounts",
+    "exports",
+    "fx_rates",
+    "imports",
+    "instruments",
+    "jobs",
+    "metrics",
+    "portfolio",
+    "portfolio_async",
+    "simulations",
+    "taxonomies",
+    "transactions",
+    "valuations",
+]
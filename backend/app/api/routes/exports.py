@@ -0,0 +1,61 @@
+import importlib.util
+from collections.abc import Iterator
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from app.api.streaming import iter_arrow, iter_csv, iter_ndjson, iter_parquet
+from app.db.session import get_db
+from app.services.exports import EXPORT_SOURCES, ExportSource, export_batches
+
+router = APIRouter(tags=["exports"])
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+def _stream(bind, source: ExportSource, format: str, filters: dict) -> Iterator[bytes]:
+    # The request session is closed before the body is sent, so the export
+    # holds its own session for as long as the client keeps reading.
+    with Session(bind=bind) as session:
+        batches = export_batches(session, source, **filters)
+        if format == "csv":
+            yield from iter_csv(list(source.columns), batches)
+        elif format == "ndjson":
+            yield from iter_ndjson(list(source.columns), batches)
+        elif format == "parquet":
+            yield from iter_parquet(source.column_types(), batches)
+        else:
+            yield from iter_arrow(source.column_types(), batches)
+
+
+@router.get("/exports/{kind}")
+def export(
+    kind: Literal["valuations", "transactions", "prices"],
+    format: Literal["csv", "ndjson", "parquet", "arrow"] = "csv",
+    account_id: int | None = None,
+    instrument_id: int | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    db: Session = Depends(get_db),
+) -> StreamingResponse:
+    source = EXPORT_SOURCES[kind]
+    if account_id is not None and "account_id" not in source.columns:
+        raise HTTPException(status_code=422, detail=f"{kind} cannot be filtered by account_id")
+    if format in {"parquet", "arrow"} and importlib.util.find_spec("pyarrow") is None:
+        raise HTTPException(status_code=501, detail=f"{format} export requires pyarrow to be installed")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filters = {"account_id": account_id, "instrument_id": instrument_id, "start": start, "end": end}
+    return StreamingResponse(
+        _stream(db.get_bind(), source, format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{kind}.{extension}"'},
+    )
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.api.streaming import iter_body_records
+from app.db.session import get_db
+from app.schemas.fx_rates import BulkFxRateResult
+from app.services.fx import FX_BATCH_SIZE, FxRateLoader, fx_rates
+
+router = APIRouter(tags=["fx_rates"])
+
+
+@router.post("/fx-rates/bulk", response_model=BulkFxRateResult)
+async def bulk_upsert_fx_rates(request: Request, db: Session = Depends(get_db)) -> dict:
+    loader = FxRateLoader(db)
+    async for records in iter_body_records(request, FX_BATCH_SIZE):
+        await run_in_threadpool(loader.load, records)
+    result = await run_in_threadpool(loader.result)
+    await run_in_threadpool(db.commit)
+    fx_rates.clear(loader.currencies)
+    return result
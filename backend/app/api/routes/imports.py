@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+from datetime import date
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import response_cache
+from app.db.session import get_db
+from app.models.jobs import Job
+from app.schemas.imports import ImportResult
+from app.schemas.jobs import JobRead
+from app.services.columnar import valuation_store
+from app.services.imports import IMPORT_KINDS, check_mapping, import_statement
+from app.services.jobs import job_runner
+
+router = APIRouter(tags=["imports"])
+
+# Statements up to this size stay in memory; larger ones spill to disk.
+SPOOL_MAX_SIZE = 8 << 20
+
+FORMAT_PATTERN = "^(csv|ofx)$"
+KIND_PATTERN = f"^({'|'.join(IMPORT_KINDS)})$"
+
+
+def _parse_mapping(kind: str, mapping: str | None) -> dict | None:
+    try:
+        columns = json.loads(mapping) if mapping else None
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=422, detail=f"mapping is not valid JSON: {exc}") from exc
+    if columns is not None and not isinstance(columns, dict):
+        raise HTTPException(status_code=422, detail="mapping must be a JSON object")
+    try:
+        check_mapping(kind, columns)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return columns
+
+
+@router.post("/imports", response_model=ImportResult)
+async def import_broker_statement(
+    request: Request,
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    kind: str = Query("transactions", pattern=KIND_PATTERN),
+    account_id: int | None = None,
+    mapping: str | None = None,
+    db: Session = Depends(get_db),
+) -> dict:
+    columns = _parse_mapping(kind, mapping)
+    # The body is spooled rather than parsed as it arrives: OFX needs a second
+    # pass, and validation workers run behind the writer.
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        importer = await run_in_threadpool(import_statement, db, spool, format, kind, account_id, columns)
+
+    if importer.valuation_dates:
+        response_cache.invalidate(between=(min(importer.valuation_dates), date.max))
+    if importer.transaction_dates:
+        response_cache.invalidate(dates=sorted(importer.transaction_dates), kinds=["timeseries"])
+    await run_in_threadpool(valuation_store.refresh_dates, db, importer.valuation_dates)
+    return importer.result()
+
+
+@router.post("/imports/jobs", response_model=JobRead, status_code=202)
+async def import_broker_statement_in_background(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    kind: str = Query("transactions", pattern=KIND_PATTERN),
+    account_id: int | None = None,
+    mapping: str | None = None,
+    db: Session = Depends(get_db),
+) -> Job:
+    params = {"format": format, "kind": kind, "account_id": account_id, "mapping": _parse_mapping(kind, mapping)}
+    # The statement is uploaded next to the job files before the job exists,
+    # then kept under the job's name until it finishes, so a resumed job reads
+    # the same file.
+    job_runner.data_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=job_runner.data_dir, suffix=".upload", delete=False) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+    try:
+        job = await run_in_threadpool(job_runner.create, db, "import", params)
+        os.replace(upload.name, job_runner.data_path(job.id, f".{format}"))
+    finally:
+        if os.path.exists(upload.name):
+            os.remove(upload.name)
+    background_tasks.add_task(job_runner.enqueue, db.get_bind(), job.id)
+    return job
@@ -0,0 +1,55 @@
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.validation import format_validation_errors
+from app.db.session import get_db
+from app.models.jobs import Job
+from app.schemas.jobs import JobCreate, JobRead
+from app.services.jobs import JOB_STATUSES, job_runner
+
+router = APIRouter(tags=["jobs"])
+
+
+@router.post("/jobs", response_model=JobRead, status_code=202)
+def submit_job(payload: JobCreate, background_tasks: BackgroundTasks, db: Session = Depends(get_db)) -> Job:
+    if payload.kind == "import":
+        raise HTTPException(status_code=422, detail="import jobs carry a file; submit them to /imports/jobs")
+    try:
+        job = job_runner.create(db, payload.kind, payload.params)
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=format_validation_errors(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    # Started once the response is out and the request session is closed.
+    background_tasks.add_task(job_runner.enqueue, db.get_bind(), job.id)
+    return job
+
+
+@router.get("/jobs", response_model=list[JobRead])
+def list_jobs(
+    status: str | None = Query(None, pattern=f"^({'|'.join(JOB_STATUSES)})$"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+) -> list[Job]:
+    query = select(Job).order_by(Job.id.desc()).limit(limit)
+    if status is not None:
+        query = query.where(Job.status == status)
+    return db.execute(query).scalars().all()
+
+
+@router.get("/jobs/{job_id}", response_model=JobRead)
+def get_job(job_id: int, db: Session = Depends(get_db)) -> Job:
+    job = db.get(Job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobRead)
+def cancel_job(job_id: int, db: Session = Depends(get_db)) -> Job:
+    job = job_runner.cancel(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
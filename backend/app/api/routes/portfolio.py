@@ -1,38 +1,214 @@
 from datetime import date
+from typing import Literal
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
+from app.api.caching import CachedQuery, cached_json_response
+from app.core.cache import response_cache
 from app.db.session import get_db
-from app.schemas.portfolio import AllocationItem, DeviationItem, TimeseriesPoint
-from app.services.portfolio import get_allocation, get_deviation, get_timeseries
+from app.schemas.portfolio import (
+    AllocationItem,
+    AllocationMatrix,
+    CacheStats,
+    ColumnStoreStats,
+    DeviationItem,
+    DeviationMatrix,
+    TimeseriesPoint,
+)
+from app.services.columnar import valuation_store
+from app.services.portfolio import (
+    allocation_matrix_reads,
+    allocation_reads,
+    deviation_matrix_reads,
+    deviation_reads,
+    timeseries_reads,
+)
 
 router = APIRouter(tags=["portfolio"])
 
+_allocation_adapter = TypeAdapter(list[AllocationItem])
+_deviation_adapter = TypeAdapter(list[DeviationItem])
+_timeseries_adapter = TypeAdapter(list[TimeseriesPoint])
+_allocation_matrix_adapter = TypeAdapter(AllocationMatrix)
+_deviation_matrix_adapter = TypeAdapter(DeviationMatrix)
+
+MATRIX_MAX_DATES = 1000
+
+
+def matrix_range(dates: list[date] | None, start: date | None, end: date | None) -> tuple[date, date]:
+    if dates:
+        if len(dates) > MATRIX_MAX_DATES:
+            raise HTTPException(status_code=422, detail=f"At most {MATRIX_MAX_DATES} dates are allowed")
+        return min(dates), max(dates)
+    if start is None or end is None:
+        raise HTTPException(status_code=422, detail="Either dates or start and end are required")
+    return start, end
+
+
+def allocation_query(as_of: date, taxonomy: str, rollup: bool) -> CachedQuery:
+    return CachedQuery(
+        ("allocation", as_of, taxonomy, rollup),
+        lambda: allocation_reads(as_of, taxonomy, rollup),
+        _allocation_adapter,
+        kind="allocation",
+        taxonomy=taxonomy,
+        start=as_of,
+        end=as_of,
+    )
+
+
+def deviation_query(as_of: date, taxonomy: str, rollup: bool) -> CachedQuery:
+    return CachedQuery(
+        ("deviation", as_of, taxonomy, rollup),
+        lambda: deviation_reads(as_of, taxonomy, rollup),
+        _deviation_adapter,
+        kind="deviation",
+        taxonomy=taxonomy,
+        start=as_of,
+        end=as_of,
+    )
+
+
+def allocation_matrix_query(
+    dates: list[date] | None,
+    start: date | None,
+    end: date | None,
+    frequency: str,
+    taxonomy: str,
+    rollup: bool,
+) -> CachedQuery:
+    first, last = matrix_range(dates, start, end)
+    key_dates = tuple(sorted(set(dates))) if dates else None
+    return CachedQuery(
+        ("allocation_matrix", key_dates, start, end, frequency, taxonomy, rollup),
+        lambda: allocation_matrix_reads(taxonomy, dates, start, end, frequency, rollup),
+        _allocation_matrix_adapter,
+        kind="allocation",
+        taxonomy=taxonomy,
+        start=first,
+        end=last,
+    )
+
+
+def deviation_matrix_query(
+    dates: list[date] | None,
+    start: date | None,
+    end: date | None,
+    frequency: str,
+    taxonomy: str,
+    rollup: bool,
+) -> CachedQuery:
+    first, last = matrix_range(dates, start, end)
+    key_dates = tuple(sorted(set(dates))) if dates else None
+    return CachedQuery(
+        ("deviation_matrix", key_dates, start, end, frequency, taxonomy, rollup),
+        lambda: deviation_matrix_reads(taxonomy, dates, start, end, frequency, rollup),
+        _deviation_matrix_adapter,
+        kind="deviation",
+        taxonomy=taxonomy,
+        start=first,
+        end=last,
+    )
+
+
+def timeseries_query(
+    start: date,
+    end: date,
+    group_by: str,
+    breakdown: str | None,
+    taxonomy: str,
+    metrics: bool,
+    window: int,
+    max_points: int | None,
+) -> CachedQuery:
+    return CachedQuery(
+        ("timeseries", start, end, group_by, breakdown, taxonomy, metrics, window, max_points),
+        lambda: timeseries_reads(start, end, group_by, breakdown, taxonomy, metrics, window, max_points),
+        _timeseries_adapter,
+        kind="timeseries",
+        taxonomy=taxonomy if breakdown == "taxonomy" else None,
+        start=start,
+        end=end,
+        exclude_none=True,
+    )
+
 
 @router.get("/portfolio/allocation", response_model=list[AllocationItem])
 def allocation(
+    request: Request,
     date: date = Query(..., alias="date"),
     taxonomy: str = "asset_class",
+    rollup: bool = False,
     db: Session = Depends(get_db),
 ):
-    return get_allocation(db, date, taxonomy)
+    return cached_json_response(request, allocation_query(date, taxonomy, rollup), db)
 
 
 @router.get("/portfolio/deviation", response_model=list[DeviationItem])
 def deviation(
+    request: Request,
     date: date = Query(..., alias="date"),
     taxonomy: str = "asset_class",
+    rollup: bool = False,
     db: Session = Depends(get_db),
 ):
-    return get_deviation(db, date, taxonomy)
+    return cached_json_response(request, deviation_query(date, taxonomy, rollup), db)
+
+
+@router.get("/portfolio/allocation/matrix", response_model=AllocationMatrix)
+def allocation_matrix(
+    request: Request,
+    dates: list[date] | None = Query(None),
+    start: date | None = None,
+    end: date | None = None,
+    frequency: Literal["day", "week", "month", "quarter", "year"] = "month",
+    taxonomy: str = "asset_class",
+    rollup: bool = False,
+    db: Session = Depends(get_db),
+):
+    query = allocation_matrix_query(dates, start, end, frequency, taxonomy, rollup)
+    return cached_json_response(request, query, db)
+
+
+@router.get("/portfolio/deviation/matrix", response_model=DeviationMatrix)
+def deviation_matrix(
+    request: Request,
+    dates: list[date] | None = Query(None),
+    start: date | None = None,
+    end: date | None = None,
+    frequency: Literal["day", "week", "month", "quarter", "year"] = "month",
+    taxonomy: str = "asset_class",
+    rollup: bool = False,
+    db: Session = Depends(get_db),
+):
+    query = deviation_matrix_query(dates, start, end, frequency, taxonomy, rollup)
+    return cached_json_response(request, query, db)
 
 
 @router.get("/portfolio/timeseries", response_model=list[TimeseriesPoint])
 def timeseries(
+    request: Request,
     start: date,
     end: date,
-    group_by: str = "month",
+    group_by: Literal["day", "week", "month", "quarter", "year"] = "month",
+    breakdown: Literal["account", "instrument", "taxonomy"] | None = None,
+    taxonomy: str = "asset_class",
+    metrics: bool = False,
+    window: int = Query(12, ge=2, le=520),
+    max_points: int | None = Query(None, ge=3, le=10_000),
     db: Session = Depends(get_db),
 ):
-    return get_timeseries(db, start, end, group_by)
+    query = timeseries_query(start, end, group_by, breakdown, taxonomy, metrics, window, max_points)
+    return cached_json_response(request, query, db)
+
+
+@router.get("/portfolio/cache", response_model=CacheStats)
+def cache_stats() -> dict:
+    return response_cache.stats()
+
+
+@router.get("/portfolio/column-store", response_model=ColumnStoreStats)
+def column_store_stats() -> dict:
+    return valuation_store.stats()
@@ -0,0 +1,101 @@
+from datetime import date
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.caching import cached_json_response_async
+from app.api.routes.portfolio import (
+    allocation_matrix_query,
+    allocation_query,
+    cache_stats,
+    column_store_stats,
+    deviation_matrix_query,
+    deviation_query,
+    timeseries_query,
+)
+from app.db.async_session import get_async_db
+from app.schemas.portfolio import (
+    AllocationItem,
+    AllocationMatrix,
+    CacheStats,
+    ColumnStoreStats,
+    DeviationItem,
+    DeviationMatrix,
+    TimeseriesPoint,
+)
+
+router = APIRouter(tags=["portfolio"])
+
+
+@router.get("/portfolio/allocation", response_model=list[AllocationItem])
+async def allocation(
+    request: Request,
+    date: date = Query(..., alias="date"),
+    taxonomy: str = "asset_class",
+    rollup: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await cached_json_response_async(request, allocation_query(date, taxonomy, rollup), db)
+
+
+@router.get("/portfolio/deviation", response_model=list[DeviationItem])
+async def deviation(
+    request: Request,
+    date: date = Query(..., alias="date"),
+    taxonomy: str = "asset_class",
+    rollup: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    return await cached_json_response_async(request, deviation_query(date, taxonomy, rollup), db)
+
+
+@router.get("/portfolio/allocation/matrix", response_model=AllocationMatrix)
+async def allocation_matrix(
+    request: Request,
+    dates: list[date] | None = Query(None),
+    start: date | None = None,
+    end: date | None = None,
+    frequency: Literal["day", "week", "month", "quarter", "year"] = "month",
+    taxonomy: str = "asset_class",
+    rollup: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = allocation_matrix_query(dates, start, end, frequency, taxonomy, rollup)
+    return await cached_json_response_async(request, query, db)
+
+
+@router.get("/portfolio/deviation/matrix", response_model=DeviationMatrix)
+async def deviation_matrix(
+    request: Request,
+    dates: list[date] | None = Query(None),
+    start: date | None = None,
+    end: date | None = None,
+    frequency: Literal["day", "week", "month", "quarter", "year"] = "month",
+    taxonomy: str = "asset_class",
+    rollup: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = deviation_matrix_query(dates, start, end, frequency, taxonomy, rollup)
+    return await cached_json_response_async(request, query, db)
+
+
+@router.get("/portfolio/timeseries", response_model=list[TimeseriesPoint])
+async def timeseries(
+    request: Request,
+    start: date,
+    end: date,
+    group_by: Literal["day", "week", "month", "quarter", "year"] = "month",
+    breakdown: Literal["account", "instrument", "taxonomy"] | None = None,
+    taxonomy: str = "asset_class",
+    metrics: bool = False,
+    window: int = Query(12, ge=2, le=520),
+    max_points: int | None = Query(None, ge=3, le=10_000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    query = timeseries_query(start, end, group_by, breakdown, taxonomy, metrics, window, max_points)
+    return await cached_json_response_async(request, query, db)
+
+
+router.get("/portfolio/cache", response_model=CacheStats)(cache_stats)
+router.get("/portfolio/column-store", response_model=ColumnStoreStats)(column_store_stats)
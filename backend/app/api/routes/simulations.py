@@ -1,37 +1,103 @@
-from fastapi import APIRouter
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
 
-from app.schemas.simulations import ForecastRequest, ForecastResponse
-from app.services.calculations import forecast_values
+from app.db.session import get_db
+from app.schemas.simulations import (
+    ContributionPlanRequest,
+    ContributionPlanResponse,
+    ForecastGridRequest,
+    ForecastGridResponse,
+    ForecastRequest,
+    ForecastResponse,
+)
+from app.services.calculations import forecast_batch, forecast_values, simulate_forecast
+from app.services.contributions import project_contribution_plan
 
 router = APIRouter(tags=["simulations"])
 
+MAX_GRID_POINTS = 10_000
 
-@router.post("/simulations/forecast", response_model=ForecastResponse)
+
+@router.post("/simulations/forecast", response_model=ForecastResponse, response_model_exclude_none=True)
 def forecast(payload: ForecastRequest) -> ForecastResponse:
-    base_values = forecast_values(
-        start_value=0,
-        annual_return=payload.annual_return,
-        monthly_contribution=payload.monthly_contribution,
-        months=payload.horizon_months,
-    )
-    scenarios = [{"label": "base", "values": base_values}]
     if payload.include_scenarios:
-        optimistic = forecast_values(
+        labels = ["base", "optimistic", "pessimistic"]
+        rates = [
+            payload.annual_return,
+            payload.annual_return + payload.scenario_delta,
+            payload.annual_return - payload.scenario_delta,
+        ]
+        paths = np.round(
+            forecast_batch(0, rates, payload.monthly_contribution, payload.horizon_months), 2
+        )
+        paths[:, 0] = 0
+        scenarios = [{"label": label, "values": path} for label, path in zip(labels, paths.tolist())]
+    else:
+        base_values = forecast_values(
             start_value=0,
-            annual_return=payload.annual_return + payload.scenario_delta,
+            annual_return=payload.annual_return,
             monthly_contribution=payload.monthly_contribution,
             months=payload.horizon_months,
         )
-        pessimistic = forecast_values(
+        scenarios = [{"label": "base", "values": base_values}]
+    if payload.mode == "monte_carlo":
+        simulation = simulate_forecast(
             start_value=0,
-            annual_return=payload.annual_return - payload.scenario_delta,
+            annual_return=payload.annual_return,
+            annual_volatility=payload.annual_volatility,
             monthly_contribution=payload.monthly_contribution,
             months=payload.horizon_months,
+            paths=payload.paths,
+            target_value=payload.target_value,
+            seed=payload.seed,
         )
-        scenarios.extend(
-            [
-                {"label": "optimistic", "values": optimistic},
-                {"label": "pessimistic", "values": pessimistic},
-            ]
-        )
+        return ForecastResponse(start_value=0, scenarios=scenarios, **simulation)
     return ForecastResponse(start_value=0, scenarios=scenarios)
+
+
+@router.post(
+    "/simulations/forecast/grid",
+    response_model=ForecastGridResponse,
+    response_model_exclude_none=True,
+)
+def forecast_grid(payload: ForecastGridRequest) -> ForecastGridResponse:
+    starts = np.asarray(payload.start_values, dtype=float)
+    rates = np.asarray(payload.annual_returns, dtype=float)
+    contributions = np.asarray(payload.monthly_contributions, dtype=float)
+    if starts.size * rates.size * contributions.size > MAX_GRID_POINTS:
+        raise HTTPException(status_code=422, detail=f"Grid exceeds {MAX_GRID_POINTS} parameter sets")
+
+    start_grid, rate_grid, contribution_grid = (
+        grid.ravel() for grid in np.meshgrid(starts, rates, contributions, indexing="ij")
+    )
+    paths = np.round(forecast_batch(start_grid, rate_grid, contribution_grid, payload.horizon_months), 2)
+    paths[:, 0] = start_grid
+    points = [
+        {
+            "start_value": start,
+            "annual_return": rate,
+            "monthly_contribution": contribution,
+            "final_value": path[-1],
+            "values": path if payload.include_values else None,
+        }
+        for start, rate, contribution, path in zip(
+            start_grid.tolist(), rate_grid.tolist(), contribution_grid.tolist(), paths.tolist()
+        )
+    ]
+    return ForecastGridResponse(horizon_months=payload.horizon_months, points=points)
+
+
+@router.post("/simulations/contribution-plan", response_model=ContributionPlanResponse)
+def contribution_plan(payload: ContributionPlanRequest, db: Session = Depends(get_db)) -> dict:
+    projection = project_contribution_plan(
+        db,
+        payload.plan_id,
+        payload.date,
+        payload.taxonomy,
+        payload.horizon_months,
+        annual_return=payload.annual_return,
+    )
+    if projection is None:
+        raise HTTPException(status_code=404, detail="Contribution plan not found")
+    return projection
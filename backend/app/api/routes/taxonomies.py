@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session, joinedload
+
+from app.core.cache import response_cache
+from app.db.session import get_db
+from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode
+from app.schemas.taxonomies import (
+    ClassificationCreate,
+    ClassificationRead,
+    TargetAllocationCreate,
+    TargetAllocationRead,
+)
+from app.services.taxonomies import classify_instrument, set_target_allocation
+
+router = APIRouter(tags=["taxonomies"])
+
+
+@router.post("/classifications", response_model=ClassificationRead)
+def create_classification(
+    payload: ClassificationCreate, db: Session = Depends(get_db)
+) -> InstrumentClassification:
+    node = db.get(TaxonomyNode, payload.taxonomy_node_id, options=[joinedload(TaxonomyNode.taxonomy)])
+    if node is None:
+        raise HTTPException(status_code=404, detail="Taxonomy node not found")
+    taxonomy_name = node.taxonomy.name
+    classification = classify_instrument(db, payload)
+    db.commit()
+    response_cache.invalidate(taxonomy=taxonomy_name, kinds={"allocation", "deviation", "timeseries"})
+    return classification
+
+
+@router.post("/target-allocations", response_model=TargetAllocationRead)
+def upsert_target_allocation(
+    payload: TargetAllocationCreate, db: Session = Depends(get_db)
+) -> TargetAllocation:
+    taxonomy = db.get(Taxonomy, payload.taxonomy_id)
+    if taxonomy is None:
+        raise HTTPException(status_code=404, detail="Taxonomy not found")
+    taxonomy_name = taxonomy.name
+    target = set_target_allocation(db, payload)
+    db.commit()
+    response_cache.invalidate(taxonomy=taxonomy_name, kinds={"deviation"})
+    return target
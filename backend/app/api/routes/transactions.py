@@ -0,0 +1,41 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.cache import response_cache
+from app.db.session import get_db
+from app.models.portfolio import Transaction
+from app.schemas.transactions import Holding, LedgerSyncResult, TransactionCreate, TransactionRead
+from app.services.ledger import get_holdings, sync_ledger
+
+router = APIRouter(tags=["transactions"])
+
+
+@router.post("/transactions", response_model=TransactionRead)
+def create_transaction(payload: TransactionCreate, db: Session = Depends(get_db)) -> Transaction:
+    transaction = Transaction(**payload.model_dump())
+    db.add(transaction)
+    db.flush()
+    sync_ledger(db)
+    db.commit()
+    # Cash flows feed the return metrics of every timeseries covering the date.
+    response_cache.invalidate(dates=[transaction.transaction_date], kinds=["timeseries"])
+    db.refresh(transaction)
+    return transaction
+
+
+@router.post("/ledger/sync", response_model=LedgerSyncResult)
+def sync(db: Session = Depends(get_db)) -> dict:
+    result = sync_ledger(db)
+    db.commit()
+    return result
+
+
+@router.get("/holdings", response_model=list[Holding])
+def holdings(
+    date: date = Query(..., alias="date"),
+    account_id: int | None = None,
+    db: Session = Depends(get_db),
+):
+    return get_holdings(db, date, account_id=account_id)
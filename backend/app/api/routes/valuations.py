@@ -1,17 +1,56 @@
-from fastapi import APIRouter, Depends
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
+from app.api.streaming import iter_body_records
+from app.core.cache import response_cache
 from app.db.session import get_db
 from app.models.portfolio import Valuation
-from app.schemas.valuations import ValuationCreate, ValuationRead
+from app.schemas.valuations import (
+    BulkValuationResult,
+    RevaluationRequest,
+    RevaluationResult,
+    ValuationCreate,
+    ValuationRead,
+)
+from app.services.columnar import valuation_store
+from app.services.revaluation import revalue_positions
+from app.services.valuations import BULK_BATCH_SIZE, ValuationBulkLoader, upsert_valuation
 
 router = APIRouter(tags=["valuations"])
 
 
 @router.post("/valuations", response_model=ValuationRead)
 def create_valuation(payload: ValuationCreate, db: Session = Depends(get_db)) -> Valuation:
-    valuation = Valuation(**payload.model_dump())
-    db.add(valuation)
+    valuation = upsert_valuation(db, payload)
     db.commit()
+    # Valuations carry forward, so every cached range reaching past the write is stale.
+    response_cache.invalidate(between=(payload.valuation_date, date.max))
+    valuation_store.refresh_dates(db, [payload.valuation_date])
     db.refresh(valuation)
     return valuation
+
+
+@router.post("/valuations/bulk", response_model=BulkValuationResult)
+async def bulk_upsert_valuations(request: Request, db: Session = Depends(get_db)) -> dict:
+    loader = ValuationBulkLoader(db)
+    async for records in iter_body_records(request, BULK_BATCH_SIZE):
+        await run_in_threadpool(loader.load, records)
+    result = await run_in_threadpool(loader.result)
+    await run_in_threadpool(db.commit)
+    if loader.dates:
+        response_cache.invalidate(between=(min(loader.dates), date.max))
+    await run_in_threadpool(valuation_store.refresh_dates, db, loader.dates)
+    return result
+
+
+@router.post("/valuations/revalue", response_model=RevaluationResult)
+def revalue(payload: RevaluationRequest, db: Session = Depends(get_db)) -> dict:
+    result = revalue_positions(db, payload.start, payload.end, account_id=payload.account_id)
+    db.commit()
+    response_cache.invalidate(between=(payload.start, date.max))
+    days = (payload.end - payload.start).days + 1
+    valuation_store.refresh_dates(db, (payload.start + timedelta(days=offset) for offset in range(days)))
+    return result
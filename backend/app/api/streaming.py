@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import json
+import re
+from collections.abc import AsyncIterator, Iterable, Iterator
+from datetime import date
+
+from fastapi import HTTPException, Request
+
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CSV_MEDIA_TYPES = {"text/csv", "application/csv"}
+
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_JSON_NUMBER_CHARS = frozenset("0123456789+-.eE")
+
+
+def request_media_type(request: Request) -> str:
+    return request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+
+
+async def _iter_body_text(request: Request) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    async for chunk in request.stream():
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b"", final=True)
+    if text:
+        yield text
+
+
+async def iter_body_lines(request: Request) -> AsyncIterator[str]:
+    buffer = ""
+    async for text in _iter_body_text(request):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+async def iter_body_records(request: Request, batch_size: int) -> AsyncIterator[list]:
+    media_type = request_media_type(request)
+    if media_type == "application/json":
+        records = _iter_json_array(request)
+    elif media_type in NDJSON_MEDIA_TYPES:
+        records = _iter_ndjson(request)
+    elif media_type in CSV_MEDIA_TYPES:
+        records = _iter_csv(request)
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported media type: {media_type}")
+    async for batch in _batched(records, batch_size):
+        yield batch
+
+
+def _invalid_json(message: str, offset: int) -> HTTPException:
+    return HTTPException(status_code=400, detail=f"Invalid JSON body: {message} (char {offset})")
+
+
+async def _iter_json_array(request: Request) -> AsyncIterator[object]:
+    # Elements are decoded as soon as they have fully arrived, so a large array
+    # is validated and written batch by batch instead of after the whole upload.
+    scan = json.JSONDecoder().scan_once
+    chunks = _iter_body_text(request)
+    buffer, position, offset = "", 0, 0
+    expecting = "["
+    final = False
+    while True:
+        position = _JSON_WHITESPACE.match(buffer, position).end()
+        if position < len(buffer):
+            char = buffer[position]
+            if expecting == "[":
+                if char != "[":
+                    raise HTTPException(status_code=400, detail="JSON body must be an array")
+                position += 1
+                expecting = "first"
+                continue
+            if expecting == "end":
+                raise _invalid_json("Extra data", offset + position)
+            if expecting == "separator":
+                if char not in ",]":
+                    raise _invalid_json("Expecting ',' delimiter", offset + position)
+                position += 1
+                expecting = "value" if char == "," else "end"
+                continue
+            if expecting == "first" and char == "]":
+                position += 1
+                expecting = "end"
+                continue
+            try:
+                value, end = scan(buffer, position)
+            except (StopIteration, json.JSONDecodeError) as exc:
+                if final:
+                    message = exc.msg if isinstance(exc, json.JSONDecodeError) else "Expecting value"
+                    raise _invalid_json(message, offset + position) from None
+            else:
+                # A number may continue in the next chunk ("1.5" cut as "1.5e").
+                if final or (end < len(buffer) and buffer[end] not in _JSON_NUMBER_CHARS):
+                    position = end
+                    expecting = "separator"
+                    yield value
+                    continue
+        elif final:
+            break
+        try:
+            text = await anext(chunks)
+        except StopAsyncIteration:
+            final = True
+            text = ""
+        offset += position
+        buffer, position = buffer[position:] + text, 0
+    if expecting not in ("[", "end"):
+        raise _invalid_json("Expecting ']'", offset + position)
+
+
+async def _iter_ndjson(request: Request) -> AsyncIterator[object]:
+    async for line in iter_body_lines(request):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            # Keep a placeholder so the row is reported at its position in the body.
+            yield None
+
+
+class _RecordLines:
+    # The csv.reader below pulls from this and is only ever refilled with whole
+    # records, so running dry never leaves it inside a quoted field.
+    def __init__(self) -> None:
+        self.lines: Iterator[str] = iter(())
+
+    def __iter__(self) -> _RecordLines:
+        return self
+
+    def __next__(self) -> str:
+        return next(self.lines)
+
+
+def _complete_records_end(buffer: str) -> int:
+    # End of the last line break outside quotes; csv doubles embedded quotes,
+    # so the quote count before a break is even exactly when it is outside one.
+    end = buffer.rfind("\n")
+    quotes = buffer.count('"', 0, end)
+    while end >= 0 and quotes % 2:
+        previous = buffer.rfind("\n", 0, end)
+        quotes -= buffer.count('"', previous + 1, end)
+        end = previous
+    return end + 1
+
+
+async def _iter_csv(request: Request) -> AsyncIterator[dict]:
+    lines = _RecordLines()
+    reader = csv.reader(lines)
+    header: list[str] | None = None
+    buffer = ""
+    final = False
+    chunks = _iter_body_text(request)
+    while not final:
+        try:
+            buffer += await anext(chunks)
+            end = _complete_records_end(buffer)
+        except StopAsyncIteration:
+            final = True
+            end = len(buffer)
+        if not end:
+            continue
+        lines.lines = io.StringIO(buffer[:end], newline="")
+        buffer = buffer[end:]
+        for values in reader:
+            if not values or (len(values) == 1 and not values[0].strip()):
+                continue
+            if header is None:
+                header = [name.strip() for name in values]
+                continue
+            yield {name: value or None for name, value in zip(header, values)}
+
+
+async def _batched(records: AsyncIterator, batch_size: int) -> AsyncIterator[list]:
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _ChunkSink:
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def iter_csv(columns: list[str], batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def iter_ndjson(columns: list[str], batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in batch
+        ).encode()
+
+
+def _arrow_schema(column_types: list[tuple[str, type]]):
+    import pyarrow as pa
+
+    arrow_types = {int: pa.int64(), float: pa.float64(), str: pa.string(), date: pa.date32()}
+    return pa.schema([(name, arrow_types[python_type]) for name, python_type in column_types])
+
+
+def _arrow_batches(schema, batches: Iterable[list[tuple]]):
+    import pyarrow as pa
+
+    for batch in batches:
+        columns = list(zip(*batch)) if batch else [[] for _ in schema]
+        arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+        yield pa.record_batch(arrays, schema=schema)
+
+
+def iter_parquet(column_types: list[tuple[str, type]], batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema(column_types)
+    sink = _ChunkSink()
+    # Each database batch becomes one row group, flushed to the client as soon as it is written.
+    with pq.ParquetWriter(sink, schema) as writer:
+        for record_batch in _arrow_batches(schema, batches):
+            writer.write_batch(record_batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def iter_arrow(column_types: list[tuple[str, type]], batches: Iterable[list[tuple]]) -> Iterator[bytes]:
+    import pyarrow as pa
+
+    schema = _arrow_schema(column_types)
+    sink = _ChunkSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for record_batch in _arrow_batches(schema, batches):
+            writer.write_batch(record_batch)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass
+from datetime import date
+
+from app.core.config import get_response_cache_size, get_response_cache_ttl
+
+
+@dataclass
+class CacheEntry:
+    value: object
+    etag: str
+    kind: str
+    taxonomy: str | None
+    start: date
+    end: date
+    expires_at: float
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int, ttl_seconds: float) -> None:
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped by every invalidation. A response computed while one ran may
+        # already be stale, so set() drops it if the generation has moved on.
+        self.generation = 0
+        self._entries: OrderedDict[Hashable, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def set(
+        self,
+        key: Hashable,
+        value: object,
+        etag: str,
+        *,
+        kind: str,
+        taxonomy: str | None,
+        start: date,
+        end: date,
+        generation: int | None = None,
+    ) -> None:
+        if self.maxsize <= 0:
+            return
+        entry = CacheEntry(value, etag, kind, taxonomy, start, end, time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(
+        self,
+        *,
+        dates: Iterable[date] | None = None,
+        between: tuple[date, date] | None = None,
+        taxonomy: str | None = None,
+        kinds: Iterable[str] | None = None,
+    ) -> int:
+        dates = sorted(set(dates)) if dates is not None else None
+        kinds = set(kinds) if kinds is not None else None
+        with self._lock:
+            self.generation += 1
+            stale = [
+                key
+                for key, entry in self._entries.items()
+                if (kinds is None or entry.kind in kinds)
+                and (taxonomy is None or entry.taxonomy == taxonomy)
+                and (dates is None or _overlaps(dates, entry.start, entry.end))
+                and (between is None or (entry.start <= between[1] and between[0] <= entry.end))
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.hits = self.misses = self.invalidations = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _overlaps(sorted_dates: list[date], start: date, end: date) -> bool:
+    index = bisect_left(sorted_dates, start)
+    return index < len(sorted_dates) and sorted_dates[index] <= end
+
+
+response_cache = ResponseCache(get_response_cache_size(), get_response_cache_ttl())
@@ -3,3 +3,83 @@ import os
 
 def get_database_url() -> str:
     return os.getenv("DATABASE_URL", "sqlite:///./asset_tracker.db")
+
+
+def get_response_cache_size() -> int:
+    return int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+
+def get_response_cache_ttl() -> float:
+    return float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+
+def get_fx_cache_ttl() -> float:
+    return float(os.getenv("FX_CACHE_TTL_SECONDS", "300"))
+
+
+def get_sqlite_pragmas() -> dict[str, str]:
+    return {
+        "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+        "cache_size": os.getenv("SQLITE_CACHE_SIZE", "-65536"),
+        "mmap_size": os.getenv("SQLITE_MMAP_SIZE", "268435456"),
+        "temp_store": os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    }
+
+
+def get_async_mode() -> bool:
+    return os.getenv("ASYNC_DB", "false").lower() in {"1", "true", "yes"}
+
+
+def get_async_database_url() -> str:
+    url = os.getenv("ASYNC_DATABASE_URL")
+    if url:
+        return url
+    url = get_database_url()
+    for prefix, driver in (("sqlite:", "sqlite+aiosqlite:"), ("postgresql:", "postgresql+asyncpg:")):
+        if url.startswith(prefix):
+            return driver + url[len(prefix):]
+    return url
+
+
+def get_column_store_enabled() -> bool:
+    return os.getenv("COLUMN_STORE", "false").lower() in {"1", "true", "yes"}
+
+
+def get_fast_json_enabled() -> bool:
+    return os.getenv("FAST_JSON", "false").lower() in {"1", "true", "yes"}
+
+
+def get_metrics_enabled() -> bool:
+    return os.getenv("METRICS_ENABLED", "false").lower() in {"1", "true", "yes"}
+
+
+def get_slow_query_ms() -> float:
+    return float(os.getenv("SLOW_QUERY_MS", "100"))
+
+
+def get_strict_loading() -> bool:
+    return os.getenv("STRICT_LOADING", "false").lower() in {"1", "true", "yes"}
+
+
+def get_query_budget() -> int:
+    return int(os.getenv("QUERY_BUDGET", "0"))
+
+
+def get_import_workers() -> int:
+    # Size of the validation pool shared by every import: 0 picks one process
+    # per CPU; 1 validates in the request thread.
+    return int(os.getenv("IMPORT_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def get_job_workers() -> int:
+    return int(os.getenv("JOB_WORKERS", "2"))
+
+
+def get_job_data_dir() -> str:
+    return os.getenv("JOB_DATA_DIR", "./job_data")
+
+
+def get_resume_jobs() -> bool:
+    return os.getenv("RESUME_JOBS", "true").lower() in {"1", "true", "yes"}
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import get_slow_query_ms
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SLOW_QUERY_PARAMETER_LIMIT = 500
+
+
+@dataclass
+class _RequestQueries:
+    count: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...]
+    counts: list[int] = field(default_factory=list)
+    total: float = 0.0
+    observations: int = 0
+
+    def __post_init__(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.observations += 1
+
+
+_current: ContextVar[_RequestQueries | None] = ContextVar("request_queries", default=None)
+
+
+def _labels(**labels: str) -> str:
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self, slow_query_seconds: float) -> None:
+        self.slow_query_seconds = slow_query_seconds
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.latency: dict[tuple[str, str, str], Histogram] = {}
+            self.queries: dict[tuple[str, str], Histogram] = {}
+            self.query_seconds: dict[tuple[str, str], float] = {}
+            self.slow_queries = 0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, queries: _RequestQueries) -> None:
+        with self._lock:
+            key = (method, route, str(status))
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.latency[key].observe(seconds)
+            if (method, route) not in self.queries:
+                self.queries[(method, route)] = Histogram(QUERY_COUNT_BUCKETS)
+            self.queries[(method, route)].observe(queries.count)
+            self.query_seconds[(method, route)] = self.query_seconds.get((method, route), 0.0) + queries.seconds
+
+    def observe_query(self, statement: str, parameters, seconds: float) -> None:
+        current = _current.get()
+        if current is not None:
+            current.count += 1
+            current.seconds += seconds
+        if seconds >= self.slow_query_seconds:
+            with self._lock:
+                self.slow_queries += 1
+            logger.warning(
+                "slow query %.1fms: %s parameters=%s",
+                seconds * 1000,
+                statement,
+                repr(parameters)[:SLOW_QUERY_PARAMETER_LIMIT],
+            )
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            lines += [
+                "# HELP asset_tracker_request_duration_seconds Request latency by route.",
+                "# TYPE asset_tracker_request_duration_seconds histogram",
+            ]
+            for (method, route, status), histogram in sorted(self.latency.items()):
+                lines += _histogram_lines(
+                    "asset_tracker_request_duration_seconds",
+                    histogram,
+                    method=method,
+                    route=route,
+                    status=status,
+                )
+            lines += [
+                "# HELP asset_tracker_request_queries SQL statements executed per request.",
+                "# TYPE asset_tracker_request_queries histogram",
+            ]
+            for (method, route), histogram in sorted(self.queries.items()):
+                lines += _histogram_lines("asset_tracker_request_queries", histogram, method=method, route=route)
+            lines += [
+                "# HELP asset_tracker_request_query_seconds_total Time spent in SQL per route.",
+                "# TYPE asset_tracker_request_query_seconds_total counter",
+            ]
+            for (method, route), seconds in sorted(self.query_seconds.items()):
+                lines.append(
+                    f"asset_tracker_request_query_seconds_total{_labels(method=method, route=route)} {seconds}"
+                )
+            lines += [
+                "# HELP asset_tracker_slow_queries_total Statements slower than the slow-query threshold.",
+                "# TYPE asset_tracker_slow_queries_total counter",
+                f"asset_tracker_slow_queries_total {self.slow_queries}",
+            ]
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, histogram: Histogram, **labels: str) -> list[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip((*histogram.buckets, "+Inf"), histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram.total}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram.observations}")
+    return lines
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # Kept on the execution context, which is dropped with the statement, so a
+    # statement that raises leaves nothing behind on the pooled connection.
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    registry.observe_query(statement, parameters, time.perf_counter() - context._metrics_started)
+
+
+class MetricsMiddleware:
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        queries = _RequestQueries()
+        token = _current.set(queries)
+
+        async def send_with_status(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            # The route template keeps label cardinality bounded; unmatched
+            # paths are folded together instead of recorded verbatim.
+            route = scope.get("route")
+            registry.observe_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+                time.perf_counter() - started,
+                queries,
+            )
+
+
+def install_metrics(app) -> None:
+    # Nothing is hooked until this runs, so a disabled deployment pays no
+    # per-request or per-statement cost.
+    if not registry.enabled:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        registry.enabled = True
+    app.add_middleware(MetricsMiddleware)
+
+
+def uninstall_metrics() -> None:
+    if registry.enabled:
+        event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+        registry.enabled = False
+
+
+registry = MetricsRegistry(get_slow_query_ms() / 1000)
@@ -0,0 +1,10 @@
+from __future__ import annotations
+
+from pydantic import ValidationError
+
+
+def format_validation_errors(exc: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+        for error in exc.errors(include_url=False)
+    ]
@@ -0,0 +1,44 @@
+from functools import lru_cache
+
+from fastapi import Request
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import get_async_database_url, get_sqlite_pragmas
+from app.db.session import READ_METHODS, _is_file_sqlite, apply_sqlite_pragmas, session_info
+
+
+def create_async_engines(url: str, pragmas: dict[str, str] | None = None) -> tuple[AsyncEngine, AsyncEngine]:
+    if not _is_file_sqlite(url):
+        engine = create_async_engine(url)
+        return engine, engine
+
+    # aiosqlite defaults to NullPool, which opens a connection (and its worker
+    # thread) and re-applies the pragmas on every request.
+    engine = create_async_engine(url, poolclass=AsyncAdaptedQueuePool)
+    pragmas = get_sqlite_pragmas() if pragmas is None else pragmas
+    read_engine = create_async_engine(url, poolclass=AsyncAdaptedQueuePool)
+    apply_sqlite_pragmas(engine.sync_engine, pragmas)
+    apply_sqlite_pragmas(
+        read_engine.sync_engine,
+        {name: value for name, value in pragmas.items() if name != "journal_mode"},
+        read_only=True,
+    )
+    return engine, read_engine
+
+
+@lru_cache
+def get_async_sessionmakers() -> tuple[async_sessionmaker, async_sessionmaker]:
+    # Built on first use so the async driver is only imported when async mode is on.
+    engine, read_engine = create_async_engines(get_async_database_url())
+    return (
+        async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, info=session_info),
+        async_sessionmaker(bind=read_engine, autoflush=False, expire_on_commit=False, info=session_info),
+    )
+
+
+async def get_async_db(request: Request):
+    write_factory, read_factory = get_async_sessionmakers()
+    factory = read_factory if request.method in READ_METHODS else write_factory
+    async with factory() as db:
+        yield db
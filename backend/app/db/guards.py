@@ -0,0 +1,46 @@
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, raiseload
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def _raise_on_lazy_load(state: ORMExecuteState) -> None:
+    # Explicit selectinload/joinedload options on the statement take
+    # precedence over the wildcard, so only implicit lazy loads raise.
+    if state.is_select and not state.is_column_load and not state.is_relationship_load:
+        state.statement = state.statement.options(raiseload("*", sql_only=True))
+
+
+def install_strict_loading() -> None:
+    if not event.contains(Session, "do_orm_execute", _raise_on_lazy_load):
+        event.listen(Session, "do_orm_execute", _raise_on_lazy_load)
+
+
+def uninstall_strict_loading() -> None:
+    if event.contains(Session, "do_orm_execute", _raise_on_lazy_load):
+        event.remove(Session, "do_orm_execute", _raise_on_lazy_load)
+
+
+def _count_query(state: ORMExecuteState) -> None:
+    budget = state.session.info.get("query_budget")
+    if not budget:
+        return
+    count = state.session.info["query_count"] = state.session.info.get("query_count", 0) + 1
+    if count > budget:
+        raise QueryBudgetExceeded(
+            f"query budget of {budget} exceeded by: {str(state.statement).splitlines()[0]}"
+        )
+
+
+def install_query_budget() -> None:
+    # Budgets are read from session.info, which sessionmaker(info=...) seeds
+    # for every request-scoped session.
+    if not event.contains(Session, "do_orm_execute", _count_query):
+        event.listen(Session, "do_orm_execute", _count_query)
+
+
+def uninstall_query_budget() -> None:
+    if event.contains(Session, "do_orm_execute", _count_query):
+        event.remove(Session, "do_orm_execute", _count_query)
@@ -0,0 +1,40 @@
+from collections.abc import Generator, Sequence
+from typing import TypeVar
+
+from sqlalchemy import Executable, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+T = TypeVar("T")
+
+# A read written as a generator: it yields each statement it needs, is sent
+# that statement's rows back and returns its result. The same read then runs
+# on a sync Session or over an AsyncSession without blocking the event loop.
+Reads = Generator[Executable, Sequence[Row], T]
+
+
+def _step(reads: Reads[T], rows: Sequence[Row] | None) -> tuple[bool, object]:
+    # StopIteration cannot cross a thread boundary into a coroutine, so the
+    # result travels back as a flag instead.
+    try:
+        return False, reads.send(rows)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+def run_reads(session: Session, reads: Reads[T]) -> T:
+    done, value = _step(reads, None)
+    while not done:
+        done, value = _step(reads, session.execute(value).all())
+    return value
+
+
+async def run_reads_async(session: AsyncSession, reads: Reads[T]) -> T:
+    # Only the statements are awaited on the loop; the work between them
+    # (shaping rows, NumPy, the in-memory column store) runs in the threadpool.
+    done, value = await run_in_threadpool(_step, reads, None)
+    while not done:
+        rows = (await session.execute(value)).all()
+        done, value = await run_in_threadpool(_step, reads, rows)
+    return value
@@ -1,14 +1,61 @@
-from sqlalchemy import create_engine
+from fastapi import Request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
 
-from app.core.config import get_database_url
+from app.core.config import get_database_url, get_query_budget, get_sqlite_pragmas
 
-engine = create_engine(get_database_url(), connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+READ_METHODS = {"GET", "HEAD"}
 
 
-def get_db():
-    db = SessionLocal()
+def _is_file_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def apply_sqlite_pragmas(engine: Engine, pragmas: dict[str, str], read_only: bool = False) -> None:
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if value:
+                cursor.execute(f"PRAGMA {name}={value}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+
+def create_engines(url: str, pragmas: dict[str, str] | None = None) -> tuple[Engine, Engine]:
+    if not url.startswith("sqlite"):
+        engine = create_engine(url)
+        return engine, engine
+
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    if not _is_file_sqlite(url):
+        # In-memory databases are private to their connection; reads have to share it.
+        return engine, engine
+
+    pragmas = get_sqlite_pragmas() if pragmas is None else pragmas
+    read_engine = create_engine(url, connect_args={"check_same_thread": False})
+    apply_sqlite_pragmas(engine, pragmas)
+    # journal_mode is persistent in the database file; only the writer sets it.
+    apply_sqlite_pragmas(
+        read_engine,
+        {name: value for name, value in pragmas.items() if name != "journal_mode"},
+        read_only=True,
+    )
+    return engine, read_engine
+
+
+engine, read_engine = create_engines(get_database_url())
+session_info = {"query_budget": get_query_budget()}
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, info=session_info)
+ReadSessionLocal = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, info=session_info)
+
+
+def get_db(request: Request):
+    factory = ReadSessionLocal if request.method in READ_METHODS else SessionLocal
+    db = factory()
     try:
         yield db
     finally:
@@ -1,9 +1,52 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from app.api.routes import accounts, instruments, portfolio, simulations, valuations
+from app.api.routes import (
+    accounts,
+    exports,
+    fx_rates,
+    imports,
+    instruments,
+    jobs,
+    metrics,
+    portfolio,
+    portfolio_async,
+    simulations,
+    taxonomies,
+    transactions,
+    valuations,
+)
+from app.core.config import (
+    get_async_mode,
+    get_column_store_enabled,
+    get_metrics_enabled,
+    get_query_budget,
+    get_resume_jobs,
+    get_strict_loading,
+)
+from app.core.metrics import install_metrics
+from app.db.guards import install_query_budget, install_strict_loading
+from app.db.session import ReadSessionLocal, SessionLocal
+from app.services.columnar import valuation_store
+from app.services.imports import shutdown_validation_pool
+from app.services.jobs import job_runner
+
 
-app = FastAPI(title="Asset Tracker API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if get_column_store_enabled():
+        with ReadSessionLocal() as session:
+            valuation_store.load(session)
+    if get_resume_jobs():
+        job_runner.resume_interrupted(SessionLocal)
+    yield
+    job_runner.stop()
+    shutdown_validation_pool()
+
+
+app = FastAPI(title="Asset Tracker API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,11 +56,25 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+if get_metrics_enabled():
+    install_metrics(app)
+if get_strict_loading():
+    install_strict_loading()
+if get_query_budget():
+    install_query_budget()
+
 app.include_router(accounts.router, prefix="/api")
 app.include_router(instruments.router, prefix="/api")
 app.include_router(valuations.router, prefix="/api")
-app.include_router(portfolio.router, prefix="/api")
+app.include_router(fx_rates.router, prefix="/api")
+app.include_router(imports.router, prefix="/api")
+app.include_router(taxonomies.router, prefix="/api")
+app.include_router(transactions.router, prefix="/api")
+app.include_router(portfolio_async.router if get_async_mode() else portfolio.router, prefix="/api")
 app.include_router(simulations.router, prefix="/api")
+app.include_router(exports.router, prefix="/api")
+app.include_router(metrics.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
 
 
 @app.get("/api/health")
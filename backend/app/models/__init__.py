@@ -1,25 +1,34 @@
 from app.models.accounts import Account
 from app.models.contributions import ContributionAllocationRule, ContributionPlan
 from app.models.instruments import Instrument
-from app.models.portfolio import Position, Price, Transaction, Valuation
+from app.models.jobs import Job
+from app.models.portfolio import FxRate, Position, PositionCheckpoint, Price, Transaction, Valuation
+from app.models.snapshots import PortfolioSnapshot, PortfolioSnapshotTotal
 from app.models.taxonomies import (
     InstrumentClassification,
     TargetAllocation,
     Taxonomy,
     TaxonomyNode,
+    TaxonomyNodePath,
 )
 
 __all__ = [
     "Account",
     "ContributionAllocationRule",
     "ContributionPlan",
+    "FxRate",
     "Instrument",
+    "Job",
     "Position",
+    "PositionCheckpoint",
     "Price",
     "Transaction",
     "Valuation",
+    "PortfolioSnapshot",
+    "PortfolioSnapshotTotal",
     "InstrumentClassification",
     "TargetAllocation",
     "Taxonomy",
     "TaxonomyNode",
+    "TaxonomyNodePath",
 ]
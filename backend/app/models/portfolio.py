@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, Float, ForeignKey, Integer, String
+from sqlalchemy import Boolean, Column, Date, Float, ForeignKey, Index, Integer, String, false, func, literal_column, text
 from sqlalchemy.orm import relationship
 
 from app.models.base import Base
@@ -18,18 +18,38 @@ class Position(Base):
 
 class Price(Base):
     __tablename__ = "prices"
+    __table_args__ = (
+        Index("uq_prices_instrument_date", "instrument_id", "price_date", unique=True),
+        Index("uq_prices_import_hash", "import_hash", unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=False)
     price_date = Column(Date, nullable=False)
     price = Column(Float, nullable=False)
     currency = Column(String, nullable=False, default="JPY")
+    import_hash = Column(String, nullable=True)
 
     instrument = relationship("Instrument", back_populates="prices")
 
 
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+    __table_args__ = (Index("uq_fx_rates_currency_date", "currency", "rate_date", unique=True),)
+
+    id = Column(Integer, primary_key=True)
+    currency = Column(String, nullable=False)
+    rate_date = Column(Date, nullable=False)
+    # Yen per one unit of `currency`.
+    rate_jpy = Column(Float, nullable=False)
+
+
 class Valuation(Base):
     __tablename__ = "valuations"
+    __table_args__ = (
+        Index("ix_valuations_date_instrument_value", "valuation_date", "instrument_id", "value_jpy"),
+        Index("uq_valuations_import_hash", "import_hash", unique=True),
+    )
 
     id = Column(Integer, primary_key=True)
     account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
@@ -37,13 +57,61 @@ class Valuation(Base):
     position_id = Column(Integer, ForeignKey("positions.id"), nullable=True)
     valuation_date = Column(Date, nullable=False)
     value_jpy = Column(Float, nullable=False)
+    import_hash = Column(String, nullable=True)
 
     account = relationship("Account", back_populates="valuations")
     instrument = relationship("Instrument", back_populates="valuations")
 
 
+valuation_key_index = Index(
+    "uq_valuations_account_instrument_date",
+    Valuation.account_id,
+    func.coalesce(Valuation.instrument_id, literal_column("0")),
+    Valuation.valuation_date,
+    unique=True,
+)
+
+
+class PositionCheckpoint(Base):
+    __tablename__ = "position_checkpoints"
+    __table_args__ = (
+        Index(
+            "uq_position_checkpoints_account_instrument_date",
+            "account_id",
+            "instrument_id",
+            "checkpoint_date",
+            unique=True,
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=False)
+    checkpoint_date = Column(Date, nullable=False)
+    quantity = Column(Float, nullable=False)
+    cost_basis_jpy = Column(Float, nullable=False)
+    last_transaction_id = Column(Integer, nullable=False)
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index(
+            "ix_transactions_account_instrument_date",
+            "account_id",
+            "instrument_id",
+            "transaction_date",
+        ),
+        Index("ix_transactions_type_date", "transaction_type", "transaction_date", "amount_jpy"),
+        Index("uq_transactions_import_hash", "import_hash", unique=True),
+        # Only the rows the ledger has yet to replay.
+        Index(
+            "ix_transactions_ledger_pending",
+            "id",
+            sqlite_where=text("ledger_synced = 0"),
+            postgresql_where=text("NOT ledger_synced"),
+        ),
+    )
 
     id = Column(Integer, primary_key=True)
     account_id = Column(Integer, ForeignKey("accounts.id"), nullable=False)
@@ -52,6 +120,8 @@ class Transaction(Base):
     transaction_type = Column(String, nullable=False)
     quantity = Column(Float, nullable=True)
     amount_jpy = Column(Float, nullable=False)
+    import_hash = Column(String, nullable=True)
+    ledger_synced = Column(Boolean, nullable=False, default=False, server_default=false())
 
     account = relationship("Account", back_populates="transactions")
     instrument = relationship("Instrument", back_populates="transactions")
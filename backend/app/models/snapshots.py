@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Date, Float, ForeignKey, Integer
+
+from app.models.base import Base
+
+
+class PortfolioSnapshot(Base):
+    __tablename__ = "portfolio_snapshots"
+
+    snapshot_date = Column(Date, primary_key=True)
+    taxonomy_node_id = Column(Integer, ForeignKey("taxonomy_nodes.id"), primary_key=True)
+    value_jpy = Column(Float, nullable=False)
+
+
+class PortfolioSnapshotTotal(Base):
+    __tablename__ = "portfolio_snapshot_totals"
+
+    snapshot_date = Column(Date, primary_key=True)
+    total_value_jpy = Column(Float, nullable=False)
@@ -1,5 +1,19 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, String
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    delete,
+    event,
+    insert,
+    inspect,
+    literal,
+    or_,
+    select,
+)
+from sqlalchemy.orm import aliased, relationship
 
 from app.models.base import Base
 
@@ -15,6 +29,7 @@ class Taxonomy(Base):
 
 class TaxonomyNode(Base):
     __tablename__ = "taxonomy_nodes"
+    __table_args__ = (Index("ix_taxonomy_nodes_taxonomy", "taxonomy_id"),)
 
     id = Column(Integer, primary_key=True)
     taxonomy_id = Column(Integer, ForeignKey("taxonomies.id"), nullable=False)
@@ -26,8 +41,21 @@ class TaxonomyNode(Base):
     children = relationship("TaxonomyNode")
 
 
+class TaxonomyNodePath(Base):
+    __tablename__ = "taxonomy_node_paths"
+    __table_args__ = (Index("ix_taxonomy_node_paths_descendant", "descendant_id", "ancestor_id", "depth"),)
+
+    ancestor_id = Column(Integer, ForeignKey("taxonomy_nodes.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("taxonomy_nodes.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+
 class InstrumentClassification(Base):
     __tablename__ = "instrument_classifications"
+    __table_args__ = (
+        Index("ix_instrument_classifications_instrument_node", "instrument_id", "taxonomy_node_id"),
+        Index("ix_instrument_classifications_node_instrument", "taxonomy_node_id", "instrument_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=False)
@@ -39,6 +67,7 @@ class InstrumentClassification(Base):
 
 class TargetAllocation(Base):
     __tablename__ = "target_allocations"
+    __table_args__ = (Index("ix_target_allocations_taxonomy", "taxonomy_id"),)
 
     id = Column(Integer, primary_key=True)
     taxonomy_id = Column(Integer, ForeignKey("taxonomies.id"), nullable=False)
@@ -47,3 +76,50 @@ class TargetAllocation(Base):
 
     taxonomy = relationship("Taxonomy")
     taxonomy_node = relationship("TaxonomyNode")
+
+
+@event.listens_for(TaxonomyNode, "after_insert")
+def _insert_node_paths(mapper, connection, target: TaxonomyNode) -> None:
+    ancestors = select(
+        TaxonomyNodePath.ancestor_id, literal(target.id), TaxonomyNodePath.depth + 1
+    ).where(TaxonomyNodePath.descendant_id == target.parent_id)
+    connection.execute(
+        insert(TaxonomyNodePath).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            ancestors.union_all(select(literal(target.id), literal(target.id), literal(0))),
+        )
+    )
+
+
+@event.listens_for(TaxonomyNode, "after_update")
+def _move_node_paths(mapper, connection, target: TaxonomyNode) -> None:
+    if not inspect(target).attrs.parent_id.history.has_changes():
+        return
+    subtree = select(TaxonomyNodePath.descendant_id).where(TaxonomyNodePath.ancestor_id == target.id)
+    connection.execute(
+        delete(TaxonomyNodePath).where(
+            TaxonomyNodePath.descendant_id.in_(subtree),
+            TaxonomyNodePath.ancestor_id.not_in(subtree),
+        )
+    )
+    if target.parent_id is None:
+        return
+    above = aliased(TaxonomyNodePath)
+    below = aliased(TaxonomyNodePath)
+    connection.execute(
+        insert(TaxonomyNodePath).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+            .join(below, below.ancestor_id == target.id)
+            .where(above.descendant_id == target.parent_id),
+        )
+    )
+
+
+@event.listens_for(TaxonomyNode, "before_delete")
+def _delete_node_paths(mapper, connection, target: TaxonomyNode) -> None:
+    connection.execute(
+        delete(TaxonomyNodePath).where(
+            or_(TaxonomyNodePath.ancestor_id == target.id, TaxonomyNodePath.descendant_id == target.id)
+        )
+    )
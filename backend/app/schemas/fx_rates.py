@@ -0,0 +1,17 @@
+from datetime import date
+
+from pydantic import BaseModel, Field
+
+from app.schemas.valuations import BulkRowError
+
+
+class FxRateCreate(BaseModel):
+    currency: str = Field(..., pattern=r"^[A-Z]{3}$")
+    rate_date: date
+    rate_jpy: float = Field(..., gt=0)
+
+
+class BulkFxRateResult(BaseModel):
+    received: int
+    upserted: int
+    errors: list[BulkRowError]
@@ -0,0 +1,44 @@
+from datetime import date
+
+from pydantic import BaseModel, Field
+
+from app.schemas.valuations import BulkRowError
+
+
+class ImportedTransaction(BaseModel):
+    account_id: int
+    instrument_id: int | None = None
+    transaction_date: date
+    transaction_type: str
+    quantity: float | None = None
+    amount: float
+    currency: str = Field("JPY", pattern=r"^[A-Z]{3}$")
+    source_id: str | None = None
+
+
+class ImportedValuation(BaseModel):
+    account_id: int
+    instrument_id: int | None = None
+    valuation_date: date
+    value: float
+    currency: str = Field("JPY", pattern=r"^[A-Z]{3}$")
+
+
+class ImportedPrice(BaseModel):
+    instrument_id: int
+    price_date: date
+    price: float
+    currency: str = Field("JPY", pattern=r"^[A-Z]{3}$")
+
+
+class ImportCounts(BaseModel):
+    transactions: int = 0
+    valuations: int = 0
+    prices: int = 0
+
+
+class ImportResult(BaseModel):
+    received: int
+    inserted: ImportCounts
+    duplicates: int
+    errors: list[BulkRowError]
@@ -0,0 +1,54 @@
+from datetime import date, datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+from app.schemas.simulations import MAX_HORIZON_MONTHS
+
+
+class JobCreate(BaseModel):
+    kind: str
+    params: dict = Field(default_factory=dict)
+
+
+class JobRead(BaseModel):
+    id: int
+    kind: str
+    status: str
+    params: dict
+    completed: int
+    total: int | None = None
+    result: dict | None = None
+    error: str | None = None
+    cancel_requested: bool
+    created_at: datetime
+    started_at: datetime | None = None
+    updated_at: datetime | None = None
+    finished_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+
+
+class SnapshotRebuildParams(BaseModel):
+    start: date | None = None
+
+
+class MonteCarloParams(BaseModel):
+    horizon_months: int = Field(..., ge=1, le=MAX_HORIZON_MONTHS)
+    annual_return: float
+    monthly_contribution: float
+    start_value: float = 0.0
+    annual_volatility: float = Field(0.15, ge=0)
+    # Background runs are not bound by a request timeout, hence the higher cap
+    # than the forecast endpoint.
+    paths: int = Field(10_000, ge=1, le=1_000_000)
+    target_value: float | None = None
+    seed: int | None = None
+
+
+class ImportJobParams(BaseModel):
+    format: Literal["csv", "ofx"] = "csv"
+    kind: Literal["transactions", "valuations", "prices"] = "transactions"
+    account_id: int | None = None
+    mapping: dict[str, str] | None = None
@@ -1,9 +1,12 @@
+from datetime import date
+
 from pydantic import BaseModel
 
 
 class AllocationItem(BaseModel):
     taxonomy_node_id: int
     taxonomy_node_name: str
+    parent_id: int | None = None
     value_jpy: float
     weight: float
 
@@ -11,17 +14,73 @@ class AllocationItem(BaseModel):
 class DeviationItem(BaseModel):
     taxonomy_node_id: int
     taxonomy_node_name: str
+    parent_id: int | None = None
     actual_weight: float
     target_weight: float
     diff_weight_pp: float
     diff_value_jpy: float
 
 
+class MatrixNode(BaseModel):
+    taxonomy_node_id: int
+    taxonomy_node_name: str
+    parent_id: int | None = None
+
+
+class AllocationMatrix(BaseModel):
+    dates: list[date]
+    nodes: list[MatrixNode]
+    total_value_jpy: list[float]
+    value_jpy: list[list[float]]
+    weight: list[list[float]]
+
+
+class DeviationMatrix(BaseModel):
+    dates: list[date]
+    nodes: list[MatrixNode]
+    total_value_jpy: list[float]
+    target_weight: list[float]
+    actual_weight: list[list[float]]
+    diff_weight_pp: list[list[float]]
+    diff_value_jpy: list[list[float]]
+
+
+class TimeseriesBreakdownItem(BaseModel):
+    key_id: int | None = None
+    name: str
+    value_jpy: float
+
+
 class TimeseriesPoint(BaseModel):
     period: str
     total_value_jpy: float
+    net_flow_jpy: float | None = None
+    period_return: float | None = None
+    cumulative_return: float | None = None
+    drawdown: float | None = None
+    volatility: float | None = None
+    breakdown: list[TimeseriesBreakdownItem] | None = None
 
 
 class ForecastScenario(BaseModel):
     label: str
     values: list[float]
+
+
+class ColumnStoreStats(BaseModel):
+    loaded: bool
+    rows: int
+    dates: int
+    delta_dates: int
+    delta_rows: int
+    bytes: int
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    invalidations: int
+    size: int
+    maxsize: int
+    ttl_seconds: float
+    hit_ratio: float
@@ -1,14 +1,73 @@
-from pydantic import BaseModel
+from datetime import date
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+MAX_HORIZON_MONTHS = 1200
 
 
 class ForecastRequest(BaseModel):
-    horizon_months: int
+    horizon_months: int = Field(..., ge=0, le=MAX_HORIZON_MONTHS)
     annual_return: float
     monthly_contribution: float
     include_scenarios: bool = False
     scenario_delta: float = 0.01
+    mode: Literal["deterministic", "monte_carlo"] = "deterministic"
+    annual_volatility: float = Field(0.15, ge=0)
+    paths: int = Field(10_000, ge=1, le=100_000)
+    target_value: float | None = None
+    seed: int | None = None
 
 
 class ForecastResponse(BaseModel):
     start_value: float
     scenarios: list[dict]
+    percentiles: dict[str, list[float]] | None = None
+    target_probability: float | None = None
+
+
+class ForecastGridRequest(BaseModel):
+    horizon_months: int = Field(..., ge=0, le=MAX_HORIZON_MONTHS)
+    annual_returns: list[float] = Field(..., min_length=1)
+    monthly_contributions: list[float] = Field(..., min_length=1)
+    start_values: list[float] = Field(default_factory=lambda: [0.0], min_length=1)
+    include_values: bool = True
+
+
+class ForecastGridPoint(BaseModel):
+    start_value: float
+    annual_return: float
+    monthly_contribution: float
+    final_value: float
+    values: list[float] | None = None
+
+
+class ForecastGridResponse(BaseModel):
+    horizon_months: int
+    points: list[ForecastGridPoint]
+
+
+class ContributionPlanRequest(BaseModel):
+    plan_id: int
+    date: date
+    taxonomy: str = "asset_class"
+    horizon_months: int = Field(..., ge=1, le=MAX_HORIZON_MONTHS)
+    annual_return: float = 0.0
+
+
+class ContributionPlanNode(BaseModel):
+    taxonomy_node_id: int
+    taxonomy_node_name: str
+    target_weight: float
+    current_value_jpy: float
+    projected_value_jpy: float
+    projected_weight: float
+
+
+class ContributionPlanResponse(BaseModel):
+    plan_id: int
+    rebalance_mode: str
+    monthly_amount: float
+    nodes: list[ContributionPlanNode]
+    contributions: list[list[float]]
+    values: list[list[float]]
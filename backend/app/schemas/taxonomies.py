@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+
+
+class ClassificationCreate(BaseModel):
+    instrument_id: int
+    taxonomy_node_id: int
+
+
+class ClassificationRead(ClassificationCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class TargetAllocationCreate(BaseModel):
+    taxonomy_id: int
+    taxonomy_node_id: int
+    target_weight: float
+
+
+class TargetAllocationRead(TargetAllocationCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,33 @@
+from datetime import date
+
+from pydantic import BaseModel
+
+
+class TransactionCreate(BaseModel):
+    account_id: int
+    instrument_id: int | None = None
+    transaction_date: date
+    transaction_type: str
+    quantity: float | None = None
+    amount_jpy: float
+
+
+class TransactionRead(TransactionCreate):
+    id: int
+
+    class Config:
+        from_attributes = True
+
+
+class LedgerSyncResult(BaseModel):
+    positions: int
+    transactions: int
+    checkpoints: int
+
+
+class Holding(BaseModel):
+    account_id: int
+    instrument_id: int
+    as_of: date
+    quantity: float
+    cost_basis_jpy: float
@@ -16,3 +16,26 @@ class ValuationRead(ValuationCreate):
 
     class Config:
         from_attributes = True
+
+
+class BulkRowError(BaseModel):
+    row: int
+    errors: list[str]
+
+
+class BulkValuationResult(BaseModel):
+    received: int
+    upserted: int
+    errors: list[BulkRowError]
+
+
+class RevaluationRequest(BaseModel):
+    start: date
+    end: date
+    account_id: int | None = None
+
+
+class RevaluationResult(BaseModel):
+    positions: int
+    dates: int
+    upserted: int
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+from sqlalchemy import CTE, Date, Select, and_, case, column, func, literal_column, select, table, union_all
+from sqlalchemy.engine import Connection
+
+from app.models.portfolio import Valuation
+from app.services.calculations import OPEN_ENDED
+
+# Same expressions as uq_valuations_account_instrument_date, so the latest row
+# per holding is found by walking that index in key order.
+HOLDING_KEY = (Valuation.account_id, func.coalesce(Valuation.instrument_id, literal_column("0")))
+VALUATION_COLUMNS = (Valuation.valuation_date, Valuation.account_id, Valuation.instrument_id, Valuation.value_jpy)
+
+
+def holdings() -> CTE:
+    # A loose index scan: each step seeks the next (account, instrument) key in
+    # uq_valuations_account_instrument_date, so enumerating holdings costs a few
+    # index probes per holding rather than a pass over every valuation.
+    account, instrument = HOLDING_KEY
+    first = select(func.min(account)).scalar_subquery()
+    cte = select(
+        first.label("account_id"),
+        select(func.min(instrument)).where(account == first).scalar_subquery().label("instrument_key"),
+    ).cte("holdings", recursive=True)
+    same = select(func.min(instrument)).where(account == cte.c.account_id, instrument > cte.c.instrument_key)
+    following = select(func.min(account)).where(account > cte.c.account_id).correlate(cte).scalar_subquery()
+    same = same.correlate(cte).scalar_subquery()
+    return cte.union_all(
+        select(
+            case((same.is_(None), following), else_=cte.c.account_id),
+            func.coalesce(
+                same,
+                select(func.min(instrument)).where(account == following).correlate(cte).scalar_subquery(),
+            ),
+        ).where(cte.c.account_id.is_not(None))
+    )
+
+
+def _seeds(keys, before) -> Select:
+    # The latest valuation before `before` for each holding in `keys`, one
+    # (account, instrument, date <) index seek per holding.
+    latest = (
+        select(func.max(Valuation.valuation_date))
+        .where(
+            HOLDING_KEY[0] == keys.c.account_id,
+            HOLDING_KEY[1] == keys.c.instrument_key,
+            Valuation.valuation_date < before,
+        )
+        .correlate(keys)
+        .scalar_subquery()
+    )
+    return (
+        select(*VALUATION_COLUMNS)
+        .select_from(keys)
+        .join(
+            Valuation,
+            and_(
+                HOLDING_KEY[0] == keys.c.account_id,
+                HOLDING_KEY[1] == keys.c.instrument_key,
+                Valuation.valuation_date == latest,
+            ),
+        )
+        .where(keys.c.account_id.is_not(None))
+    )
+
+
+def as_of_seeds(start: date) -> Select:
+    return _seeds(holdings(), start)
+
+
+def as_of_rows(start: date | None = None, end: date | None = None) -> Select:
+    # Every valuation inside the range plus, for each holding, the latest one
+    # before `start`: that row is still in force when the range opens.
+    rows = select(*VALUATION_COLUMNS)
+    if start is not None:
+        rows = rows.where(Valuation.valuation_date >= start)
+    if end is not None:
+        rows = rows.where(Valuation.valuation_date <= end)
+    if start is None:
+        return rows
+    return union_all(as_of_seeds(start), rows)
+
+
+def in_force() -> Select:
+    # For each (account, instrument key, date) in `written`: the valuation in
+    # force on that date and the holding's next valuation date after it.
+    written = table("written", column("account_id"), column("instrument_key"), column("valuation_date"))
+    holding = and_(HOLDING_KEY[0] == written.c.account_id, HOLDING_KEY[1] == written.c.instrument_key)
+    current = (
+        select(func.max(Valuation.valuation_date))
+        .where(holding, Valuation.valuation_date <= written.c.valuation_date)
+        .correlate(written)
+        .scalar_subquery()
+    )
+    following = (
+        select(func.min(Valuation.valuation_date))
+        .where(holding, Valuation.valuation_date > written.c.valuation_date)
+        .correlate(written)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            written.c.account_id,
+            written.c.instrument_key,
+            written.c.valuation_date,
+            Valuation.valuation_date,
+            Valuation.value_jpy,
+            following,
+        )
+        .select_from(written)
+        .outerjoin(Valuation, and_(holding, Valuation.valuation_date == current))
+    )
+
+
+class CompiledInForce:
+    # Compiled once and fed the keys as a plain VALUES list, like
+    # CompiledValuationUpsert: building thousands of bound parameters through
+    # SQLAlchemy costs more than the index seeks themselves.
+    def __init__(self, connection: Connection) -> None:
+        dialect = connection.dialect
+        self.sql = in_force().compile(dialect=dialect).string
+        self.placeholder = "?" if dialect.paramstyle == "qmark" else "%s"
+        date_type = Date().dialect_impl(dialect)
+        self.bind_date = date_type.bind_processor(dialect) or (lambda value: value)
+        self.result_date = date_type.result_processor(dialect, None) or (lambda value: value)
+
+    def execute(self, connection: Connection, keys: list[tuple[int, int, date]]) -> list[tuple]:
+        row = f"({self.placeholder}, {self.placeholder}, {self.placeholder})"
+        parameters = []
+        for account_id, instrument_key, valuation_date in keys:
+            parameters += (account_id, instrument_key, self.bind_date(valuation_date))
+        result = connection.exec_driver_sql(
+            f"WITH written (account_id, instrument_key, valuation_date) AS (VALUES {', '.join([row] * len(keys))}) "
+            f"{self.sql}",
+            tuple(parameters),
+        )
+        parse = self.result_date
+        return [
+            (account_id, instrument_key, parse(written), parse(valuation_date), value, parse(following))
+            for account_id, instrument_key, written, valuation_date, value, following in result
+        ]
+
+
+def valuation_columns(rows: list) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    if not rows:
+        return (
+            np.empty(0, np.int32),
+            np.empty(0, np.int32),
+            np.empty(0, np.int32),
+            np.empty(0, np.float64),
+        )
+    valuation_dates, account_ids, instrument_ids, values = zip(*rows)
+    return (
+        np.fromiter((value.toordinal() for value in valuation_dates), np.int32, len(rows)),
+        np.array(account_ids, np.int32),
+        # Account-level valuations have no instrument; 0 never collides with a real id.
+        np.array([instrument_id or 0 for instrument_id in instrument_ids], np.int32),
+        np.array(values, np.float64),
+    )
+
+
+def holding_keys(account_ids: np.ndarray, instrument_ids: np.ndarray) -> np.ndarray:
+    return (account_ids.astype(np.int64) << 32) | instrument_ids.astype(np.int64)
+
+
+def next_valuation(keys: np.ndarray, ordinals: np.ndarray) -> np.ndarray:
+    # Rows ordered by holding then date stay in force until the holding's next row.
+    valid_to = np.full(len(ordinals), OPEN_ENDED, np.int64)
+    same = keys[1:] == keys[:-1]
+    valid_to[:-1][same] = ordinals[1:][same]
+    return valid_to
+
+
+def holding_spans(rows: list) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    ordinals, account_ids, instrument_ids, values = valuation_columns(rows)
+    keys = holding_keys(account_ids, instrument_ids)
+    order = np.lexsort((ordinals, keys))
+    ordinals = ordinals[order]
+    return (
+        account_ids[order],
+        instrument_ids[order],
+        ordinals,
+        next_valuation(keys[order], ordinals),
+        values[order],
+    )
@@ -1,5 +1,16 @@
 from __future__ import annotations
 
+from collections.abc import Iterator
+
+import numpy as np
+
+FORECAST_PERCENTILES = (5, 25, 50, 75, 95)
+PERIODS_PER_YEAR = {"day": 365, "week": 52, "month": 12, "quarter": 4, "year": 1}
+
+OPEN_ENDED = np.iinfo(np.int32).max
+
+_EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
 
 def calculate_allocation(values_by_node: dict[int, float]) -> dict[int, float]:
     total = sum(values_by_node.values())
@@ -28,16 +39,370 @@ def calculate_deviation(
     return deviations
 
 
+def forecast_batch(
+    start_values,
+    annual_returns,
+    monthly_contributions,
+    months: int,
+) -> np.ndarray:
+    # Closed-form annuity: V_n = V_0 (1 + r)^n + c ((1 + r)^n - 1) / r, for every
+    # broadcast combination of the parameter arrays and every horizon at once.
+    start = np.asarray(start_values, dtype=float)[..., None]
+    rate = np.asarray(annual_returns, dtype=float)[..., None] / 12
+    contribution = np.asarray(monthly_contributions, dtype=float)[..., None]
+    horizons = np.arange(months + 1)
+    growth = (1 + rate) ** horizons
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(rate == 0, horizons, (growth - 1) / rate)
+    return start * growth + contribution * annuity
+
+
 def forecast_values(
     start_value: float,
     annual_return: float,
     monthly_contribution: float,
     months: int,
 ) -> list[float]:
-    values = [start_value]
-    monthly_rate = annual_return / 12
-    current = start_value
-    for _ in range(months):
-        current = current * (1 + monthly_rate) + monthly_contribution
-        values.append(round(current, 2))
+    values = np.round(forecast_batch(start_value, annual_return, monthly_contribution, months), 2).tolist()
+    values[0] = start_value
     return values
+
+
+def allocate_to_targets(values: np.ndarray, target_weights: np.ndarray, amount: float) -> np.ndarray:
+    # Minimises sum((v + x - w * T)^2) with x >= 0 and sum(x) = amount by
+    # water-filling the gaps to target: x_i = max(gap_i - level, 0).
+    if amount <= 0 or values.size == 0:
+        return np.zeros_like(values, dtype=float)
+    gaps = target_weights * (values.sum() + amount) - values
+    ordered = np.sort(gaps)[::-1]
+    levels = (np.cumsum(ordered) - amount) / np.arange(1, ordered.size + 1)
+    # The first gap is always above its level, bar rounding when amount is tiny.
+    level = levels[max(np.count_nonzero(ordered > levels) - 1, 0)]
+    return np.maximum(gaps - level, 0.0)
+
+
+def project_contributions(
+    values: np.ndarray,
+    target_weights: np.ndarray,
+    monthly_amount: float,
+    fixed_amounts: np.ndarray,
+    rule_weights: np.ndarray,
+    months: int,
+    annual_return: float = 0.0,
+    rebalance_mode: str = "target",
+) -> tuple[np.ndarray, np.ndarray]:
+    fixed = fixed_amounts.astype(float)
+    if fixed.sum() > monthly_amount > 0:
+        fixed *= monthly_amount / fixed.sum()
+    remaining = max(monthly_amount - fixed.sum(), 0.0)
+
+    if rebalance_mode != "target":
+        weights = rule_weights if rule_weights.sum() > 0 else target_weights
+        split = fixed + (remaining * weights / weights.sum() if weights.sum() > 0 else 0.0)
+        contributions = np.broadcast_to(split, (months, split.size)).copy()
+        projected = forecast_batch(values, annual_return, split, months).T
+        return contributions, projected
+
+    weighted = remaining * rule_weights / max(rule_weights.sum(), 1.0)
+    scheduled = fixed + weighted
+    free_amount = remaining - weighted.sum()
+    growth = 1 + annual_return / 12
+    # Growth scales holdings and targets alike, so each month only adds this to
+    # the gaps to target.
+    drift = target_weights * (scheduled.sum() + free_amount) - scheduled
+    contributions = np.empty((months, values.size))
+    projected = np.empty((months + 1, values.size))
+    projected[0] = values.astype(float)
+    month, span = 0, 12
+    while month < months:
+        current = projected[month] * growth + scheduled
+        allocation = allocate_to_targets(current, target_weights, free_amount)
+        contributions[month] = scheduled + allocation
+        projected[month + 1] = current + allocation
+        month += 1
+        # Funding the same nodes again, every month gives each its drift less an
+        # equal share of what the free amount falls short of. Project the next
+        # span of months with that in closed form and keep those for which
+        # water-filling picks it; the span starts at a year and doubles while it
+        # holds.
+        funded = allocation > 0
+        if funded.any():
+            allocation = np.where(funded, drift - (drift[funded].sum() - free_amount) / funded.sum(), 0.0)
+        monthly = scheduled + allocation
+        steady = forecast_batch(projected[month], annual_return, monthly, min(span, months - month)).T[1:]
+        kept = _steady_allocation_months(
+            np.vstack([projected[month], steady[:-1]]) * growth + scheduled,
+            target_weights,
+            allocation,
+            free_amount,
+        )
+        contributions[month : month + kept] = monthly
+        projected[month + 1 : month + 1 + kept] = steady[:kept]
+        month += kept
+        span = span * 2 if kept == len(steady) else 12
+    return contributions, projected
+
+
+def _steady_allocation_months(
+    current: np.ndarray, target_weights: np.ndarray, allocation: np.ndarray, amount: float
+) -> int:
+    # Leading rows of current (one per month) for which allocate_to_targets would
+    # return allocation again: one water level across the funded nodes, and no
+    # unfunded node with a gap above it.
+    if (allocation < 0).any():
+        return 0
+    funded = allocation > 0
+    if not funded.any():
+        return len(current)
+    totals = current.sum(axis=1, keepdims=True) + amount
+    gaps = target_weights * totals - current
+    levels = gaps[:, funded] - allocation[funded]
+    level = levels.mean(axis=1, keepdims=True)
+    tolerance = 1e-12 * np.abs(totals)
+    steady = (np.ptp(levels, axis=1, keepdims=True) <= tolerance) & (
+        gaps[:, ~funded] <= level + tolerance
+    ).all(axis=1, keepdims=True)
+    return len(current) if steady.all() else int(np.argmin(steady[:, 0]))
+
+
+def monte_carlo_state(start_value: float, months: int, paths: int, seed: int | None = None) -> dict:
+    bands = np.empty((len(FORECAST_PERCENTILES), months + 1))
+    bands[:, 0] = start_value
+    return {
+        "month": 0,
+        "rng": np.random.default_rng(seed),
+        "bands": bands,
+        "log_growth": np.zeros(paths, dtype=np.float32),
+        "discounted_contributions": np.zeros(paths, dtype=np.float32),
+        "final_values": np.full(paths, start_value, dtype=np.float32),
+    }
+
+
+def _percentile_rows(values: np.ndarray, percentiles: tuple[int, ...]) -> np.ndarray:
+    # np.percentile's linear interpolation. Sorting each row in place is several
+    # times faster than a multi-kth np.partition with numpy's vectorised sort.
+    values.sort(axis=1)
+    last = values.shape[1] - 1
+    ranks = np.asarray(percentiles) / 100 * last
+    lower = np.floor(ranks).astype(np.intp)
+    upper = np.minimum(lower + 1, last)
+    low = values[:, lower].astype(np.float64)
+    return (low + (values[:, upper] - low) * (ranks - lower)).T
+
+
+def _standard_normal(rng: np.random.Generator, rows: int, count: int) -> np.ndarray:
+    # Box-Muller over float32 uniforms, well ahead of the float32 ziggurat sampler
+    # here; its tail stops at 5.8 sigma, far outside the outermost band.
+    pairs = (count + 1) // 2
+    uniform = rng.random((2, rows, pairs), dtype=np.float32)
+    radius = np.log1p(-uniform[0])
+    radius *= -2
+    np.sqrt(radius, out=radius)
+    angle = uniform[1] * np.float32(2 * np.pi)
+    normal = np.empty((rows, 2 * pairs), dtype=np.float32)
+    np.multiply(radius, np.cos(angle), out=normal[:, :pairs])
+    np.multiply(radius, np.sin(angle), out=normal[:, pairs:])
+    return normal[:, :count]
+
+
+def _cumsum_rows(values: np.ndarray) -> None:
+    # np.cumsum(axis=0) in place, but as one contiguous vector add per month.
+    for row in range(1, len(values)):
+        np.add(values[row - 1], values[row], out=values[row])
+
+
+def advance_forecast(
+    state: dict,
+    start_value: float,
+    annual_return: float,
+    annual_volatility: float,
+    monthly_contribution: float,
+    months: int,
+    block_months: int = 24,
+) -> Iterator[dict]:
+    # Lognormal monthly growth whose mean matches the deterministic monthly rate.
+    # Yields `state` after every block; it holds everything needed to continue.
+    rng = state["rng"]
+    sigma = annual_volatility / np.sqrt(12)
+    mu = np.log1p(annual_return / 12) - sigma**2 / 2
+    paths = len(state["log_growth"])
+    half = (paths + 1) // 2
+    # V_t = G_t * (V_0 + c * sum(1 / G_k)), carried across blocks of months so
+    # memory stays bounded at block_months x paths. Paths are float32 throughout;
+    # the bands are quantiles over them, far coarser than its precision.
+    for block_start in range(state["month"], months, block_months):
+        block = min(block_months, months - block_start)
+        # Antithetic pairs: the second half of the paths mirrors the shocks of
+        # the first, which halves the draws and cancels their odd moments.
+        shocks = _standard_normal(rng, block, half)
+        cumulative = np.empty((block, paths), dtype=np.float32)
+        cumulative[:, :half] = shocks
+        np.negative(shocks[:, : paths - half], out=cumulative[:, half:])
+        cumulative *= np.float32(sigma)
+        cumulative += np.float32(mu)
+        cumulative[0] += state["log_growth"]
+        _cumsum_rows(cumulative)
+        state["log_growth"] = cumulative[-1].copy()
+
+        values = np.exp(-cumulative)
+        values[0] += state["discounted_contributions"]
+        _cumsum_rows(values)
+        state["discounted_contributions"] = values[-1].copy()
+        values *= np.float32(monthly_contribution)
+        values += np.float32(start_value)
+        values *= np.exp(cumulative, out=cumulative)
+
+        state["final_values"] = values[-1].copy()
+        state["bands"][:, block_start + 1 : block_start + 1 + block] = _percentile_rows(values, FORECAST_PERCENTILES)
+        state["month"] = block_start + block
+        yield state
+
+
+def forecast_summary(state: dict, target_value: float | None = None) -> dict:
+    result = {
+        "percentiles": {
+            f"p{percentile}": np.round(band, 2).tolist()
+            for percentile, band in zip(FORECAST_PERCENTILES, state["bands"])
+        },
+        "target_probability": None,
+    }
+    if target_value is not None:
+        result["target_probability"] = float(np.mean(state["final_values"] >= target_value))
+    return result
+
+
+def simulate_forecast(
+    start_value: float,
+    annual_return: float,
+    annual_volatility: float,
+    monthly_contribution: float,
+    months: int,
+    paths: int,
+    target_value: float | None = None,
+    seed: int | None = None,
+    block_months: int = 24,
+) -> dict:
+    state = monte_carlo_state(start_value, months, paths, seed)
+    for _ in advance_forecast(
+        state, start_value, annual_return, annual_volatility, monthly_contribution, months, block_months
+    ):
+        pass
+    return forecast_summary(state, target_value)
+
+
+def period_keys(ordinals: np.ndarray, group_by: str) -> np.ndarray:
+    days = ordinals.astype(np.int64) - _EPOCH_ORDINAL
+    if group_by == "day":
+        return days
+    if group_by == "week":
+        # 1970-01-01 was a Thursday; shift every day back to its ISO Monday.
+        return days - (days + 3) % 7
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    if group_by == "month":
+        return months
+    if group_by == "quarter":
+        return months // 3
+    if group_by == "year":
+        return months // 12
+    raise ValueError(f"Unsupported group_by: {group_by}")
+
+
+def period_label(key: int, group_by: str) -> str:
+    if group_by == "day":
+        return str(np.datetime64(key, "D"))
+    if group_by == "week":
+        year, week, _ = np.datetime64(key, "D").item().isocalendar()
+        return f"{year}-W{week:02d}"
+    if group_by == "month":
+        return str(np.datetime64(key, "M"))
+    if group_by == "quarter":
+        return f"{1970 + key // 4}-Q{key % 4 + 1}"
+    return str(1970 + key)
+
+
+def period_ends(keys: np.ndarray) -> np.ndarray:
+    if not len(keys):
+        return np.empty(0, np.int64)
+    return np.flatnonzero(np.concatenate((keys[1:] != keys[:-1], [True])))
+
+
+def carry_forward(
+    days: np.ndarray,
+    valid_from: np.ndarray,
+    valid_to: np.ndarray,
+    values: np.ndarray,
+    keys: np.ndarray | None = None,
+    n_keys: int = 1,
+) -> np.ndarray:
+    # Each span adds its value from the first day it covers and takes it back on
+    # the day it is superseded, so a running sum over days yields as-of values
+    # in O(spans + days) instead of one lookup per (day, holding).
+    slots = len(days) + 1
+    start = np.searchsorted(days, valid_from)
+    stop = np.searchsorted(days, valid_to)
+    if keys is not None:
+        start = start * n_keys + keys
+        stop = stop * n_keys + keys
+    size = slots * n_keys
+    diff = np.bincount(start, values, size) - np.bincount(stop, values, size)
+    return np.cumsum(diff.reshape(slots, n_keys), axis=0)[:-1]
+
+
+def timeseries_metrics(
+    closing_values: np.ndarray,
+    net_flows: np.ndarray,
+    window: int,
+    periods_per_year: int,
+) -> dict[str, np.ndarray]:
+    count = len(closing_values)
+    returns = np.full(count, np.nan)
+    if count > 1:
+        previous = closing_values[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Flows are treated as arriving at period end, so a deposit does not
+            # show up as performance: r = (V_t - F_t) / V_{t-1} - 1.
+            returns[1:] = np.where(previous > 0, (closing_values[1:] - net_flows[1:]) / previous - 1, np.nan)
+    growth = np.cumprod(1 + np.nan_to_num(returns))
+    cumulative = growth - 1
+    drawdown = growth / np.maximum.accumulate(growth) - 1
+
+    volatility = np.full(count, np.nan)
+    if count > window:
+        windows = np.lib.stride_tricks.sliding_window_view(returns[1:], window)
+        volatility[window:] = windows.std(axis=1, ddof=1) * np.sqrt(periods_per_year)
+    cumulative[0] = drawdown[0] = 0.0
+    return {
+        "period_return": returns,
+        "cumulative_return": cumulative,
+        "drawdown": drawdown,
+        "volatility": volatility,
+    }
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    count = len(x)
+    if max_points >= count or max_points < 3:
+        return np.arange(count)
+    interior = count - 2
+    buckets = max_points - 2
+    edges = np.linspace(0, interior, buckets + 1).astype(np.int64)
+    starts, sizes = edges[:-1], np.diff(edges)
+    inner_x, inner_y = x[1:-1].astype(np.float64), y[1:-1].astype(np.float64)
+    mean_x = np.add.reduceat(inner_x, starts) / sizes
+    mean_y = np.add.reduceat(inner_y, starts) / sizes
+
+    # Classic LTTB anchors each bucket on the point picked in the previous one,
+    # which forces a sequential loop. Anchoring on the previous bucket's mean
+    # instead makes every bucket independent, so the whole pass vectorises.
+    previous_x = np.concatenate(([x[0]], mean_x[:-1]))
+    previous_y = np.concatenate(([y[0]], mean_y[:-1]))
+    next_x = np.concatenate((mean_x[1:], [x[-1]]))
+    next_y = np.concatenate((mean_y[1:], [y[-1]]))
+    bucket = np.repeat(np.arange(buckets), sizes)
+    area = np.abs(
+        (previous_x[bucket] - next_x[bucket]) * (inner_y - previous_y[bucket])
+        - (previous_x[bucket] - inner_x) * (next_y[bucket] - previous_y[bucket])
+    )
+    best = np.flatnonzero(area == np.repeat(np.maximum.reduceat(area, starts), sizes))
+    first = best[np.concatenate(([True], bucket[best][1:] != bucket[best][:-1]))]
+    return np.concatenate(([0], first + 1, [count - 1]))
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Iterable
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.portfolio import Valuation
+from app.services.asof import holding_keys, next_valuation, valuation_columns
+from app.services.calculations import carry_forward
+from app.services.snapshots import classified_spans
+
+STORE_LOAD_BATCH = 100_000
+STORE_REFRESH_CHUNK = 500
+STORE_COMPACT_DATES = 256
+
+
+class ValuationColumnStore:
+    def __init__(self, compact_dates: int = STORE_COMPACT_DATES) -> None:
+        self.compact_dates = compact_dates
+        self.loaded = False
+        self._lock = threading.Lock()
+        self.replace(*valuation_columns([]))
+        self.loaded = False
+
+    def replace(
+        self,
+        ordinals: np.ndarray,
+        account_ids: np.ndarray,
+        instrument_ids: np.ndarray,
+        values: np.ndarray,
+    ) -> None:
+        order = np.argsort(ordinals, kind="stable")
+        with self._lock:
+            self.ordinals = ordinals[order]
+            self.account_ids = account_ids[order]
+            self.instrument_ids = instrument_ids[order]
+            self.values = values[order]
+            self._delta: dict[int, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+            self._reindex()
+            self.loaded = True
+
+    def _reindex(self) -> None:
+        self._days = np.unique(self.ordinals)
+        keys = holding_keys(self.account_ids, self.instrument_ids)
+        # The base is date-ordered, so a stable sort by holding leaves each
+        # holding's rows in date order; that is all carry-forward needs.
+        self._by_holding = np.argsort(keys, kind="stable")
+        keys = keys[self._by_holding]
+        ordinals = self.ordinals[self._by_holding]
+        self._holding_starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))[: len(keys)]
+        self._day_totals = carry_forward(
+            self._days, ordinals, next_valuation(keys, ordinals), self.values[self._by_holding]
+        )[:, 0]
+        self._carried = None
+        self._spans = None
+        self._groups = {}
+
+    def load(self, session: Session) -> None:
+        statement = select(
+            Valuation.valuation_date, Valuation.account_id, Valuation.instrument_id, Valuation.value_jpy
+        ).execution_options(yield_per=STORE_LOAD_BATCH)
+        parts = [valuation_columns(partition) for partition in session.execute(statement).partitions()]
+        if not parts:
+            parts = [valuation_columns([])]
+        self.replace(*(np.concatenate(column) for column in zip(*parts)))
+
+    def clear(self) -> None:
+        self.replace(*valuation_columns([]))
+        self.loaded = False
+
+    def refresh_dates(self, session: Session, dates: Iterable[date]) -> None:
+        if not self.loaded:
+            return
+        dates = sorted(set(dates))
+        for start in range(0, len(dates), STORE_REFRESH_CHUNK):
+            chunk = dates[start : start + STORE_REFRESH_CHUNK]
+            rows = session.execute(
+                select(
+                    Valuation.valuation_date,
+                    Valuation.account_id,
+                    Valuation.instrument_id,
+                    Valuation.value_jpy,
+                ).where(Valuation.valuation_date.in_(chunk))
+            ).all()
+            ordinals, account_ids, instrument_ids, values = valuation_columns(rows)
+            with self._lock:
+                # Refreshed dates shadow the base arrays until the next compaction,
+                # so a single write costs a few small arrays instead of a full copy.
+                for valuation_date in chunk:
+                    mask = ordinals == valuation_date.toordinal()
+                    self._delta[valuation_date.toordinal()] = (
+                        account_ids[mask],
+                        instrument_ids[mask],
+                        values[mask],
+                    )
+                self._carried = None
+                self._spans = None
+                self._groups = {}
+                if len(self._delta) > self.compact_dates:
+                    self._compact()
+
+    def _compact(self) -> None:
+        keep = ~np.isin(self.ordinals, np.fromiter(self._delta, np.int32, len(self._delta)))
+        delta = sorted(self._delta.items())
+        ordinals = np.concatenate(
+            [self.ordinals[keep]] + [np.full(len(columns[0]), ordinal, np.int32) for ordinal, columns in delta]
+        )
+        account_ids = np.concatenate([self.account_ids[keep]] + [columns[0] for _, columns in delta])
+        instrument_ids = np.concatenate([self.instrument_ids[keep]] + [columns[1] for _, columns in delta])
+        values = np.concatenate([self.values[keep]] + [columns[2] for _, columns in delta])
+        order = np.argsort(ordinals, kind="stable")
+        self.ordinals = ordinals[order]
+        self.account_ids = account_ids[order]
+        self.instrument_ids = instrument_ids[order]
+        self.values = values[order]
+        self._delta = {}
+        self._reindex()
+
+    def _carry_delta(self) -> tuple[np.ndarray, np.ndarray]:
+        # Totals before the earliest refreshed date are unaffected. From there on,
+        # each holding is seeded with its last base row before that date and
+        # replayed over the later base rows plus the refreshed ones.
+        first = min(self._delta)
+        before = self.ordinals[self._by_holding] < first
+        counts = np.add.reduceat(before, self._holding_starts) if len(self._holding_starts) else before[:0]
+        seeds = self._by_holding[self._holding_starts[counts > 0] + counts[counts > 0] - 1]
+        later = np.arange(np.searchsorted(self.ordinals, first), len(self.ordinals))
+        later = later[~np.isin(self.ordinals[later], np.fromiter(self._delta, np.int32, len(self._delta)))]
+        rows = np.concatenate([seeds, later])
+        delta = sorted(self._delta.items())
+        ordinals = np.concatenate(
+            [self.ordinals[rows]] + [np.full(len(columns[0]), ordinal, np.int32) for ordinal, columns in delta]
+        )
+        keys = np.concatenate(
+            [holding_keys(self.account_ids[rows], self.instrument_ids[rows])]
+            + [holding_keys(columns[0], columns[1]) for _, columns in delta]
+        )
+        values = np.concatenate([self.values[rows]] + [columns[2] for _, columns in delta])
+        order = np.lexsort((ordinals, keys))
+        keys, ordinals, values = keys[order], ordinals[order], values[order]
+        days = np.unique(ordinals[ordinals >= first])
+        totals = carry_forward(days, ordinals, next_valuation(keys, ordinals), values)[:, 0]
+        keep = self._days < first
+        return np.concatenate([self._days[keep], days]), np.concatenate([self._day_totals[keep], totals])
+
+    def daily_totals(self, start: date, end: date) -> tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            if not self._delta:
+                days, totals = self._days, self._day_totals
+            else:
+                if self._carried is None:
+                    self._carried = self._carry_delta()
+                days, totals = self._carried
+        low, high = np.searchsorted(days, [start.toordinal(), end.toordinal() + 1])
+        return days[low:high], totals[low:high]
+
+    def _holding_spans(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        # Every row as a span (holding, valid from, valid to, value) ordered by
+        # holding then date, with refreshed dates replacing their base rows.
+        if self._spans is not None:
+            return self._spans
+        if not self._delta:
+            rows = self._by_holding
+            account_ids, instrument_ids = self.account_ids[rows], self.instrument_ids[rows]
+            ordinals, values = self.ordinals[rows], self.values[rows]
+            keys = holding_keys(account_ids, instrument_ids)
+        else:
+            keep = np.flatnonzero(~np.isin(self.ordinals, np.fromiter(self._delta, np.int32, len(self._delta))))
+            delta = sorted(self._delta.items())
+            ordinals = np.concatenate(
+                [self.ordinals[keep]] + [np.full(len(columns[0]), ordinal, np.int32) for ordinal, columns in delta]
+            )
+            account_ids = np.concatenate([self.account_ids[keep]] + [columns[0] for _, columns in delta])
+            instrument_ids = np.concatenate([self.instrument_ids[keep]] + [columns[1] for _, columns in delta])
+            values = np.concatenate([self.values[keep]] + [columns[2] for _, columns in delta])
+            keys = holding_keys(account_ids, instrument_ids)
+            order = np.lexsort((ordinals, keys))
+            account_ids, instrument_ids, ordinals, values, keys = (
+                column[order] for column in (account_ids, instrument_ids, ordinals, values, keys)
+            )
+        self._spans = (account_ids, instrument_ids, ordinals, next_valuation(keys, ordinals), values)
+        return self._spans
+
+    def _group_index(self, by: str) -> tuple[np.ndarray, np.ndarray]:
+        # Distinct accounts or instruments and each span's position among them,
+        # kept until the spans change.
+        if by not in self._groups:
+            account_ids, instrument_ids = self._holding_spans()[:2]
+            self._groups[by] = np.unique(account_ids if by == "account" else instrument_ids, return_inverse=True)
+        return self._groups[by]
+
+    def holding_totals(self, ordinals: np.ndarray, by: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # As-of sums per account or instrument on each of the sorted `ordinals`,
+        # plus whether any holding of the group was in force there.
+        with self._lock:
+            _, _, valid_from, valid_to, values = self._holding_spans()
+            group_ids, groups = self._group_index(by)
+        return group_ids, *_grouped(ordinals, valid_from, valid_to, values, groups, len(group_ids))
+
+    def node_totals(
+        self,
+        ordinals: np.ndarray,
+        pairs: tuple[np.ndarray, np.ndarray] | None,
+        paths: tuple[np.ndarray, np.ndarray] | None = None,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # The snapshot sums per taxonomy node, straight from the valuations:
+        # `pairs` classifies instruments into nodes and, when given, the closure
+        # `paths` (descendant, ancestor) also credit every ancestor of a node.
+        with self._lock:
+            _, instrument_ids, valid_from, valid_to, values = self._holding_spans()
+            instruments, inverse = self._group_index("instrument")
+        classified = classified_spans(pairs, instruments)
+        if classified is None:
+            return np.empty(0, np.int64), np.zeros((len(ordinals), 0)), np.zeros((len(ordinals), 0), bool)
+        spans, node_ids, node_index = classified
+        if np.all(spans[1:] != spans[:-1]):
+            # One node per instrument, the usual case: classify the distinct
+            # instruments and look every span's node up through the index.
+            lookup = np.full(len(instruments), -1)
+            lookup[spans] = node_index
+            columns = lookup[inverse]
+            spans = np.flatnonzero(columns >= 0)
+            node_index = columns[spans]
+        else:
+            spans, node_ids, node_index = classified_spans(pairs, instrument_ids)
+        sums, present = _grouped(ordinals, valid_from[spans], valid_to[spans], values[spans], node_index, len(node_ids))
+        if paths is not None:
+            # Subtree sums: one (node x ancestor) incidence matrix built from the
+            # closure pairs, shared by every requested day.
+            descendants, ancestors = paths
+            known = np.isin(descendants, node_ids)
+            ancestor_ids, ancestor_index = np.unique(ancestors[known], return_inverse=True)
+            incidence = np.zeros((len(node_ids), len(ancestor_ids)))
+            incidence[np.searchsorted(node_ids, descendants[known]), ancestor_index] = 1
+            node_ids, sums, present = ancestor_ids, sums @ incidence, present @ incidence > 0
+        return node_ids, sums, present
+
+    def stats(self) -> dict:
+        with self._lock:
+            base = [self.ordinals, self.account_ids, self.instrument_ids, self.values]
+            index = [self._days, self._day_totals, self._by_holding, self._holding_starts]
+            delta = [array for columns in self._delta.values() for array in columns]
+            # Spans for the group-bys are built on first use and kept until the next write.
+            spans = list(self._spans or ()) + [array for group in self._groups.values() for array in group]
+            return {
+                "loaded": self.loaded,
+                "rows": len(self.values),
+                "dates": len(self._days),
+                "delta_dates": len(self._delta),
+                "delta_rows": sum(len(columns[2]) for columns in self._delta.values()),
+                "bytes": sum(array.nbytes for array in base + index + delta + spans),
+            }
+
+
+def _grouped(
+    ordinals: np.ndarray,
+    valid_from: np.ndarray,
+    valid_to: np.ndarray,
+    values: np.ndarray,
+    groups: np.ndarray,
+    n_groups: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    # carry_forward with two changes: span positions come from a per-day table
+    # over the requested range (a few thousand days) instead of a binary search
+    # per span, and they are shared by the sums and the span counts. Counting
+    # keeps a group on days it is worth zero, as the snapshot tables do.
+    if not len(ordinals):
+        return np.zeros((0, n_groups)), np.zeros((0, n_groups), bool)
+    first, last = int(ordinals[0]), int(ordinals[-1]) + 1
+    table = np.searchsorted(ordinals, np.arange(first, last + 1))
+    size = (len(ordinals) + 1) * n_groups
+    start = table[np.clip(valid_from, first, last) - first] * n_groups + groups
+    stop = table[np.clip(valid_to, first, last) - first] * n_groups + groups
+
+    def running(weights: np.ndarray | None) -> np.ndarray:
+        diff = np.bincount(start, weights, size) - np.bincount(stop, weights, size)
+        return np.cumsum(diff.reshape(-1, n_groups), axis=0)[:-1]
+
+    return running(values), running(None) > 0
+
+
+valuation_store = ValuationColumnStore()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+from sqlalchemy.orm import Session, selectinload
+
+from app.models.contributions import ContributionPlan
+from app.models.taxonomies import TargetAllocation, Taxonomy, TaxonomyNode
+from app.services.calculations import forecast_batch, project_contributions
+from app.services.portfolio import get_allocation
+
+
+def project_contribution_plan(
+    session: Session,
+    plan_id: int,
+    as_of: date,
+    taxonomy: str,
+    months: int,
+    annual_return: float = 0.0,
+) -> dict | None:
+    plan = (
+        session.query(ContributionPlan)
+        .options(selectinload(ContributionPlan.allocation_rules))
+        .filter(ContributionPlan.id == plan_id)
+        .one_or_none()
+    )
+    if plan is None:
+        return None
+
+    nodes = (
+        session.query(TaxonomyNode.id, TaxonomyNode.name)
+        .join(Taxonomy)
+        .filter(Taxonomy.name == taxonomy)
+        .order_by(TaxonomyNode.id)
+        .all()
+    )
+    index = {node.id: position for position, node in enumerate(nodes)}
+    current_values = np.zeros(len(nodes))
+    for item in get_allocation(session, as_of, taxonomy):
+        current_values[index[item["taxonomy_node_id"]]] = item["value_jpy"]
+    target_weights = np.zeros(len(nodes))
+    targets = session.query(TargetAllocation).join(Taxonomy).filter(Taxonomy.name == taxonomy).all()
+    for target in targets:
+        if target.taxonomy_node_id in index:
+            target_weights[index[target.taxonomy_node_id]] = target.target_weight
+    fixed_amounts = np.zeros(len(nodes))
+    rule_weights = np.zeros(len(nodes))
+    for rule in plan.allocation_rules:
+        if rule.taxonomy_node_id not in index:
+            continue
+        fixed_amounts[index[rule.taxonomy_node_id]] += rule.fixed_amount or 0.0
+        rule_weights[index[rule.taxonomy_node_id]] += rule.weight or 0.0
+
+    # Holdings only grow until the plan's first month; inactive plans never pay in.
+    idle_months = _months_before(as_of, plan.start_date, months) if plan.is_active else months
+    idle = forecast_batch(current_values, annual_return, 0.0, idle_months).T
+    contributions, projected = project_contributions(
+        idle[-1],
+        target_weights,
+        plan.monthly_amount,
+        fixed_amounts,
+        rule_weights,
+        months - idle_months,
+        annual_return=annual_return,
+        rebalance_mode=plan.rebalance_mode,
+    )
+    contributions = np.vstack([np.zeros((idle_months, len(nodes))), contributions])
+    projected = np.vstack([idle[:-1], projected])
+    final_values = projected[-1]
+    final_total = final_values.sum()
+    return {
+        "plan_id": plan.id,
+        "rebalance_mode": plan.rebalance_mode,
+        "monthly_amount": plan.monthly_amount,
+        "nodes": [
+            {
+                "taxonomy_node_id": node.id,
+                "taxonomy_node_name": node.name,
+                "target_weight": float(target_weights[position]),
+                "current_value_jpy": float(current_values[position]),
+                "projected_value_jpy": round(float(final_values[position]), 2),
+                "projected_weight": float(final_values[position] / final_total) if final_total else 0.0,
+            }
+            for position, node in enumerate(nodes)
+        ],
+        "contributions": np.round(contributions, 2).tolist(),
+        "values": np.round(projected, 2).tolist(),
+    }
+
+
+def _months_before(as_of: date, start: date, months: int) -> int:
+    # Projected month 0 is the month after as_of; the plan pays from its start month.
+    return min(max((start.year - as_of.year) * 12 + start.month - as_of.month - 1, 0), months)
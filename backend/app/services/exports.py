@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.portfolio import Price, Transaction, Valuation
+
+EXPORT_BATCH_SIZE = 10_000
+
+
+@dataclass(frozen=True)
+class ExportSource:
+    model: type
+    date_column: str
+    columns: tuple[str, ...]
+
+    def column_types(self) -> list[tuple[str, type]]:
+        table = self.model.__table__
+        return [(name, table.c[name].type.python_type) for name in self.columns]
+
+
+EXPORT_SOURCES = {
+    "valuations": ExportSource(
+        Valuation,
+        "valuation_date",
+        ("id", "account_id", "instrument_id", "valuation_date", "value_jpy"),
+    ),
+    "transactions": ExportSource(
+        Transaction,
+        "transaction_date",
+        ("id", "account_id", "instrument_id", "transaction_date", "transaction_type", "quantity", "amount_jpy"),
+    ),
+    "prices": ExportSource(Price, "price_date", ("id", "instrument_id", "price_date", "price", "currency")),
+}
+
+
+def export_batches(
+    session: Session,
+    source: ExportSource,
+    *,
+    account_id: int | None = None,
+    instrument_id: int | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[list[tuple]]:
+    model = source.model
+    statement = select(*(getattr(model, name) for name in source.columns))
+    if account_id is not None:
+        statement = statement.where(model.account_id == account_id)
+    if instrument_id is not None:
+        statement = statement.where(model.instrument_id == instrument_id)
+    date_column = getattr(model, source.date_column)
+    if start is not None:
+        statement = statement.where(date_column >= start)
+    if end is not None:
+        statement = statement.where(date_column <= end)
+    # Primary-key order walks the table without a sort step, so the database
+    # streams rows instead of materialising the result before the first batch.
+    statement = statement.order_by(model.id).execution_options(yield_per=batch_size)
+    for partition in session.execute(statement).partitions():
+        yield [tuple(row) for row in partition]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import get_fx_cache_ttl
+from app.core.validation import format_validation_errors
+from app.models.portfolio import FxRate
+from app.schemas.fx_rates import FxRateCreate
+
+BASE_CURRENCY = "JPY"
+FX_BATCH_SIZE = 5000
+
+
+def upsert_fx_rate_statement(dialect_name: str):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(FxRate.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["currency", "rate_date"], set_={"rate_jpy": stmt.excluded.rate_jpy}
+    )
+
+
+class FxRateLoader:
+    def __init__(self, session: Session, batch_size: int = FX_BATCH_SIZE) -> None:
+        self.session = session
+        self.batch_size = batch_size
+        self.received = 0
+        self.upserted = 0
+        self.errors: list[dict] = []
+        self.currencies: set[str] = set()
+        self._statement = upsert_fx_rate_statement(session.get_bind().dialect.name)
+        self._pending: list[dict] = []
+
+    def load(self, rows: Iterable[Mapping | None]) -> None:
+        for raw in rows:
+            row_number = self.received
+            self.received += 1
+            if not isinstance(raw, Mapping):
+                self.errors.append({"row": row_number, "errors": ["row: expected an object"]})
+                continue
+            try:
+                payload = FxRateCreate.model_validate(raw)
+            except ValidationError as exc:
+                self.errors.append({"row": row_number, "errors": format_validation_errors(exc)})
+                continue
+            self._pending.append(payload.model_dump())
+            self.currencies.add(payload.currency)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self.session.execute(self._statement, pending)
+        self.upserted += len(pending)
+
+    def result(self) -> dict:
+        self.flush()
+        return {"received": self.received, "upserted": self.upserted, "errors": self.errors}
+
+
+class FxRateCache:
+    # Each currency's rates are read once into day-ordinal order; converting a
+    # batch is then one searchsorted per currency instead of a query per row.
+    # In-process writes clear it; the TTL bounds how long writes made elsewhere
+    # (another worker, the loader script) go unseen.
+    def __init__(self, ttl_seconds: float) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.loads = 0
+        self.generation = 0
+        self._series: dict[str, tuple[float, np.ndarray, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def clear(self, currencies: Iterable[str] | None = None) -> None:
+        with self._lock:
+            self.generation += 1
+            if currencies is None:
+                self._series.clear()
+            for currency in currencies or ():
+                self._series.pop(currency, None)
+
+    def series(self, session: Session, currency: str) -> tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            cached = self._series.get(currency)
+            generation = self.generation
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1:]
+        rows = session.execute(
+            select(FxRate.rate_date, FxRate.rate_jpy).where(FxRate.currency == currency).order_by(FxRate.rate_date)
+        ).all()
+        days = np.fromiter((row.rate_date.toordinal() for row in rows), np.int64, len(rows))
+        rates = np.fromiter((row.rate_jpy for row in rows), np.float64, len(rows))
+        with self._lock:
+            self.loads += 1
+            # A clear() since the read began may have raced a commit this read
+            # did not see; serve the rates but leave the next call to reload.
+            if self.generation == generation:
+                self._series[currency] = (time.monotonic() + self.ttl_seconds, days, rates)
+        return days, rates
+
+    def rates(self, session: Session, currency: str, ordinals: np.ndarray) -> np.ndarray:
+        if currency == BASE_CURRENCY:
+            return np.ones(len(ordinals))
+        days, rates = self.series(session, currency)
+        if not len(days):
+            return np.full(len(ordinals), np.nan)
+        # The latest rate on or before each date; NaN before the first one.
+        index = np.searchsorted(days, ordinals, side="right") - 1
+        return np.where(index >= 0, rates[np.maximum(index, 0)], np.nan)
+
+
+fx_rates = FxRateCache(get_fx_cache_ttl())
+
+
+def currency_codes(currencies: Iterable[str]) -> tuple[list[str], np.ndarray]:
+    currencies = list(currencies)
+    names = sorted(set(currencies))
+    index = {name: code for code, name in enumerate(names)}
+    return names, np.fromiter((index[currency] for currency in currencies), np.int64, len(currencies))
+
+
+def convert_to_jpy(
+    session: Session, names: list[str], codes: np.ndarray, ordinals: np.ndarray, amounts: np.ndarray
+) -> np.ndarray:
+    # `names`/`codes` come from currency_codes(); amounts without a rate on or
+    # before their date come back as NaN.
+    converted = np.asarray(amounts, dtype=np.float64).copy()
+    for code, currency in enumerate(names):
+        if currency == BASE_CURRENCY:
+            continue
+        mask = codes == code
+        if mask.any():
+            converted[mask] *= fx_rates.rates(session, currency, ordinals[mask])
+    return converted
@@ -0,0 +1,465 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import io
+import json
+import multiprocessing
+import re
+import threading
+from collections import Counter, deque
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import BinaryIO, TextIO
+
+import numpy as np
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.core.config import get_import_workers
+from app.core.validation import format_validation_errors
+from app.models.instruments import Instrument
+from app.models.portfolio import Price, Transaction, Valuation
+from app.schemas.imports import ImportedPrice, ImportedTransaction, ImportedValuation
+from app.services.fx import convert_to_jpy, currency_codes
+from app.services.ledger import sync_ledger
+from app.services.snapshots import SnapshotDeltas
+from app.services.valuations import VALUATION_COLUMNS, CompiledValuationUpsert
+
+IMPORT_CHUNK_SIZE = 2000
+IMPORT_FORMATS = ("csv", "ofx")
+IMPORT_KINDS = {"transactions": ImportedTransaction, "valuations": ImportedValuation, "prices": ImportedPrice}
+
+OFX_READ_SIZE = 1 << 16
+OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+OFX_BUYS = {"BUYDEBT", "BUYMF", "BUYOPT", "BUYOTHER", "BUYSTOCK", "REINVEST"}
+OFX_SELLS = {"SELLDEBT", "SELLMF", "SELLOPT", "SELLOTHER", "SELLSTOCK"}
+OFX_POSITIONS = {"POSDEBT", "POSMF", "POSOPT", "POSOTHER", "POSSTOCK"}
+OFX_RECORDS = OFX_BUYS | OFX_SELLS | OFX_POSITIONS | {"INCOME", "TRANSFER", "STMTTRN"}
+
+ImportRow = tuple[str, dict]
+
+
+def check_mapping(kind: str, mapping: Mapping[str, str] | None) -> list[str]:
+    fields = [*IMPORT_KINDS[kind].model_fields, "ticker"]
+    unknown = set(mapping or {}) - set(fields)
+    if unknown:
+        raise ValueError(f"unknown {kind} fields in mapping: {', '.join(sorted(unknown))}")
+    return fields
+
+
+def iter_csv_rows(
+    handle: TextIO, kind: str, mapping: Mapping[str, str] | None = None, defaults: Mapping | None = None
+) -> Iterator[ImportRow]:
+    # `mapping` renames target fields to the statement's column headers; fields
+    # it leaves out are read from a column of the same name.
+    fields = check_mapping(kind, mapping)
+    columns = {field: (mapping or {}).get(field, field) for field in fields}
+    for row in csv.DictReader(handle):
+        values = dict(defaults or {})
+        for field, column in columns.items():
+            value = row.get(column)
+            if value is not None and value.strip():
+                values[field] = value.strip()
+        yield kind, values
+
+
+def _ofx_tokens(handle: TextIO) -> Iterator[tuple[bool, str, str]]:
+    # OFX 1.x is SGML with unclosed leaf tags and 2.x is XML; reading tag by tag
+    # handles both without building a tree. Text after the last '<' of a read
+    # may belong to a tag that continues in the next one, so it is carried over.
+    buffer = ""
+    while True:
+        data = handle.read(OFX_READ_SIZE)
+        buffer += data
+        end = buffer.rfind("<") if data else len(buffer)
+        for match in OFX_TAG.finditer(buffer, 0, max(end, 0)):
+            yield match.group(1) == "/", match.group(2).upper(), match.group(3).strip()
+        if not data:
+            return
+        buffer = buffer[max(end, 0) :]
+
+
+def _ofx_date(value: str | None) -> str | None:
+    # YYYYMMDD[HHMMSS[.XXX]][[offset:TZ]]; only the calendar date is kept.
+    if not value or len(value) < 8:
+        return value
+    return f"{value[:4]}-{value[4:6]}-{value[6:8]}"
+
+
+def _ofx_securities(handle: TextIO) -> dict[str, str]:
+    securities, security = {}, None
+    for closing, tag, text in _ofx_tokens(handle):
+        if tag == "SECINFO":
+            security = None if closing else {}
+        elif security is not None and text:
+            security[tag] = text
+            if "UNIQUEID" in security and "TICKER" in security:
+                securities[security["UNIQUEID"]] = security["TICKER"]
+    return securities
+
+
+def _ofx_record(tag: str, record: dict, securities: dict[str, str], currency: str, defaults: dict) -> Iterator[ImportRow]:
+    currency = record.get("CURSYM", currency)
+    security = record.get("UNIQUEID")
+    # Securities missing from SECLIST fall back to their id, so instruments
+    # whose ticker holds an ISIN or CUSIP still resolve.
+    ticker = {"ticker": securities.get(security, security)} if security else {}
+    if tag in OFX_POSITIONS:
+        priced_on = _ofx_date(record.get("DTPRICEASOF"))
+        yield "valuations", {
+            **defaults,
+            **ticker,
+            "valuation_date": priced_on,
+            "value": record.get("MKTVAL"),
+            "currency": currency,
+        }
+        if ticker:
+            yield "prices", {**ticker, "price_date": priced_on, "price": record.get("UNITPRICE"), "currency": currency}
+        return
+    if tag == "STMTTRN":
+        amount = record.get("TRNAMT", "")
+        transaction_type = "withdrawal" if amount.startswith("-") else "deposit"
+    elif tag == "TRANSFER":
+        transaction_type = "transfer_out" if record.get("TFERACTION") == "OUT" else "transfer_in"
+        amount = record.get("TOTAL") or record.get("MKTVAL") or "0"
+    else:
+        transaction_type = "buy" if tag in OFX_BUYS else "sell" if tag in OFX_SELLS else "dividend"
+        amount = record.get("TOTAL", "")
+    yield "transactions", {
+        **defaults,
+        **ticker,
+        "transaction_date": _ofx_date(record.get("DTTRADE") or record.get("DTPOSTED")),
+        "transaction_type": transaction_type,
+        # The ledger works on magnitudes; OFX signs follow the cash direction.
+        "quantity": record.get("UNITS", "").lstrip("-") or None,
+        "amount": amount.lstrip("-"),
+        "currency": currency,
+        "source_id": record.get("FITID"),
+    }
+
+
+def iter_ofx_rows(handle: TextIO, defaults: Mapping | None = None) -> Iterator[ImportRow]:
+    # SECLIST usually follows the transactions it describes, so a first pass
+    # collects tickers and the second streams the records.
+    securities = _ofx_securities(handle)
+    handle.seek(0)
+    defaults = dict(defaults or {})
+    currency, tag, record = "JPY", None, None
+    for closing, name, text in _ofx_tokens(handle):
+        if record is None:
+            if name == "CURDEF" and text:
+                currency = text.upper()
+            elif name in OFX_RECORDS and not closing:
+                tag, record = name, {}
+        elif closing and name == tag:
+            yield from _ofx_record(tag, record, securities, currency, defaults)
+            tag, record = None, None
+        elif text and not closing:
+            record.setdefault(name, text)
+
+
+_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def validation_pool() -> ProcessPoolExecutor:
+    # One pool for the whole process, started by the first import that needs it
+    # and sized once by IMPORT_WORKERS; concurrent imports queue on its workers.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(get_import_workers(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_validation_pool() -> None:
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def _row_hash(kind: str, values: dict) -> str:
+    payload = json.dumps(values, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(f"{kind}|{payload}".encode()).hexdigest()
+
+
+def validate_chunk(
+    rows: list[tuple[int, str, dict]], tickers: Mapping[str, int]
+) -> tuple[list[tuple[int, str, dict, str]], list[dict]]:
+    # Runs in pool workers, so it only touches its arguments.
+    valid, errors = [], []
+    for row_number, kind, raw in rows:
+        values = {key: value for key, value in raw.items() if value is not None and value != ""}
+        ticker = values.pop("ticker", None)
+        if ticker is not None and "instrument_id" not in values:
+            instrument_id = tickers.get(str(ticker).upper())
+            if instrument_id is None:
+                errors.append({"row": row_number, "errors": [f"ticker: unknown ticker {ticker!r}"]})
+                continue
+            values["instrument_id"] = instrument_id
+        if isinstance(values.get("currency"), str):
+            values["currency"] = values["currency"].upper()
+        try:
+            payload = IMPORT_KINDS[kind].model_validate(values)
+        except ValidationError as exc:
+            errors.append({"row": row_number, "errors": format_validation_errors(exc)})
+            continue
+        dumped = payload.model_dump()
+        valid.append((row_number, kind, dumped, _row_hash(kind, dumped)))
+    return valid, errors
+
+
+def _insert_ignoring_duplicates(session: Session, model, rows: list[dict]) -> None:
+    dialect = session.get_bind().dialect.name
+    statement = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(model.__table__)
+    session.execute(statement.on_conflict_do_nothing(index_elements=["import_hash"]), rows)
+
+
+def upsert_price_statement(dialect_name: str):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(Price.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["instrument_id", "price_date"],
+        set_={
+            "price": stmt.excluded.price,
+            "currency": stmt.excluded.currency,
+            "import_hash": stmt.excluded.import_hash,
+        },
+    )
+
+
+class StatementImporter:
+    def __init__(
+        self,
+        session: Session,
+        workers: int | None = None,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        resume: Mapping | None = None,
+        checkpoint: Callable[[StatementImporter], None] | None = None,
+    ) -> None:
+        # `resume` is a state() saved by an earlier run over the same file;
+        # `checkpoint` replaces the per-chunk commit and must commit itself.
+        resume = resume or {}
+        self.session = session
+        self.workers = get_import_workers() if workers is None else workers
+        self.chunk_size = chunk_size
+        self.checkpoint = checkpoint
+        self.received = 0
+        self.written = self._resume_from = resume.get("written", 0)
+        self.duplicates = resume.get("duplicates", 0)
+        self.inserted = {kind: resume.get("inserted", {}).get(kind, 0) for kind in IMPORT_KINDS}
+        self.errors: list[dict] = list(resume.get("errors", []))
+        self.valuation_dates = {date.fromisoformat(day) for day in resume.get("valuation_dates", [])}
+        self.transaction_dates = {date.fromisoformat(day) for day in resume.get("transaction_dates", [])}
+        # Every instrument with a ticker, read once; each chunk sent to the pool
+        # carries only the tickers it mentions.
+        self.tickers = {
+            ticker.upper(): instrument_id
+            for ticker, instrument_id in session.execute(
+                select(Instrument.ticker, Instrument.id).where(Instrument.ticker.is_not(None))
+            )
+        }
+        self._occurrences: Counter[str] = Counter()
+
+    def _chunks(self, rows: Iterable[ImportRow]) -> Iterator[list[tuple[int, str, dict]]]:
+        chunk = []
+        for kind, values in rows:
+            chunk.append((self.received, kind, values))
+            self.received += 1
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _chunk_tickers(self, chunk: list[tuple[int, str, dict]]) -> dict[str, int]:
+        mentioned = {str(values["ticker"]).upper() for _, _, values in chunk if values.get("ticker")}
+        return {ticker: self.tickers[ticker] for ticker in mentioned if ticker in self.tickers}
+
+    def run(self, rows: Iterable[ImportRow]) -> dict:
+        chunks = self._chunks(rows)
+        # The first chunk is validated in-process, so small files never touch
+        # the pool.
+        first = next(chunks, None)
+        if first is not None:
+            self._write(*validate_chunk(first, self.tickers))
+        if self.workers > 1:
+            pool = validation_pool()
+            pending = deque()
+            try:
+                for chunk in chunks:
+                    pending.append(pool.submit(validate_chunk, chunk, self._chunk_tickers(chunk)))
+                    # Parsing stays a few chunks ahead of the writer, never more.
+                    if len(pending) >= self.workers * 2:
+                        self._write(*pending.popleft().result())
+                while pending:
+                    self._write(*pending.popleft().result())
+            except BrokenProcessPool:
+                # A worker died; the next import starts a fresh pool.
+                shutdown_validation_pool()
+                raise
+            finally:
+                for future in pending:
+                    future.cancel()
+        else:
+            for chunk in chunks:
+                self._write(*validate_chunk(chunk, self.tickers))
+        return self.result()
+
+    def _dedupe(self, model, rows: list[tuple[int, str, dict, str]]) -> list[tuple[int, str, dict, str]]:
+        hashes = [row[3] for row in rows]
+        existing = set(self.session.execute(select(model.import_hash).where(model.import_hash.in_(hashes))).scalars())
+        fresh = []
+        for row in rows:
+            if row[3] in existing:
+                self.duplicates += 1
+            else:
+                existing.add(row[3])
+                fresh.append(row)
+        return fresh
+
+    def _to_jpy(self, rows: list[tuple[int, str, dict, str]], date_field: str, amount_field: str) -> list[dict]:
+        names, codes = currency_codes(row[2]["currency"] for row in rows)
+        amounts = convert_to_jpy(
+            self.session,
+            names,
+            codes,
+            np.fromiter((row[2][date_field].toordinal() for row in rows), np.int64, len(rows)),
+            np.fromiter((row[2][amount_field] for row in rows), np.float64, len(rows)),
+        )
+        converted = []
+        for (row_number, _, values, row_hash), amount in zip(rows, amounts.tolist()):
+            if np.isnan(amount):
+                self.errors.append(
+                    {
+                        "row": row_number,
+                        "errors": [f"currency: no {values['currency']} rate on or before {values[date_field]}"],
+                    }
+                )
+                continue
+            converted.append({**values, "amount_jpy": amount, "import_hash": row_hash})
+        return converted
+
+    def _write(self, valid: list[tuple[int, str, dict, str]], errors: list[dict]) -> None:
+        end = max([row[0] for row in valid] + [error["row"] for error in errors]) + 1
+        by_kind: dict[str, list] = {kind: [] for kind in IMPORT_KINDS}
+        for row_number, kind, values, row_hash in valid:
+            if kind == "transactions" and values["source_id"] is None:
+                # Identical rows without a statement id are separate trades; the
+                # occurrence number keeps each one's hash stable across re-imports.
+                occurrence = self._occurrences[row_hash]
+                self._occurrences[row_hash] += 1
+                row_hash = hashlib.sha256(f"{row_hash}:{occurrence}".encode()).hexdigest()
+            by_kind[kind].append((row_number, kind, values, row_hash))
+        if end <= self._resume_from:
+            # Written by the run being resumed; only the occurrence counts above
+            # had to be replayed.
+            return
+        self.errors += errors
+
+        transactions = self._dedupe(Transaction, by_kind["transactions"]) if by_kind["transactions"] else []
+        valuations = self._dedupe(Valuation, by_kind["valuations"]) if by_kind["valuations"] else []
+        prices = self._dedupe(Price, by_kind["prices"]) if by_kind["prices"] else []
+
+        if transactions:
+            rows = self._to_jpy(transactions, "transaction_date", "amount")
+            if rows:
+                _insert_ignoring_duplicates(
+                    self.session,
+                    Transaction,
+                    [
+                        {
+                            "account_id": row["account_id"],
+                            "instrument_id": row["instrument_id"],
+                            "transaction_date": row["transaction_date"],
+                            "transaction_type": row["transaction_type"],
+                            "quantity": row["quantity"],
+                            "amount_jpy": row["amount_jpy"],
+                            "import_hash": row["import_hash"],
+                        }
+                        for row in rows
+                    ],
+                )
+                sync_ledger(self.session)
+                self.inserted["transactions"] += len(rows)
+                self.transaction_dates.update(row["transaction_date"] for row in rows)
+        if valuations:
+            rows = self._to_jpy(valuations, "valuation_date", "value")
+            if rows:
+                columns = (*VALUATION_COLUMNS, "import_hash")
+                upsert = CompiledValuationUpsert(self.session.connection(), columns)
+                deltas = SnapshotDeltas(
+                    self.session, [(row["account_id"], row["instrument_id"], row["valuation_date"]) for row in rows]
+                )
+                upsert.execute(
+                    self.session.connection(),
+                    [{**row, "position_id": None, "value_jpy": row["amount_jpy"]} for row in rows],
+                )
+                deltas.apply()
+                dates = {row["valuation_date"] for row in rows}
+                self.inserted["valuations"] += len(rows)
+                self.valuation_dates |= dates
+        if prices:
+            # One price per instrument and day: the last row in the file wins,
+            # and a new quote replaces the stored one.
+            latest = {
+                (values["instrument_id"], values["price_date"]): {**values, "import_hash": row_hash}
+                for _, _, values, row_hash in prices
+            }
+            self.duplicates += len(prices) - len(latest)
+            statement = upsert_price_statement(self.session.get_bind().dialect.name)
+            self.session.execute(statement, list(latest.values()))
+            self.inserted["prices"] += len(latest)
+        # Each chunk commits on its own: an interrupted import keeps what it
+        # wrote, and running it again skips those rows by hash.
+        self.written = end
+        if self.checkpoint is not None:
+            self.checkpoint(self)
+        else:
+            self.session.commit()
+
+    def state(self) -> dict:
+        return {
+            **self.result(),
+            "written": self.written,
+            "valuation_dates": sorted(day.isoformat() for day in self.valuation_dates),
+            "transaction_dates": sorted(day.isoformat() for day in self.transaction_dates),
+        }
+
+    def result(self) -> dict:
+        return {
+            "received": self.received,
+            "inserted": dict(self.inserted),
+            "duplicates": self.duplicates,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
+
+
+def import_statement(
+    session: Session,
+    source: BinaryIO,
+    format: str = "csv",
+    kind: str = "transactions",
+    account_id: int | None = None,
+    mapping: Mapping[str, str] | None = None,
+    workers: int | None = None,
+    resume: Mapping | None = None,
+    checkpoint: Callable[[StatementImporter], None] | None = None,
+) -> StatementImporter:
+    text = io.TextIOWrapper(source, encoding="utf-8-sig", errors="replace", newline="")
+    defaults = {} if account_id is None else {"account_id": account_id}
+    if format == "ofx":
+        rows = iter_ofx_rows(text, defaults)
+    else:
+        rows = iter_csv_rows(text, kind, mapping, defaults if kind != "prices" else None)
+    importer = StatementImporter(session, workers=workers, resume=resume, checkpoint=checkpoint)
+    importer.run(rows)
+    text.detach()
+    return importer
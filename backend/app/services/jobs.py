@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections.abc import Callable, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+from pydantic import BaseModel
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.cache import response_cache
+from app.core.config import get_job_data_dir, get_job_workers
+from app.models.jobs import Job
+from app.models.portfolio import Valuation
+from app.models.snapshots import PortfolioSnapshotTotal
+from app.schemas.jobs import ImportJobParams, MonteCarloParams, SnapshotRebuildParams
+from app.schemas.valuations import RevaluationRequest
+from app.services.calculations import advance_forecast, forecast_summary, monte_carlo_state
+from app.services.columnar import valuation_store
+from app.services.imports import StatementImporter, import_statement
+from app.services.revaluation import Revaluation
+from app.services.snapshots import SnapshotWindows
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+# Calendar days revalued per checkpoint, and valuation dates per snapshot window.
+JOB_REVALUE_DAYS = 92
+JOB_SNAPSHOT_DAYS = 250
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobInterrupted(Exception):
+    pass
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobContext:
+    def __init__(self, runner: JobRunner, session: Session, job: Job, params: BaseModel) -> None:
+        self.runner = runner
+        self.session = session
+        self.job_id = job.id
+        self.params = params
+        self.state: dict = dict(job.checkpoint or {})
+        self.completed = job.completed
+
+    def data_path(self, suffix: str) -> Path:
+        return self.runner.data_path(self.job_id, suffix)
+
+    def checkpoint(self, state: Mapping, completed: int, total: int | None = None) -> None:
+        # The checkpoint commits together with whatever the chunk wrote, so a
+        # resumed job never redoes or skips a chunk. Cancellation and shutdown
+        # are only honoured here, between chunks.
+        values = {"checkpoint": dict(state), "completed": completed, "updated_at": _now()}
+        if total is not None:
+            values["total"] = total
+        self.session.execute(update(Job).where(Job.id == self.job_id).values(**values))
+        self.session.commit()
+        self.state, self.completed = dict(state), completed
+        if self.runner.stopping.is_set():
+            raise JobInterrupted
+        if self.session.execute(select(Job.cancel_requested).where(Job.id == self.job_id)).scalar():
+            raise JobCancelled
+
+
+def _refresh_snapshots(context: JobContext, start: date | None) -> None:
+    # Valuation dates from `start` on, one window per checkpoint. Windows meet
+    # end to end and the last is open-ended, so snapshots on dates that no
+    # longer have valuations are cleared as well.
+    if "snapshots_from" in context.state:
+        if context.state["snapshots_from"] is None:
+            return
+        start = date.fromisoformat(context.state["snapshots_from"])
+    query = select(Valuation.valuation_date).distinct().order_by(Valuation.valuation_date)
+    if start is not None:
+        query = query.where(Valuation.valuation_date >= start)
+    days = context.session.execute(query).scalars().all()
+    windows = [days[offset : offset + JOB_SNAPSHOT_DAYS] for offset in range(0, len(days), JOB_SNAPSHOT_DAYS)]
+    done = context.completed
+    # Seeded once; each window hands its holdings' latest rows to the next.
+    snapshots = SnapshotWindows(context.session, start)
+    for index, window in enumerate(windows or [[]]):
+        upper = window[-1] if index < len(windows) - 1 else None
+        snapshots.refresh(upper)
+        lower = upper + timedelta(days=1) if upper else None
+        context.checkpoint(
+            {**context.state, "snapshots_from": lower.isoformat() if lower else None},
+            done + index + 1,
+            done + max(len(windows), 1),
+        )
+
+
+def run_revaluation(context: JobContext) -> dict:
+    params: RevaluationRequest = context.params
+    windows = []
+    window_start = params.start
+    while window_start <= params.end:
+        window_end = min(window_start + timedelta(days=JOB_REVALUE_DAYS - 1), params.end)
+        windows.append((window_start, window_end))
+        window_start = window_end + timedelta(days=1)
+    # Valuations first, without refreshing snapshots per window; the snapshot
+    # pass then runs once from `start`. Prices and checkpoints are read once
+    # for everything still to do, not per window.
+    revalued_to = context.state.get("revalued_to")
+    pending = [window for window in windows if not revalued_to or window[1].isoformat() > revalued_to]
+    revaluation = Revaluation(context.session, pending[0][0], params.end, params.account_id) if pending else None
+    for index, (window_start, window_end) in enumerate(windows):
+        if revalued_to and window_end.isoformat() <= revalued_to:
+            continue
+        result = revaluation.write(window_start, window_end, refresh=False)
+        context.checkpoint(
+            {
+                "revalued_to": window_end.isoformat(),
+                "positions": result["positions"],
+                "dates": context.state.get("dates", 0) + result["dates"],
+                "upserted": context.state.get("upserted", 0) + result["upserted"],
+            },
+            index + 1,
+            len(windows) + 1,
+        )
+    _refresh_snapshots(context, params.start)
+
+    response_cache.invalidate(between=(params.start, date.max))
+    days = (params.end - params.start).days + 1
+    valuation_store.refresh_dates(context.session, (params.start + timedelta(days=offset) for offset in range(days)))
+    return {key: context.state.get(key, 0) for key in ("positions", "dates", "upserted")}
+
+
+def run_snapshot_rebuild(context: JobContext) -> dict:
+    params: SnapshotRebuildParams = context.params
+    _refresh_snapshots(context, params.start)
+    response_cache.invalidate(between=(params.start or date.min, date.max))
+    query = select(func.count()).select_from(PortfolioSnapshotTotal)
+    if params.start is not None:
+        query = query.where(PortfolioSnapshotTotal.snapshot_date >= params.start)
+    return {"dates": context.session.execute(query).scalar()}
+
+
+def run_import(context: JobContext) -> dict:
+    params: ImportJobParams = context.params
+
+    def checkpoint(importer: StatementImporter) -> None:
+        context.checkpoint(importer.state(), importer.written)
+
+    with open(context.data_path(f".{params.format}"), "rb") as source:
+        importer = import_statement(
+            context.session,
+            source,
+            params.format,
+            params.kind,
+            params.account_id,
+            params.mapping,
+            resume=context.state,
+            checkpoint=checkpoint,
+        )
+    touched = importer.valuation_dates | importer.transaction_dates
+    if touched:
+        response_cache.invalidate(between=(min(touched), date.max))
+    valuation_store.refresh_dates(context.session, importer.valuation_dates)
+    return importer.result()
+
+
+def run_monte_carlo(context: JobContext) -> dict:
+    params: MonteCarloParams = context.params
+    state = monte_carlo_state(params.start_value, params.horizon_months, params.paths, params.seed)
+    if context.state:
+        # Arrays live in a file per checkpointed month, so a crash between
+        # writing the file and committing the checkpoint cannot mix two blocks.
+        with np.load(context.data_path(f"-{context.state['month']}.npz")) as saved:
+            state.update({name: saved[name] for name in saved.files})
+        state["month"] = context.state["month"]
+        state["rng"].bit_generator.state = context.state["rng"]
+    blocks = -(-params.horizon_months // 24)
+    for state in advance_forecast(
+        state,
+        params.start_value,
+        params.annual_return,
+        params.annual_volatility,
+        params.monthly_contribution,
+        params.horizon_months,
+    ):
+        previous = context.state.get("month")
+        path = context.data_path(f"-{state['month']}.npz")
+        with open(path, "wb") as handle:
+            np.savez(
+                handle,
+                bands=state["bands"],
+                log_growth=state["log_growth"],
+                discounted_contributions=state["discounted_contributions"],
+                final_values=state["final_values"],
+            )
+        context.checkpoint(
+            {"month": state["month"], "rng": state["rng"].bit_generator.state}, -(-state["month"] // 24), blocks
+        )
+        if previous is not None:
+            context.data_path(f"-{previous}.npz").unlink(missing_ok=True)
+    return forecast_summary(state, params.target_value)
+
+
+JOB_KINDS: dict[str, tuple[type[BaseModel], Callable[[JobContext], dict]]] = {
+    "revalue": (RevaluationRequest, run_revaluation),
+    "rebuild_snapshots": (SnapshotRebuildParams, run_snapshot_rebuild),
+    "import": (ImportJobParams, run_import),
+    "monte_carlo": (MonteCarloParams, run_monte_carlo),
+}
+
+
+class JobRunner:
+    # Jobs run on a small thread pool inside the API process; their rows are
+    # the source of truth, so a restart picks up queued and interrupted jobs
+    # from their last checkpoint.
+    def __init__(self, workers: int | None = None, data_dir: str | None = None) -> None:
+        self.workers = get_job_workers() if workers is None else workers
+        self.data_dir = Path(get_job_data_dir() if data_dir is None else data_dir)
+        self.stopping = threading.Event()
+        self._executor: ThreadPoolExecutor | None = None
+        self._futures: dict[int, Future] = {}
+        self._lock = threading.Lock()
+
+    def data_path(self, job_id: int, suffix: str) -> Path:
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        return self.data_dir / f"job-{job_id}{suffix}"
+
+    def create(self, session: Session, kind: str, params: Mapping) -> Job:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"unknown job kind {kind!r}; expected one of {', '.join(JOB_KINDS)}")
+        model, _ = JOB_KINDS[kind]
+        job = Job(
+            kind=kind,
+            status="queued",
+            params=model.model_validate(params).model_dump(mode="json"),
+            completed=0,
+            cancel_requested=False,
+            created_at=_now(),
+        )
+        session.add(job)
+        session.commit()
+        return job
+
+    def enqueue(self, bind: Engine, job_id: int) -> None:
+        with self._lock:
+            if self._executor is None:
+                self.stopping.clear()
+                self._executor = ThreadPoolExecutor(max(self.workers, 1), thread_name_prefix="job")
+            self._futures[job_id] = self._executor.submit(self._run, bind, job_id)
+
+    def submit(self, session: Session, kind: str, params: Mapping) -> Job:
+        job = self.create(session, kind, params)
+        self.enqueue(session.get_bind(), job.id)
+        return job
+
+    def cancel(self, session: Session, job_id: int) -> Job | None:
+        # A queued job is cancelled outright; a running one stops at its next
+        # checkpoint. Finished jobs are left as they are.
+        cancelled = session.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status == "queued")
+            .values(status="cancelled", cancel_requested=True, finished_at=_now())
+        ).rowcount
+        session.execute(update(Job).where(Job.id == job_id, Job.status == "running").values(cancel_requested=True))
+        session.commit()
+        if cancelled:
+            self._discard_files(job_id)
+        return session.get(Job, job_id, populate_existing=True)
+
+    def resume_interrupted(self, session_factory: sessionmaker) -> int:
+        with session_factory() as session:
+            # Anything still running belonged to a process that is gone.
+            session.execute(update(Job).where(Job.status == "running").values(status="queued"))
+            session.commit()
+            job_ids = session.execute(select(Job.id).where(Job.status == "queued").order_by(Job.id)).scalars().all()
+            bind = session.get_bind()
+        for job_id in job_ids:
+            self.enqueue(bind, job_id)
+        return len(job_ids)
+
+    def wait(self, job_id: int, timeout: float | None = None) -> None:
+        future = self._futures.get(job_id)
+        if future is not None:
+            future.result(timeout)
+
+    def stop(self) -> None:
+        # Running jobs stop at their next checkpoint and go back to the queue;
+        # jobs that never started stay queued for the next process.
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            self.stopping.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._futures.clear()
+
+    def _discard_files(self, job_id: int) -> None:
+        for path in self.data_dir.glob(f"job-{job_id}[.-]*"):
+            path.unlink(missing_ok=True)
+
+    def _finish(self, session: Session, job_id: int, **values) -> None:
+        session.execute(update(Job).where(Job.id == job_id).values(finished_at=_now(), updated_at=_now(), **values))
+        session.commit()
+        self._discard_files(job_id)
+
+    def _run(self, bind: Engine, job_id: int) -> None:
+        with Session(bind=bind, autoflush=False) as session:
+            claimed = session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == "queued")
+                .values(status="running", started_at=func.coalesce(Job.started_at, _now()), updated_at=_now())
+            ).rowcount
+            session.commit()
+            if not claimed:
+                return
+            job = session.get(Job, job_id)
+            model, handler = JOB_KINDS[job.kind]
+            try:
+                result = handler(JobContext(self, session, job, model.model_validate(job.params)))
+            except JobInterrupted:
+                session.rollback()
+                session.execute(update(Job).where(Job.id == job_id).values(status="queued", updated_at=_now()))
+                session.commit()
+            except JobCancelled:
+                session.rollback()
+                self._finish(session, job_id, status="cancelled")
+            except Exception as exc:
+                logger.exception("job %s (%s) failed", job_id, job.kind)
+                session.rollback()
+                self._finish(session, job_id, status="failed", error=f"{type(exc).__name__}: {exc}")
+            else:
+                self._finish(session, job_id, status="succeeded", result=result)
+
+
+job_runner = JobRunner()
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+from datetime import date
+
+from sqlalchemy import and_, bindparam, delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.models.portfolio import Position, PositionCheckpoint, Transaction
+
+BUY_TYPES = {"buy", "transfer_in"}
+SELL_TYPES = {"sell", "transfer_out"}
+
+
+def _apply(quantity: float, cost_basis: float, transaction) -> tuple[float, float]:
+    traded = abs(transaction.quantity or 0.0)
+    if transaction.transaction_type in BUY_TYPES:
+        return quantity + traded, cost_basis + abs(transaction.amount_jpy)
+    if transaction.transaction_type in SELL_TYPES and quantity > 0:
+        # Average-cost basis: a sale releases its pro-rata share of the cost.
+        sold = min(traded, quantity)
+        return quantity - sold, cost_basis * (1 - sold / quantity)
+    return quantity, cost_basis
+
+
+def sync_ledger(session: Session) -> dict:
+    # Each transaction is flagged once replayed. Ids are not commit order, so a
+    # row that commits after higher ids is still pending here rather than hidden
+    # below a watermark. Only the ids read now are flagged at the end; a row
+    # committing meanwhile may be replayed twice, never skipped.
+    pending = session.execute(select(Transaction.id).where(~Transaction.ledger_synced)).scalars().all()
+    if not pending:
+        return {"positions": 0, "transactions": 0, "checkpoints": 0}
+    since = (
+        select(
+            Transaction.account_id,
+            Transaction.instrument_id,
+            func.min(Transaction.transaction_date).label("since"),
+        )
+        .where(~Transaction.ledger_synced, Transaction.instrument_id.is_not(None))
+        .group_by(Transaction.account_id, Transaction.instrument_id)
+        .subquery()
+    )
+    pairs = {
+        (row.account_id, row.instrument_id): row.since for row in session.execute(select(since))
+    }
+    if not pairs:
+        _mark_synced(session, pending)
+        return {"positions": 0, "transactions": 0, "checkpoints": 0}
+
+    # Running balances resume from the last checkpoint before the earliest new
+    # transaction of each pair; only what follows it is replayed.
+    ranked = (
+        select(
+            PositionCheckpoint.account_id,
+            PositionCheckpoint.instrument_id,
+            PositionCheckpoint.quantity,
+            PositionCheckpoint.cost_basis_jpy,
+            func.row_number()
+            .over(
+                partition_by=(PositionCheckpoint.account_id, PositionCheckpoint.instrument_id),
+                order_by=PositionCheckpoint.checkpoint_date.desc(),
+            )
+            .label("rank"),
+        )
+        .join(
+            since,
+            and_(
+                PositionCheckpoint.account_id == since.c.account_id,
+                PositionCheckpoint.instrument_id == since.c.instrument_id,
+                PositionCheckpoint.checkpoint_date < since.c.since,
+            ),
+        )
+        .subquery()
+    )
+    balances = {key: (0.0, 0.0) for key in pairs}
+    for row in session.execute(select(ranked).where(ranked.c.rank == 1)):
+        balances[(row.account_id, row.instrument_id)] = (row.quantity, row.cost_basis_jpy)
+
+    checkpoints_table = PositionCheckpoint.__table__
+    session.connection().execute(
+        delete(checkpoints_table).where(
+            checkpoints_table.c.account_id == bindparam("a"),
+            checkpoints_table.c.instrument_id == bindparam("i"),
+            checkpoints_table.c.checkpoint_date >= bindparam("since"),
+        ),
+        [
+            {"a": account_id, "i": instrument_id, "since": since_date}
+            for (account_id, instrument_id), since_date in pairs.items()
+        ],
+    )
+
+    transactions = session.execute(
+        select(
+            Transaction.id,
+            Transaction.account_id,
+            Transaction.instrument_id,
+            Transaction.transaction_date,
+            Transaction.transaction_type,
+            Transaction.quantity,
+            Transaction.amount_jpy,
+        )
+        .join(
+            since,
+            and_(
+                Transaction.account_id == since.c.account_id,
+                Transaction.instrument_id == since.c.instrument_id,
+                Transaction.transaction_date >= since.c.since,
+            ),
+        )
+        .order_by(
+            Transaction.account_id,
+            Transaction.instrument_id,
+            Transaction.transaction_date,
+            Transaction.id,
+        )
+    ).all()
+
+    checkpoints: list[dict] = []
+    for transaction in transactions:
+        key = (transaction.account_id, transaction.instrument_id)
+        quantity, cost_basis = _apply(*balances[key], transaction)
+        balances[key] = (quantity, cost_basis)
+        checkpoint = {
+            "account_id": key[0],
+            "instrument_id": key[1],
+            "checkpoint_date": transaction.transaction_date,
+            "quantity": quantity,
+            "cost_basis_jpy": cost_basis,
+            "last_transaction_id": transaction.id,
+        }
+        previous = checkpoints[-1] if checkpoints else None
+        if (
+            previous is not None
+            and (previous["account_id"], previous["instrument_id"]) == key
+            and previous["checkpoint_date"] == transaction.transaction_date
+        ):
+            checkpoint["last_transaction_id"] = max(previous["last_transaction_id"], transaction.id)
+            checkpoints[-1] = checkpoint
+        else:
+            checkpoints.append(checkpoint)
+    if checkpoints:
+        session.execute(insert(PositionCheckpoint), checkpoints)
+
+    _update_positions(session, balances)
+    _mark_synced(session, pending)
+    return {"positions": len(pairs), "transactions": len(transactions), "checkpoints": len(checkpoints)}
+
+
+def _mark_synced(session: Session, transaction_ids: list[int]) -> None:
+    table = Transaction.__table__
+    session.connection().execute(
+        update(table).where(table.c.id == bindparam("transaction_id")).values(ledger_synced=True),
+        [{"transaction_id": transaction_id} for transaction_id in transaction_ids],
+    )
+
+
+def _update_positions(session: Session, balances: dict[tuple[int, int], tuple[float, float]]) -> None:
+    positions = {
+        (position.account_id, position.instrument_id): position
+        for position in session.query(Position).filter(
+            Position.account_id.in_({account_id for account_id, _ in balances})
+        )
+    }
+    for (account_id, instrument_id), (quantity, _) in balances.items():
+        position = positions.get((account_id, instrument_id))
+        if position is None:
+            session.add(Position(account_id=account_id, instrument_id=instrument_id, quantity=quantity))
+        else:
+            position.quantity = quantity
+    session.flush()
+
+
+def get_holdings(session: Session, as_of: date, account_id: int | None = None) -> list[dict]:
+    # One index seek on (account, instrument, date) per held instrument.
+    latest = (
+        select(func.max(PositionCheckpoint.checkpoint_date))
+        .where(
+            PositionCheckpoint.account_id == Position.account_id,
+            PositionCheckpoint.instrument_id == Position.instrument_id,
+            PositionCheckpoint.checkpoint_date <= as_of,
+        )
+        .correlate(Position)
+        .scalar_subquery()
+    )
+    query = (
+        session.query(
+            PositionCheckpoint.account_id,
+            PositionCheckpoint.instrument_id,
+            PositionCheckpoint.checkpoint_date,
+            PositionCheckpoint.quantity,
+            PositionCheckpoint.cost_basis_jpy,
+        )
+        .select_from(Position)
+        .join(
+            PositionCheckpoint,
+            and_(
+                PositionCheckpoint.account_id == Position.account_id,
+                PositionCheckpoint.instrument_id == Position.instrument_id,
+                PositionCheckpoint.checkpoint_date == latest,
+            ),
+        )
+    )
+    if account_id is not None:
+        query = query.filter(Position.account_id == account_id)
+    return [
+        {
+            "account_id": row.account_id,
+            "instrument_id": row.instrument_id,
+            "as_of": row.checkpoint_date,
+            "quantity": row.quantity,
+            "cost_basis_jpy": row.cost_basis_jpy,
+        }
+        for row in query.order_by(PositionCheckpoint.account_id, PositionCheckpoint.instrument_id)
+    ]
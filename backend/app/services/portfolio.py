@@ -2,83 +2,496 @@ from __future__ import annotations
 
 from datetime import date
 
-from sqlalchemy import func
+import numpy as np
+from sqlalchemy import Select, func, select
 from sqlalchemy.orm import Session
 
-from app.models.portfolio import Valuation
-from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode
-from app.services.calculations import calculate_allocation, calculate_deviation
+from app.db.reads import Reads, run_reads
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Transaction
+from app.models.snapshots import PortfolioSnapshot, PortfolioSnapshotTotal
+from app.models.taxonomies import (
+    InstrumentClassification,
+    TargetAllocation,
+    Taxonomy,
+    TaxonomyNode,
+    TaxonomyNodePath,
+)
+from app.services.asof import as_of_rows, holding_spans
+from app.services.calculations import (
+    PERIODS_PER_YEAR,
+    calculate_allocation,
+    calculate_deviation,
+    carry_forward,
+    lttb_indices,
+    period_ends,
+    period_keys,
+    period_label,
+    timeseries_metrics,
+)
+from app.services.columnar import valuation_store
 
+BREAKDOWN_DATE_CHUNK = 500
+CASH_FLOW_SIGNS = {"deposit": 1.0, "transfer_in": 1.0, "withdrawal": -1.0, "transfer_out": -1.0}
 
-def get_allocation(session: Session, as_of: date, taxonomy: str) -> list[dict]:
-    rows = (
-        session.query(
+
+def _snapshot_as_of(as_of: date):
+    # Snapshots exist on valuation dates and already carry every holding
+    # forward, so the latest one on or before `as_of` is the portfolio then.
+    return (
+        select(func.max(PortfolioSnapshotTotal.snapshot_date))
+        .where(PortfolioSnapshotTotal.snapshot_date <= as_of)
+        .scalar_subquery()
+    )
+
+
+def _allocation_statement(as_of: date, taxonomy: str, rollup: bool) -> Select:
+    if rollup:
+        # Every node sums the snapshots of its whole subtree through the closure
+        # table, so all levels come from one aggregate regardless of depth.
+        statement = (
+            select(
+                TaxonomyNode.id,
+                TaxonomyNode.name,
+                TaxonomyNode.parent_id,
+                func.sum(PortfolioSnapshot.value_jpy).label("value_jpy"),
+            )
+            .join(TaxonomyNodePath, TaxonomyNodePath.ancestor_id == TaxonomyNode.id)
+            .join(PortfolioSnapshot, PortfolioSnapshot.taxonomy_node_id == TaxonomyNodePath.descendant_id)
+            .group_by(TaxonomyNode.id)
+        )
+    else:
+        statement = select(
             TaxonomyNode.id,
             TaxonomyNode.name,
-            func.sum(Valuation.value_jpy).label("value_jpy"),
-        )
-        .join(InstrumentClassification, InstrumentClassification.taxonomy_node_id == TaxonomyNode.id)
-        .join(Valuation, Valuation.instrument_id == InstrumentClassification.instrument_id)
+            TaxonomyNode.parent_id,
+            PortfolioSnapshot.value_jpy,
+        ).join(PortfolioSnapshot, PortfolioSnapshot.taxonomy_node_id == TaxonomyNode.id)
+    return statement.join(Taxonomy, Taxonomy.id == TaxonomyNode.taxonomy_id).where(
+        Taxonomy.name == taxonomy, PortfolioSnapshot.snapshot_date == _snapshot_as_of(as_of)
+    )
+
+
+def _store_allocation_rows(as_of: date, taxonomy: str, rollup: bool) -> Reads[list[tuple]]:
+    nodes = yield (
+        select(TaxonomyNode.id, TaxonomyNode.name, TaxonomyNode.parent_id)
+        .join(Taxonomy)
+        .where(Taxonomy.name == taxonomy)
+        .order_by(TaxonomyNode.id)
+    )
+    cells = yield from _store_node_cells(taxonomy, rollup, [as_of])
+    value_by_node = {node_id: value for _, node_id, value in cells}
+    return [(*node, value_by_node[node.id]) for node in nodes if node.id in value_by_node]
+
+
+def _store_node_cells(taxonomy: str, rollup: bool, days: list[date]) -> Reads[list[tuple[date, int, float]]]:
+    # The column store's counterpart to the snapshot rows: (day, node, value)
+    # wherever a classified holding is in force. Only the classification and
+    # closure pairs are read; the sums are grouped in memory.
+    pairs = yield (
+        select(InstrumentClassification.instrument_id, InstrumentClassification.taxonomy_node_id)
+        .join(TaxonomyNode, TaxonomyNode.id == InstrumentClassification.taxonomy_node_id)
         .join(Taxonomy, Taxonomy.id == TaxonomyNode.taxonomy_id)
-        .filter(Taxonomy.name == taxonomy, Valuation.valuation_date == as_of)
-        .group_by(TaxonomyNode.id)
-        .all()
+        .where(Taxonomy.name == taxonomy)
+        .order_by(InstrumentClassification.instrument_id)
+    )
+    paths = None
+    if rollup:
+        paths = yield (
+            select(TaxonomyNodePath.descendant_id, TaxonomyNodePath.ancestor_id)
+            .join(TaxonomyNode, TaxonomyNode.id == TaxonomyNodePath.descendant_id)
+            .join(Taxonomy, Taxonomy.id == TaxonomyNode.taxonomy_id)
+            .where(Taxonomy.name == taxonomy)
+        )
+    node_ids, sums, present = valuation_store.node_totals(
+        np.fromiter((day.toordinal() for day in days), np.int64, len(days)),
+        _id_pairs(pairs),
+        None if paths is None else _id_pairs(paths),
+    )
+    rows, columns = (index.tolist() for index in np.nonzero(present))
+    return [(days[row], int(node_ids[column]), float(sums[row, column])) for row, column in zip(rows, columns)]
+
+
+def _id_pairs(rows: list) -> tuple[np.ndarray, np.ndarray] | None:
+    if not rows:
+        return None
+    return (
+        np.fromiter((row[0] for row in rows), np.int64, len(rows)),
+        np.fromiter((row[1] for row in rows), np.int64, len(rows)),
     )
-    values = {row.id: float(row.value_jpy or 0) for row in rows}
-    weights = calculate_allocation(values)
+
+
+def allocation_reads(as_of: date, taxonomy: str, rollup: bool = False) -> Reads[list[dict]]:
+    if valuation_store.loaded:
+        rows = yield from _store_allocation_rows(as_of, taxonomy, rollup)
+    else:
+        rows = yield _allocation_statement(as_of, taxonomy, rollup)
+    values = {node_id: float(value or 0) for node_id, _, _, value in rows}
+    if rollup:
+        total = sum(values[node_id] for node_id, _, parent_id, _ in rows if parent_id is None)
+        weights = {node_id: value / total if total else 0.0 for node_id, value in values.items()}
+    else:
+        weights = calculate_allocation(values)
     return [
         {
-            "taxonomy_node_id": row.id,
-            "taxonomy_node_name": row.name,
-            "value_jpy": float(row.value_jpy or 0),
-            "weight": weights.get(row.id, 0.0),
+            "taxonomy_node_id": node_id,
+            "taxonomy_node_name": name,
+            "parent_id": parent_id,
+            "value_jpy": float(value or 0),
+            "weight": weights.get(node_id, 0.0),
         }
-        for row in rows
+        for node_id, name, parent_id, value in rows
     ]
 
 
-def get_deviation(session: Session, as_of: date, taxonomy: str) -> list[dict]:
-    allocation = get_allocation(session, as_of, taxonomy)
-    total_value = sum(item["value_jpy"] for item in allocation)
+def get_allocation(session: Session, as_of: date, taxonomy: str, rollup: bool = False) -> list[dict]:
+    return run_reads(session, allocation_reads(as_of, taxonomy, rollup))
+
+
+def deviation_reads(as_of: date, taxonomy: str, rollup: bool = False) -> Reads[list[dict]]:
+    allocation = yield from allocation_reads(as_of, taxonomy, rollup)
+    if rollup:
+        total_value = sum(item["value_jpy"] for item in allocation if item["parent_id"] is None)
+    else:
+        total_value = sum(item["value_jpy"] for item in allocation)
     actual_weights = {item["taxonomy_node_id"]: item["weight"] for item in allocation}
-    targets = (
-        session.query(TargetAllocation)
+    targets = yield (
+        select(TargetAllocation.taxonomy_node_id, TargetAllocation.target_weight)
         .join(Taxonomy)
-        .filter(Taxonomy.name == taxonomy)
-        .all()
+        .where(Taxonomy.name == taxonomy)
     )
-    target_weights = {target.taxonomy_node_id: target.target_weight for target in targets}
-    deviations = calculate_deviation(actual_weights, target_weights, total_value)
-    nodes = (
-        session.query(TaxonomyNode)
+    deviations = calculate_deviation(actual_weights, dict(targets), total_value)
+    nodes = yield (
+        select(TaxonomyNode.id, TaxonomyNode.name, TaxonomyNode.parent_id)
         .join(Taxonomy)
-        .filter(Taxonomy.name == taxonomy)
-        .all()
+        .where(Taxonomy.name == taxonomy)
     )
-    node_map = {node.id: node.name for node in nodes}
+    node_map = {node.id: node for node in nodes}
     response = []
     for node_id, metrics in deviations.items():
+        node = node_map.get(node_id)
         response.append(
             {
                 "taxonomy_node_id": node_id,
-                "taxonomy_node_name": node_map.get(node_id, "Unknown"),
+                "taxonomy_node_name": node.name if node else "Unknown",
+                "parent_id": node.parent_id if node else None,
                 **metrics,
             }
         )
     return response
 
 
-def get_timeseries(session: Session, start: date, end: date, group_by: str) -> list[dict]:
-    if group_by == "month":
-        period_expr = func.strftime("%Y-%m", Valuation.valuation_date)
+def get_deviation(session: Session, as_of: date, taxonomy: str, rollup: bool = False) -> list[dict]:
+    return run_reads(session, deviation_reads(as_of, taxonomy, rollup))
+
+
+def _matrix_dates(
+    dates: list[date] | None, start: date | None, end: date | None, frequency: str
+) -> Reads[tuple[list[date], list[date | None]]]:
+    if not dates:
+        # Like the timeseries, a range resolves to the closing valuation date of
+        # each period rather than calendar period ends.
+        ordinals, _ = yield from _daily_totals(start, end)
+        ends = period_ends(period_keys(ordinals, frequency))
+        closing = [date.fromordinal(int(ordinal)) for ordinal in ordinals[ends]]
+        return closing, closing
+    dates = sorted(set(dates))
+    available = yield (
+        select(PortfolioSnapshotTotal.snapshot_date)
+        .where(
+            PortfolioSnapshotTotal.snapshot_date >= func.coalesce(_snapshot_as_of(dates[0]), dates[0]),
+            PortfolioSnapshotTotal.snapshot_date <= dates[-1],
+        )
+        .order_by(PortfolioSnapshotTotal.snapshot_date)
+    )
+    available = [row.snapshot_date for row in available]
+    positions = np.searchsorted(
+        np.fromiter((day.toordinal() for day in available), np.int64, len(available)),
+        [day.toordinal() for day in dates],
+        side="right",
+    )
+    return dates, [available[position - 1] if position else None for position in positions.tolist()]
+
+
+def _snapshot_node_cells(taxonomy: str, rollup: bool, snapshots: list[date]) -> Reads[list]:
+    if rollup:
+        node_id = TaxonomyNodePath.ancestor_id
+        base = (
+            select(PortfolioSnapshot.snapshot_date, node_id, func.sum(PortfolioSnapshot.value_jpy))
+            .join(TaxonomyNodePath, TaxonomyNodePath.descendant_id == PortfolioSnapshot.taxonomy_node_id)
+            .join(TaxonomyNode, TaxonomyNode.id == node_id)
+        )
+    else:
+        node_id = PortfolioSnapshot.taxonomy_node_id
+        base = select(PortfolioSnapshot.snapshot_date, node_id, func.sum(PortfolioSnapshot.value_jpy)).join(
+            TaxonomyNode, TaxonomyNode.id == node_id
+        )
+    base = (
+        base.join(Taxonomy, Taxonomy.id == TaxonomyNode.taxonomy_id)
+        .where(Taxonomy.name == taxonomy)
+        .group_by(PortfolioSnapshot.snapshot_date, node_id)
+    )
+    rows = []
+    for offset in range(0, len(snapshots), BREAKDOWN_DATE_CHUNK):
+        chunk = snapshots[offset : offset + BREAKDOWN_DATE_CHUNK]
+        rows += yield base.where(PortfolioSnapshot.snapshot_date.in_(chunk))
+    return rows
+
+
+def _allocation_matrix(
+    taxonomy: str,
+    dates: list[date],
+    snapshot_dates: list[date | None],
+    rollup: bool,
+    target_node_ids: set[int],
+) -> Reads[dict]:
+    snapshots = sorted({day for day in snapshot_dates if day is not None})
+    if valuation_store.loaded:
+        rows = yield from _store_node_cells(taxonomy, rollup, snapshots)
     else:
-        period_expr = func.strftime("%Y-%m-%d", Valuation.valuation_date)
-
-    rows = (
-        session.query(period_expr.label("period"), func.sum(Valuation.value_jpy).label("total"))
-        .filter(Valuation.valuation_date.between(start, end))
-        .group_by("period")
-        .order_by("period")
-        .all()
+        rows = yield from _snapshot_node_cells(taxonomy, rollup, snapshots)
+
+    used = {row[1] for row in rows} | target_node_ids
+    nodes = yield (
+        select(TaxonomyNode.id, TaxonomyNode.name, TaxonomyNode.parent_id)
+        .join(Taxonomy)
+        .where(Taxonomy.name == taxonomy)
+        .order_by(TaxonomyNode.id)
     )
-    return [{"period": row.period, "total_value_jpy": float(row.total or 0)} for row in rows]
+    nodes = [node for node in nodes if node.id in used]
+    snapshot_index = {day: index for index, day in enumerate(snapshots)}
+    node_index = {node.id: index for index, node in enumerate(nodes)}
+    # The extra zero row stands in for requested dates before the first snapshot.
+    snapshot_values = np.zeros((len(snapshots) + 1, len(nodes)))
+    for row_date, row_node_id, value in rows:
+        snapshot_values[snapshot_index[row_date], node_index[row_node_id]] = value or 0
+    values = snapshot_values[[snapshot_index.get(day, len(snapshots)) for day in snapshot_dates]]
+    if rollup:
+        roots = np.array([node.parent_id is None for node in nodes], dtype=bool)
+        totals = values[:, roots].sum(axis=1)
+    else:
+        totals = values.sum(axis=1)
+    weights = np.divide(values, totals[:, None], out=np.zeros_like(values), where=totals[:, None] != 0)
+    return {
+        "dates": dates,
+        "nodes": [
+            {"taxonomy_node_id": node.id, "taxonomy_node_name": node.name, "parent_id": node.parent_id}
+            for node in nodes
+        ],
+        "total_value_jpy": totals,
+        "value_jpy": values,
+        "weight": weights,
+    }
+
+
+def allocation_matrix_reads(
+    taxonomy: str,
+    dates: list[date] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    frequency: str = "month",
+    rollup: bool = False,
+) -> Reads[dict]:
+    dates, snapshot_dates = yield from _matrix_dates(dates, start, end, frequency)
+    matrix = yield from _allocation_matrix(taxonomy, dates, snapshot_dates, rollup, set())
+    return {
+        **matrix,
+        "total_value_jpy": matrix["total_value_jpy"].tolist(),
+        "value_jpy": matrix["value_jpy"].tolist(),
+        "weight": matrix["weight"].tolist(),
+    }
+
+
+def get_allocation_matrix(
+    session: Session,
+    taxonomy: str,
+    dates: list[date] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    frequency: str = "month",
+    rollup: bool = False,
+) -> dict:
+    return run_reads(session, allocation_matrix_reads(taxonomy, dates, start, end, frequency, rollup))
+
+
+def deviation_matrix_reads(
+    taxonomy: str,
+    dates: list[date] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    frequency: str = "month",
+    rollup: bool = False,
+) -> Reads[dict]:
+    dates, snapshot_dates = yield from _matrix_dates(dates, start, end, frequency)
+    target_rows = yield (
+        select(TargetAllocation.taxonomy_node_id, TargetAllocation.target_weight)
+        .join(Taxonomy)
+        .where(Taxonomy.name == taxonomy)
+    )
+    target_by_node = dict(target_rows)
+    matrix = yield from _allocation_matrix(taxonomy, dates, snapshot_dates, rollup, set(target_by_node))
+    targets = np.array([target_by_node.get(node["taxonomy_node_id"], 0.0) for node in matrix["nodes"]])
+    diff = matrix["weight"] - targets
+    return {
+        "dates": dates,
+        "nodes": matrix["nodes"],
+        "total_value_jpy": matrix["total_value_jpy"].tolist(),
+        "target_weight": targets.tolist(),
+        "actual_weight": matrix["weight"].tolist(),
+        "diff_weight_pp": diff.tolist(),
+        "diff_value_jpy": (diff * matrix["total_value_jpy"][:, None]).tolist(),
+    }
+
+
+def get_deviation_matrix(
+    session: Session,
+    taxonomy: str,
+    dates: list[date] | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    frequency: str = "month",
+    rollup: bool = False,
+) -> dict:
+    return run_reads(session, deviation_matrix_reads(taxonomy, dates, start, end, frequency, rollup))
+
+
+def _daily_totals(start: date, end: date) -> Reads[tuple[np.ndarray, np.ndarray]]:
+    if valuation_store.loaded:
+        return valuation_store.daily_totals(start, end)
+    rows = yield (
+        select(PortfolioSnapshotTotal.snapshot_date, PortfolioSnapshotTotal.total_value_jpy)
+        .where(PortfolioSnapshotTotal.snapshot_date.between(start, end))
+        .order_by(PortfolioSnapshotTotal.snapshot_date)
+    )
+    ordinals = np.fromiter((row.snapshot_date.toordinal() for row in rows), np.int64, len(rows))
+    totals = np.fromiter((row.total_value_jpy or 0 for row in rows), np.float64, len(rows))
+    return ordinals, totals
+
+
+def _net_flows(start: date, closing_ordinals: np.ndarray) -> Reads[np.ndarray]:
+    flows = np.zeros(len(closing_ordinals))
+    if not len(closing_ordinals):
+        return flows
+    rows = yield (
+        select(
+            Transaction.transaction_type,
+            Transaction.transaction_date,
+            func.sum(func.abs(Transaction.amount_jpy)).label("amount"),
+        )
+        .where(
+            Transaction.transaction_type.in_(CASH_FLOW_SIGNS),
+            Transaction.transaction_date.between(start, date.fromordinal(int(closing_ordinals[-1]))),
+        )
+        .group_by(Transaction.transaction_type, Transaction.transaction_date)
+    )
+    if rows:
+        ordinals = np.fromiter((row.transaction_date.toordinal() for row in rows), np.int64, len(rows))
+        amounts = np.fromiter(
+            (CASH_FLOW_SIGNS[row.transaction_type] * (row.amount or 0) for row in rows), np.float64, len(rows)
+        )
+        # A flow belongs to the first period that closes on or after its date.
+        periods = np.searchsorted(closing_ordinals, ordinals, side="left")
+        flows += np.bincount(periods, weights=amounts, minlength=len(closing_ordinals))
+    return flows
+
+
+def _breakdown(breakdown: str, taxonomy: str, closing_ordinals: np.ndarray) -> Reads[list[list[dict]]]:
+    closing_dates = [date.fromordinal(int(ordinal)) for ordinal in closing_ordinals]
+    if breakdown == "taxonomy":
+        if valuation_store.loaded:
+            rows = yield from _store_node_cells(taxonomy, False, closing_dates)
+        else:
+            rows = yield from _snapshot_node_cells(taxonomy, False, closing_dates)
+        names = select(TaxonomyNode.id, TaxonomyNode.name).join(Taxonomy).where(Taxonomy.name == taxonomy)
+        cells = [(row[0].toordinal(), row[1], float(row[2] or 0)) for row in rows]
+    elif len(closing_dates):
+        # Account and instrument splits come straight from valuations, carried
+        # forward per holding like the snapshots are.
+        model = Account if breakdown == "account" else Instrument
+        if valuation_store.loaded:
+            key_ids, sums, present = valuation_store.holding_totals(closing_ordinals, breakdown)
+        else:
+            account_ids, instrument_ids, valid_from, valid_to, values = holding_spans(
+                (yield as_of_rows(closing_dates[0], closing_dates[-1]))
+            )
+            key_ids, columns = np.unique(account_ids if breakdown == "account" else instrument_ids, return_inverse=True)
+            sums = carry_forward(closing_ordinals, valid_from, valid_to, values, columns, len(key_ids))
+            spans = np.ones(len(values))
+            present = carry_forward(closing_ordinals, valid_from, valid_to, spans, columns, len(key_ids)) > 0.5
+        # Instrument id 0 stands for account-level valuations.
+        keys = [None if key_id == 0 else key_id for key_id in key_ids.tolist()]
+        cells = [
+            (int(closing_ordinals[row]), keys[column], float(sums[row, column]))
+            for row, column in zip(*(index.tolist() for index in np.nonzero(present)))
+        ]
+        names = select(model.id, model.name).where(model.id.in_([key for key in keys if key is not None]))
+    else:
+        cells, names = [], None
+
+    period_by_ordinal = {int(ordinal): index for index, ordinal in enumerate(closing_ordinals)}
+    key_ids = {key_id for _, key_id, _ in cells if key_id is not None}
+    name_by_id = dict((yield names)) if key_ids else {}
+    periods: list[list[dict]] = [[] for _ in closing_dates]
+    for ordinal, key_id, value in sorted(cells, key=lambda cell: (cell[0], cell[1] is None, cell[1] or 0)):
+        periods[period_by_ordinal[ordinal]].append(
+            {"key_id": key_id, "name": name_by_id.get(key_id, "Unassigned"), "value_jpy": value}
+        )
+    return periods
+
+
+def timeseries_reads(
+    start: date,
+    end: date,
+    group_by: str,
+    breakdown: str | None = None,
+    taxonomy: str = "asset_class",
+    metrics: bool = False,
+    window: int = 12,
+    max_points: int | None = None,
+) -> Reads[list[dict]]:
+    # Each period reports its closing value: the portfolio total on the last
+    # valuation date inside it, which keeps week..year series comparable.
+    ordinals, totals = yield from _daily_totals(start, end)
+    keys = period_keys(ordinals, group_by)
+    ends = period_ends(keys)
+    closing_ordinals, closing_values = ordinals[ends], totals[ends]
+    if metrics:
+        flows = yield from _net_flows(start, closing_ordinals)
+        computed = timeseries_metrics(closing_values, flows, window, PERIODS_PER_YEAR[group_by])
+    # Downsampling runs after aggregation and metrics, so the kept points carry
+    # the same values they would have in the full series.
+    selected = lttb_indices(closing_ordinals, closing_values, max_points) if max_points else np.arange(len(ends))
+
+    points = [
+        {
+            "period": period_label(int(keys[ends[index]]), group_by),
+            "total_value_jpy": float(closing_values[index]),
+        }
+        for index in selected
+    ]
+    if metrics:
+        for index, point in zip(selected, points):
+            point["net_flow_jpy"] = float(flows[index])
+            for name, values in computed.items():
+                point[name] = None if np.isnan(values[index]) else float(values[index])
+    if breakdown is not None:
+        items = yield from _breakdown(breakdown, taxonomy, closing_ordinals[selected])
+        for point, point_items in zip(points, items):
+            point["breakdown"] = point_items
+    return points
+
+
+def get_timeseries(
+    session: Session,
+    start: date,
+    end: date,
+    group_by: str,
+    breakdown: str | None = None,
+    taxonomy: str = "asset_class",
+    metrics: bool = False,
+    window: int = 12,
+    max_points: int | None = None,
+) -> list[dict]:
+    reads = timeseries_reads(start, end, group_by, breakdown, taxonomy, metrics, window, max_points)
+    return run_reads(session, reads)
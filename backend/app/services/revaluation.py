@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+from datetime import date
+
+import numpy as np
+from sqlalchemy import and_, func, select, union_all
+from sqlalchemy.orm import Session, aliased
+
+from app.models.portfolio import Position, PositionCheckpoint, Price
+from app.services.fx import convert_to_jpy, currency_codes
+from app.services.snapshots import SnapshotDeltas
+from app.services.valuations import CompiledValuationUpsert
+
+REVALUATION_DATE_CHUNK = 64
+
+_KEY_SHIFT = np.int64(1 << 32)
+
+
+def _as_of(keys: np.ndarray, query_keys: np.ndarray, groups: np.ndarray, query_groups: np.ndarray) -> np.ndarray:
+    # Index of the latest row on or before each query in the same group, or -1.
+    if not len(keys):
+        return np.full(len(query_keys), -1)
+    matches = np.searchsorted(keys, query_keys, side="right") - 1
+    found = (matches >= 0) & (groups[np.maximum(matches, 0)] == query_groups)
+    return np.where(found, matches, -1)
+
+
+class Revaluation:
+    # Positions, prices and checkpoints for [start, end] are read once; write()
+    # then values any sub-range of it, so a job revaluing a long range window by
+    # window does not re-read the same history for every window.
+    def __init__(self, session: Session, start: date, end: date, account_id: int | None = None) -> None:
+        self.session = session
+        self.days = np.empty(0, np.int64)
+        filters = [Position.quantity.is_not(None)]
+        if account_id is not None:
+            filters.append(Position.account_id == account_id)
+        held = (
+            select(PositionCheckpoint.id)
+            .where(
+                PositionCheckpoint.account_id == Position.account_id,
+                PositionCheckpoint.instrument_id == Position.instrument_id,
+            )
+            .exists()
+        )
+        positions = session.execute(
+            select(Position.id, Position.account_id, Position.instrument_id, Position.quantity, held).where(*filters)
+        ).all()
+        self.positions = len(positions)
+        if not positions:
+            return
+        position_ids, account_ids, instrument_ids, quantities, from_ledger = (
+            np.array(column) for column in zip(*positions)
+        )
+        self.position_ids, self.account_ids = position_ids, account_ids
+        self.instrument_ids = instrument_ids.astype(np.int64)
+        self.quantities = quantities.astype(float)
+        self.from_ledger = from_ledger.astype(bool)
+
+        prices = _load_prices(session, filters, start, end)
+        if not prices:
+            return
+        price_instruments = np.array([row[0] for row in prices], dtype=np.int64)
+        price_days = np.array([row[1].toordinal() for row in prices], dtype=np.int64)
+        price_values = np.array([row[2] for row in prices], dtype=float)
+        self.currencies, price_currencies = currency_codes(row[3] for row in prices)
+        # (instrument, day) packed into one sorted key makes the as-of join a
+        # single searchsorted over every position and revaluation date.
+        order = np.lexsort((price_days, price_instruments))
+        self.price_instruments, self.price_values = price_instruments[order], price_values[order]
+        self.price_currencies = price_currencies[order]
+        self.price_keys = self.price_instruments * _KEY_SHIFT + price_days[order]
+
+        # Quantities come from the ledger's checkpoints as of each date; positions
+        # the ledger has never touched keep their stored quantity throughout.
+        index_by_holding = {
+            (account, instrument): index
+            for index, (account, instrument) in enumerate(zip(account_ids.tolist(), self.instrument_ids.tolist()))
+        }
+        checkpoints = _load_checkpoints(session, filters, start, end)
+        checkpoint_positions = np.array(
+            [index_by_holding[(row[0], row[1])] for row in checkpoints], dtype=np.int64
+        )
+        checkpoint_days = np.array([row[2].toordinal() for row in checkpoints], dtype=np.int64)
+        checkpoint_quantities = np.array([row[3] for row in checkpoints], dtype=float)
+        order = np.lexsort((checkpoint_days, checkpoint_positions))
+        self.checkpoint_positions = checkpoint_positions[order]
+        self.checkpoint_quantities = checkpoint_quantities[order]
+        self.checkpoint_keys = self.checkpoint_positions * _KEY_SHIFT + checkpoint_days[order]
+
+        self.days = np.unique(price_days[(price_days >= start.toordinal()) & (price_days <= end.toordinal())])
+
+    def write(self, start: date, end: date, refresh: bool = True) -> dict:
+        days = self.days[(self.days >= start.toordinal()) & (self.days <= end.toordinal())]
+        upsert = CompiledValuationUpsert(self.session.connection()) if days.size else None
+        upserted = 0
+        for chunk_start in range(0, days.size, REVALUATION_DATE_CHUNK):
+            chunk = days[chunk_start : chunk_start + REVALUATION_DATE_CHUNK]
+            upserted += self._write_chunk(upsert, chunk, refresh)
+        return {"positions": self.positions, "dates": int(days.size), "upserted": upserted}
+
+    def _write_chunk(self, upsert: CompiledValuationUpsert, chunk: np.ndarray, refresh: bool) -> int:
+        row_positions = np.repeat(np.arange(self.positions), chunk.size)
+        row_days = np.tile(chunk, self.positions)
+        row_instruments = self.instrument_ids[row_positions]
+        matches = _as_of(
+            self.price_keys, row_instruments * _KEY_SHIFT + row_days, self.price_instruments, row_instruments
+        )
+        held = _as_of(
+            self.checkpoint_keys, row_positions * _KEY_SHIFT + row_days, self.checkpoint_positions, row_positions
+        )
+        quantities = self.quantities[row_positions]
+        ledger = self.from_ledger[row_positions]
+        quantities[ledger & (held >= 0)] = self.checkpoint_quantities[held[ledger & (held >= 0)]]
+        # A ledger position has nothing to value before its first checkpoint.
+        valid = (matches >= 0) & (~ledger | (held >= 0))
+        matched = matches[valid]
+        row_positions, row_days = row_positions[valid], row_days[valid]
+        # Foreign prices are converted at the revaluation date, not the quote
+        # date; rows without a rate on or before that date are skipped.
+        values = convert_to_jpy(
+            self.session,
+            self.currencies,
+            self.price_currencies[matched],
+            row_days,
+            quantities[valid] * self.price_values[matched],
+        )
+        converted = ~np.isnan(values)
+        row_positions, row_days = row_positions[converted], row_days[converted]
+        if not row_positions.size:
+            return 0
+        dates_by_day = {day: date.fromordinal(day) for day in chunk.tolist()}
+        columns = {
+            "account_id": self.account_ids[row_positions].tolist(),
+            "instrument_id": self.instrument_ids[row_positions].tolist(),
+            "position_id": self.position_ids[row_positions].tolist(),
+            "valuation_date": [dates_by_day[day] for day in row_days.tolist()],
+            "value_jpy": values[converted].tolist(),
+        }
+        deltas = (
+            SnapshotDeltas(
+                self.session, zip(columns["account_id"], columns["instrument_id"], columns["valuation_date"])
+            )
+            if refresh
+            else None
+        )
+        upsert.execute_columns(self.session.connection(), columns)
+        if deltas is not None:
+            deltas.apply()
+        return int(row_positions.size)
+
+
+def revalue_positions(
+    session: Session,
+    start: date,
+    end: date,
+    account_id: int | None = None,
+    refresh: bool = True,
+) -> dict:
+    return Revaluation(session, start, end, account_id).write(start, end, refresh)
+
+
+def _load_prices(session: Session, position_filters: list, start: date, end: date) -> list:
+    # Prices inside the range plus each instrument's latest one before it, the
+    # quote still in force when the range opens; older history is never read.
+    instruments = select(Position.instrument_id).where(*position_filters).distinct().subquery()
+    columns = (Price.instrument_id, Price.price_date, Price.price, Price.currency)
+    earlier = aliased(Price)
+    seed_date = (
+        select(func.max(earlier.price_date))
+        .where(earlier.instrument_id == instruments.c.instrument_id, earlier.price_date < start)
+        .correlate(instruments)
+        .scalar_subquery()
+    )
+    seeds = select(*columns).join(
+        instruments, and_(Price.instrument_id == instruments.c.instrument_id, Price.price_date == seed_date)
+    )
+    in_range = select(*columns).join(instruments, Price.instrument_id == instruments.c.instrument_id).where(
+        Price.price_date >= start, Price.price_date <= end
+    )
+    return session.execute(union_all(seeds, in_range)).all()
+
+
+def _load_checkpoints(session: Session, position_filters: list, start: date, end: date) -> list:
+    columns = (
+        PositionCheckpoint.account_id,
+        PositionCheckpoint.instrument_id,
+        PositionCheckpoint.checkpoint_date,
+        PositionCheckpoint.quantity,
+    )
+    holding = and_(
+        PositionCheckpoint.account_id == Position.account_id,
+        PositionCheckpoint.instrument_id == Position.instrument_id,
+    )
+    earlier = aliased(PositionCheckpoint)
+    seed_date = (
+        select(func.max(earlier.checkpoint_date))
+        .where(
+            earlier.account_id == Position.account_id,
+            earlier.instrument_id == Position.instrument_id,
+            earlier.checkpoint_date < start,
+        )
+        .correlate(Position)
+        .scalar_subquery()
+    )
+    seeds = (
+        select(*columns)
+        .select_from(Position)
+        .join(PositionCheckpoint, and_(holding, PositionCheckpoint.checkpoint_date == seed_date))
+        .where(*position_filters)
+    )
+    in_range = (
+        select(*columns)
+        .select_from(Position)
+        .join(PositionCheckpoint, holding)
+        .where(*position_filters, PositionCheckpoint.checkpoint_date >= start, PositionCheckpoint.checkpoint_date <= end)
+    )
+    return session.execute(union_all(seeds, in_range)).all()
@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import Date, bindparam, delete, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.portfolio import Valuation
+from app.models.snapshots import PortfolioSnapshot, PortfolioSnapshotTotal
+from app.models.taxonomies import InstrumentClassification
+from app.services.asof import VALUATION_COLUMNS, CompiledInForce, as_of_seeds, holding_spans
+from app.services.calculations import OPEN_ENDED, carry_forward
+
+REFRESH_CHUNK_SIZE = 500
+# Three bound parameters per key, well under SQLite's limit per statement.
+DELTA_CHUNK_SIZE = 5000
+
+
+class SnapshotWindows:
+    # Recomputes snapshots from scratch from `start` on, one window at a time:
+    # every holding is carried forward to its latest valuation on or before each
+    # valuation date. Each holding's latest row at the end of a window seeds the
+    # next one, so a long range reads every valuation once. Writes go through
+    # SnapshotDeltas instead; this is for rebuilds and windowed job passes.
+    def __init__(self, session: Session, start: date | None) -> None:
+        self.session = session
+        self.start = start
+        self.seeds = [] if start is None else session.connection().execute(as_of_seeds(start)).all()
+        self.pairs = _classification_pairs(session)
+
+    def refresh(self, end: date | None = None) -> None:
+        session, start = self.session, self.start
+        snapshot_filter, total_filter, valuation_filter = [], [], []
+        if start is not None:
+            snapshot_filter.append(PortfolioSnapshot.snapshot_date >= start)
+            total_filter.append(PortfolioSnapshotTotal.snapshot_date >= start)
+            valuation_filter.append(Valuation.valuation_date >= start)
+        if end is not None:
+            snapshot_filter.append(PortfolioSnapshot.snapshot_date <= end)
+            total_filter.append(PortfolioSnapshotTotal.snapshot_date <= end)
+            valuation_filter.append(Valuation.valuation_date <= end)
+        session.execute(delete(PortfolioSnapshot).where(*snapshot_filter))
+        session.execute(delete(PortfolioSnapshotTotal).where(*total_filter))
+
+        # Core rows: the ORM result layer costs more than the snapshot maths here.
+        rows = self.seeds + session.connection().execute(select(*VALUATION_COLUMNS).where(*valuation_filter)).all()
+        account_ids, instrument_ids, valid_from, valid_to, values = holding_spans(rows)
+        if end is not None:
+            latest = valid_to == OPEN_ENDED
+            self.seeds = list(
+                zip(
+                    map(date.fromordinal, valid_from[latest].tolist()),
+                    account_ids[latest].tolist(),
+                    instrument_ids[latest].tolist(),
+                    values[latest].tolist(),
+                )
+            )
+            self.start = end + timedelta(days=1)
+
+        # Snapshot days are the valuation dates in the window; seeds predate it.
+        ordinals = np.unique(valid_from)
+        if start is not None:
+            ordinals = ordinals[ordinals >= start.toordinal()]
+        if not ordinals.size:
+            return
+        days = [date.fromordinal(day) for day in ordinals.tolist()]
+
+        totals = carry_forward(ordinals, valid_from, valid_to, values)[:, 0]
+        for offset in range(0, len(days), REFRESH_CHUNK_SIZE):
+            session.execute(
+                insert(PortfolioSnapshotTotal),
+                [
+                    {"snapshot_date": day, "total_value_jpy": float(total)}
+                    for day, total in zip(days[offset : offset + REFRESH_CHUNK_SIZE], totals[offset:])
+                ],
+            )
+
+        classified = classified_spans(self.pairs, instrument_ids)
+        if classified is None:
+            return
+        spans, node_ids, node_index = classified
+        valid_from, valid_to, values = valid_from[spans], valid_to[spans], values[spans]
+        sums = carry_forward(ordinals, valid_from, valid_to, values, node_index, len(node_ids))
+        # Counting spans alongside the sums keeps a node's row on days its holdings
+        # are worth zero, matching what a plain GROUP BY over valuations would emit.
+        present = carry_forward(ordinals, valid_from, valid_to, np.ones(len(spans)), node_index, len(node_ids))
+        day_index, column = np.nonzero(present > 0.5)
+        rows = [
+            {"snapshot_date": days[row], "taxonomy_node_id": int(node_ids[col]), "value_jpy": float(sums[row, col])}
+            for row, col in zip(day_index.tolist(), column.tolist())
+        ]
+        for offset in range(0, len(rows), REFRESH_CHUNK_SIZE * 10):
+            session.execute(insert(PortfolioSnapshot), rows[offset : offset + REFRESH_CHUNK_SIZE * 10])
+
+
+def _classification_pairs(session: Session) -> tuple[np.ndarray, np.ndarray] | None:
+    pairs = session.execute(
+        select(InstrumentClassification.instrument_id, InstrumentClassification.taxonomy_node_id).order_by(
+            InstrumentClassification.instrument_id
+        )
+    ).all()
+    if not pairs:
+        return None
+    return (
+        np.fromiter((pair[0] for pair in pairs), np.int64, len(pairs)),
+        np.fromiter((pair[1] for pair in pairs), np.int64, len(pairs)),
+    )
+
+
+def classified_spans(
+    pairs: tuple[np.ndarray, np.ndarray] | None, instrument_ids: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+    # One span per (valuation, classification) pair: an instrument counts
+    # towards one node in every taxonomy that classifies it.
+    if pairs is None or not len(instrument_ids):
+        return None
+    pair_instruments, pair_nodes = pairs
+    low = np.searchsorted(pair_instruments, instrument_ids, side="left")
+    counts = np.searchsorted(pair_instruments, instrument_ids, side="right") - low
+    spans = np.repeat(np.arange(len(instrument_ids)), counts)
+    offsets = np.arange(len(spans)) - np.repeat(np.cumsum(counts) - counts, counts)
+    node_ids, node_index = np.unique(pair_nodes[np.repeat(low, counts) + offsets], return_inverse=True)
+    return spans, node_ids, node_index
+
+
+def add_snapshot_statement(dialect_name: str):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(PortfolioSnapshot.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=["snapshot_date", "taxonomy_node_id"],
+        set_={"value_jpy": PortfolioSnapshot.__table__.c.value_jpy + stmt.excluded.value_jpy},
+    )
+
+
+class SnapshotDeltas:
+    # Keeps snapshots in step with a valuation write without recomputing them:
+    # a row written for a holding on day d only changes the days from d up to
+    # that holding's next valuation, by (new value - value in force before).
+    # Build it before the write, with the (account, instrument, date) keys
+    # about to be written, and call apply() afterwards.
+    def __init__(self, session: Session, keys: Iterable[tuple[int, int | None, date]]) -> None:
+        self.session = session
+        self.keys = sorted({(account_id, instrument_id or 0, day) for account_id, instrument_id, day in keys})
+        self._in_force_query = CompiledInForce(session.connection())
+        self.before = self._in_force()
+
+    def _in_force(self) -> dict[tuple[int, int, date], tuple]:
+        found = {}
+        connection = self.session.connection()
+        for offset in range(0, len(self.keys), DELTA_CHUNK_SIZE):
+            for row in self._in_force_query.execute(connection, self.keys[offset : offset + DELTA_CHUNK_SIZE]):
+                found[row[:3]] = row[3:]
+        return found
+
+    def apply(self) -> None:
+        after = self._in_force()
+        written = []
+        for key in self.keys:
+            valuation_date, value, following = after.get(key, (None, None, None))
+            if valuation_date != key[2]:
+                continue
+            before_date, before_value, _ = self.before.get(key, (None, None, None))
+            written.append((key[1], key[2], following, value - (before_value or 0), before_date is None))
+        if not written:
+            return
+        instrument_ids, days, following, deltas, new = zip(*written)
+        self._add_days(sorted(set(days)))
+        valid_from = np.fromiter((day.toordinal() for day in days), np.int64, len(days))
+        valid_to = np.fromiter(
+            (OPEN_ENDED if day is None else day.toordinal() for day in following), np.int64, len(following)
+        )
+        _add_spans(
+            self.session,
+            np.array(instrument_ids, np.int64),
+            valid_from,
+            valid_to,
+            np.array(deltas, np.float64),
+            np.array(new, np.float64),
+            totals=True,
+        )
+
+    def _add_days(self, days: list[date]) -> None:
+        # A date with no snapshot yet starts as a copy of the latest earlier
+        # one: nothing was valued in between, so that is its state before the write.
+        existing = set()
+        for offset in range(0, len(days), REFRESH_CHUNK_SIZE):
+            existing.update(
+                self.session.execute(
+                    select(PortfolioSnapshotTotal.snapshot_date).where(
+                        PortfolioSnapshotTotal.snapshot_date.in_(days[offset : offset + REFRESH_CHUNK_SIZE])
+                    )
+                ).scalars()
+            )
+        for day in days:
+            if day in existing:
+                continue
+            previous = (
+                select(func.max(PortfolioSnapshotTotal.snapshot_date))
+                .where(PortfolioSnapshotTotal.snapshot_date < day)
+                .scalar_subquery()
+            )
+            total = self.session.execute(
+                select(PortfolioSnapshotTotal.total_value_jpy).where(PortfolioSnapshotTotal.snapshot_date == previous)
+            ).scalar()
+            self.session.execute(insert(PortfolioSnapshotTotal), [{"snapshot_date": day, "total_value_jpy": total or 0.0}])
+            self.session.execute(
+                insert(PortfolioSnapshot).from_select(
+                    ["snapshot_date", "taxonomy_node_id", "value_jpy"],
+                    select(
+                        literal(day, Date), PortfolioSnapshot.taxonomy_node_id, PortfolioSnapshot.value_jpy
+                    ).where(PortfolioSnapshot.snapshot_date == previous),
+                )
+            )
+
+
+def _add_spans(
+    session: Session,
+    instrument_ids: np.ndarray,
+    valid_from: np.ndarray,
+    valid_to: np.ndarray,
+    deltas: np.ndarray,
+    new: np.ndarray,
+    totals: bool,
+    taxonomy_node_id: int | None = None,
+) -> None:
+    # Adds each span's delta to the snapshot days it covers. `new` marks spans
+    # of holdings that had nothing in force before, whose nodes need a row even
+    # when the value added is zero.
+    day_query = select(PortfolioSnapshotTotal.snapshot_date).where(
+        PortfolioSnapshotTotal.snapshot_date >= date.fromordinal(int(valid_from.min()))
+    )
+    if valid_to.max() < OPEN_ENDED:
+        day_query = day_query.where(PortfolioSnapshotTotal.snapshot_date < date.fromordinal(int(valid_to.max())))
+    days = session.execute(day_query.order_by(PortfolioSnapshotTotal.snapshot_date)).scalars().all()
+    if not days:
+        return
+    ordinals = np.fromiter((day.toordinal() for day in days), np.int64, len(days))
+
+    if totals:
+        table = PortfolioSnapshotTotal.__table__
+        changes = carry_forward(ordinals, valid_from, valid_to, deltas)[:, 0]
+        rows = [
+            {"day": days[index], "delta": float(changes[index])} for index in np.nonzero(changes)[0].tolist()
+        ]
+        if rows:
+            session.execute(
+                update(table)
+                .where(table.c.snapshot_date == bindparam("day"))
+                .values(total_value_jpy=table.c.total_value_jpy + bindparam("delta")),
+                rows,
+            )
+
+    if taxonomy_node_id is None:
+        classified = classified_spans(_classification_pairs(session), instrument_ids)
+    else:
+        classified = (np.arange(len(deltas)), np.array([taxonomy_node_id]), np.zeros(len(deltas), np.int64))
+    if classified is None:
+        return
+    spans, node_ids, node_index = classified
+    valid_from, valid_to = valid_from[spans], valid_to[spans]
+    changes = carry_forward(ordinals, valid_from, valid_to, deltas[spans], node_index, len(node_ids))
+    present = carry_forward(ordinals, valid_from, valid_to, new[spans], node_index, len(node_ids))
+    day_index, column = np.nonzero((changes != 0) | (present > 0.5))
+    rows = [
+        {"snapshot_date": days[row], "taxonomy_node_id": int(node_ids[col]), "value_jpy": float(changes[row, col])}
+        for row, col in zip(day_index.tolist(), column.tolist())
+    ]
+    if rows:
+        session.execute(add_snapshot_statement(session.get_bind().dialect.name), rows)
+
+
+def refresh_snapshot_range(session: Session, start: date | None, end: date | None) -> None:
+    SnapshotWindows(session, start).refresh(end)
+
+
+def rebuild_snapshots(session: Session) -> int:
+    SnapshotWindows(session, None).refresh()
+    return session.query(func.count()).select_from(PortfolioSnapshotTotal).scalar()
+
+
+def refresh_instrument_snapshots(session: Session, instrument_id: int, taxonomy_node_id: int) -> None:
+    # A new classification only adds the instrument's holdings to that node;
+    # totals and the instrument's other nodes do not change.
+    rows = session.execute(select(*VALUATION_COLUMNS).where(Valuation.instrument_id == instrument_id)).all()
+    if not rows:
+        return
+    _, instrument_ids, valid_from, valid_to, values = holding_spans(rows)
+    _add_spans(
+        session,
+        instrument_ids.astype(np.int64),
+        valid_from,
+        valid_to,
+        values,
+        np.ones(len(values)),
+        totals=False,
+        taxonomy_node_id=taxonomy_node_id,
+    )
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.models.taxonomies import InstrumentClassification, TargetAllocation, TaxonomyNode, TaxonomyNodePath
+from app.schemas.taxonomies import ClassificationCreate, TargetAllocationCreate
+from app.services.snapshots import refresh_instrument_snapshots
+
+
+def rebuild_taxonomy_paths(session: Session) -> int:
+    paths = (
+        select(
+            TaxonomyNode.id.label("ancestor_id"),
+            TaxonomyNode.id.label("descendant_id"),
+            literal(0).label("depth"),
+        )
+        .cte("paths", recursive=True)
+    )
+    paths = paths.union_all(
+        select(paths.c.ancestor_id, TaxonomyNode.id, paths.c.depth + 1).join(
+            paths, TaxonomyNode.parent_id == paths.c.descendant_id
+        )
+    )
+    session.execute(delete(TaxonomyNodePath))
+    session.execute(
+        insert(TaxonomyNodePath).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(paths.c.ancestor_id, paths.c.descendant_id, paths.c.depth),
+        )
+    )
+    return session.query(func.count()).select_from(TaxonomyNodePath).scalar()
+
+
+def classify_instrument(session: Session, payload: ClassificationCreate) -> InstrumentClassification:
+    classification = (
+        session.query(InstrumentClassification)
+        .filter(
+            InstrumentClassification.instrument_id == payload.instrument_id,
+            InstrumentClassification.taxonomy_node_id == payload.taxonomy_node_id,
+        )
+        .one_or_none()
+    )
+    if classification is None:
+        classification = InstrumentClassification(**payload.model_dump())
+        session.add(classification)
+        session.flush()
+        refresh_instrument_snapshots(session, payload.instrument_id, payload.taxonomy_node_id)
+    return classification
+
+
+def set_target_allocation(session: Session, payload: TargetAllocationCreate) -> TargetAllocation:
+    target = (
+        session.query(TargetAllocation)
+        .filter(
+            TargetAllocation.taxonomy_id == payload.taxonomy_id,
+            TargetAllocation.taxonomy_node_id == payload.taxonomy_node_id,
+        )
+        .one_or_none()
+    )
+    if target is None:
+        target = TargetAllocation(**payload.model_dump())
+        session.add(target)
+    else:
+        target.target_weight = payload.target_weight
+    session.flush()
+    return target
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping, Sequence
+from datetime import date
+
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.validation import format_validation_errors
+from app.models.portfolio import Valuation, valuation_key_index
+from app.schemas.valuations import ValuationCreate
+from app.services.snapshots import SnapshotDeltas, SnapshotWindows
+
+BULK_BATCH_SIZE = 5000
+
+VALUATION_COLUMNS = tuple(ValuationCreate.model_fields)
+
+_valuation_batch = TypeAdapter(list[ValuationCreate])
+
+
+def upsert_valuation_statement(dialect_name: str):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(Valuation.__table__)
+    return stmt.on_conflict_do_update(
+        index_elements=list(valuation_key_index.expressions),
+        # Writes that do not come from an import clear the hash, so re-importing
+        # the file afterwards restores the imported value.
+        set_={
+            "value_jpy": stmt.excluded.value_jpy,
+            "position_id": stmt.excluded.position_id,
+            "import_hash": stmt.excluded.import_hash,
+        },
+    )
+
+
+class CompiledValuationUpsert:
+    # Compiled once per load and fed straight to the DBAPI executemany, which
+    # skips SQLAlchemy's per-row parameter construction on large batches.
+    def __init__(self, connection: Connection, columns: Sequence[str] = VALUATION_COLUMNS) -> None:
+        dialect = connection.dialect
+        compiled = upsert_valuation_statement(dialect.name).compile(dialect=dialect, column_keys=list(columns))
+        self.sql = compiled.string
+        self.positional = compiled.positional
+        self.names = list(compiled.positiontup) if compiled.positional else list(columns)
+        table = Valuation.__table__
+        self.columns = [(name, table.c[name].type.bind_processor(dialect)) for name in self.names]
+
+    def parameters(self, values: Mapping) -> tuple | dict:
+        params = [
+            processor(values[name]) if processor else values[name]
+            for name, processor in self.columns
+        ]
+        return tuple(params) if self.positional else dict(zip(self.names, params))
+
+    def execute(self, connection: Connection, rows: list[Mapping]) -> None:
+        connection.exec_driver_sql(self.sql, [self.parameters(values) for values in rows])
+
+    def execute_columns(self, connection: Connection, columns: Mapping[str, Sequence]) -> None:
+        processed = []
+        for name, processor in self.columns:
+            column = columns.get(name)
+            if column is None:
+                column = [None] * len(columns["valuation_date"])
+            elif processor:
+                converted = {value: processor(value) for value in set(column)}
+                column = [converted[value] for value in column]
+            processed.append(column)
+        rows = zip(*processed)
+        connection.exec_driver_sql(
+            self.sql, list(rows) if self.positional else [dict(zip(self.names, row)) for row in rows]
+        )
+
+
+def upsert_valuation(session: Session, payload: ValuationCreate) -> Valuation:
+    deltas = SnapshotDeltas(session, [(payload.account_id, payload.instrument_id, payload.valuation_date)])
+    valuation = (
+        session.query(Valuation)
+        .filter(
+            Valuation.account_id == payload.account_id,
+            func.coalesce(Valuation.instrument_id, 0) == (payload.instrument_id or 0),
+            Valuation.valuation_date == payload.valuation_date,
+        )
+        .one_or_none()
+    )
+    if valuation is None:
+        valuation = Valuation(**payload.model_dump())
+        session.add(valuation)
+    else:
+        valuation.position_id = payload.position_id
+        valuation.value_jpy = payload.value_jpy
+        valuation.import_hash = None
+    session.flush()
+    deltas.apply()
+    return valuation
+
+
+class ValuationBulkLoader:
+    # Batches are written as they fill up and snapshots are brought up to date
+    # once, in result(). A load that fits in one batch applies per-holding
+    # deltas; a larger one recomputes snapshots from its earliest date in a
+    # single pass, which beats looking up what was in force for every key.
+    def __init__(self, session: Session, batch_size: int = BULK_BATCH_SIZE) -> None:
+        self.session = session
+        self.batch_size = batch_size
+        self.received = 0
+        self.upserted = 0
+        self.errors: list[dict] = []
+        self.dates: set[date] = set()
+        self._upsert = CompiledValuationUpsert(session.connection())
+        self._pending: list[tuple[int, dict]] = []
+        self._flushed = False
+
+    def load(self, rows: Iterable[Mapping | None]) -> None:
+        rows = list(rows)
+        try:
+            # One pydantic call per batch; only a batch with a bad row is
+            # validated again row by row to report where the errors are.
+            payloads = _valuation_batch.validate_python(rows)
+        except ValidationError:
+            payloads = None
+        if payloads is not None:
+            start = self.received
+            self.received += len(rows)
+            self._pending.extend(enumerate((payload.__dict__ for payload in payloads), start))
+            self.dates.update(payload.valuation_date for payload in payloads)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+            return
+        for raw in rows:
+            row_number = self.received
+            self.received += 1
+            if not isinstance(raw, Mapping):
+                self.errors.append({"row": row_number, "errors": ["row: expected an object"]})
+                continue
+            try:
+                payload = ValuationCreate.model_validate(raw)
+            except ValidationError as exc:
+                self.errors.append({"row": row_number, "errors": format_validation_errors(exc)})
+                continue
+            self._pending.append((row_number, payload.__dict__))
+            self.dates.add(payload.valuation_date)
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        # Writes the pending rows only; snapshots wait for result().
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self._flushed = True
+        columns = {name: [values[name] for _, values in pending] for name in VALUATION_COLUMNS}
+        try:
+            with self.session.begin_nested():
+                self._upsert.execute_columns(self.session.connection(), columns)
+            self.upserted += len(pending)
+        except IntegrityError:
+            self._write_rows_individually(pending)
+
+    def _write_rows_individually(self, pending: list[tuple[int, dict]]) -> None:
+        for row_number, values in pending:
+            try:
+                with self.session.begin_nested():
+                    self._upsert.execute(self.session.connection(), [values])
+                self.upserted += 1
+            except IntegrityError as exc:
+                self.errors.append({"row": row_number, "errors": [str(exc.orig)]})
+
+    def result(self) -> dict:
+        if self._flushed:
+            self.flush()
+            SnapshotWindows(self.session, min(self.dates)).refresh()
+        elif self._pending:
+            deltas = SnapshotDeltas(
+                self.session,
+                [(values["account_id"], values["instrument_id"], values["valuation_date"]) for _, values in self._pending],
+            )
+            self.flush()
+            deltas.apply()
+        return {
+            "received": self.received,
+            "upserted": self.upserted,
+            "errors": sorted(self.errors, key=lambda error: error["row"]),
+        }
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.cache import response_cache
+from app.db.session import create_engines, get_db
+from app.main import app
+from app.models.base import Base
+from app.services.jobs import job_runner
+from benchmarks.suite import build_cases, compare, dump, run_cases
+from benchmarks.synthetic import SCALES, generate
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run the endpoint and service benchmark suite")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--tolerance", type=float, default=1.5, help="allowed slowdown factor")
+    parser.add_argument("--update", action="store_true", help="record these results as the new baseline")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this text")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine, _ = create_engines(f"sqlite:///{Path(directory) / 'bench.db'}")
+        Base.metadata.create_all(bind=engine)
+        began = time.perf_counter()
+        with Session(engine) as session:
+            data = generate(session, SCALES[args.scale])
+            session.commit()
+        print(
+            f"generated {args.scale}: {data['valuations']} valuations, {data['prices']} prices, "
+            f"{data['transactions']} transactions in {time.perf_counter() - began:.1f}s"
+        )
+
+        factory = sessionmaker(bind=engine, autoflush=False)
+
+        def override_get_db():
+            with factory() as db:
+                yield db
+
+        # Every repeat must reach the services, not the response cache, and
+        # startup must not resume jobs from the configured database.
+        response_cache.maxsize = 0
+        os.environ["RESUME_JOBS"] = "false"
+        job_runner.data_dir = Path(directory) / "jobs"
+        app.dependency_overrides[get_db] = override_get_db
+        with TestClient(app) as client, factory() as session:
+            cases = [case for case in build_cases(client, session, data) if args.filter in case.name]
+            results = run_cases(cases, args.repeats)
+        app.dependency_overrides.clear()
+        engine.dispose()
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    reference = baselines.get(args.scale, {})
+    for name, result in results.items():
+        previous = reference.get(name, {}).get("median_ms")
+        delta = f"{result['median_ms'] / previous:6.2f}x" if previous else "   new"
+        print(f"{name:50s} {result['median_ms']:10.2f}ms  p95 {result['p95_ms']:10.2f}ms  {delta}")
+
+    if args.update:
+        baselines[args.scale] = {**reference, **results}
+        dump(baselines, args.baseline)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    regressions = compare(results, reference, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+from __future__ import annotations
+
+import json
+import statistics
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+from app.services import calculations, portfolio
+from app.services.contributions import project_contribution_plan
+from app.services.exports import EXPORT_SOURCES, export_batches
+from app.services.fx import convert_to_jpy, currency_codes
+from app.services.jobs import job_runner
+from app.services.ledger import get_holdings, sync_ledger
+from app.services.revaluation import revalue_positions
+from app.services.snapshots import refresh_snapshot_range
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    run: Callable[[], object]
+    endpoint: tuple[str, str] | None = None
+
+
+def _request(client: TestClient, method: str, path: str, **kwargs) -> Callable[[], object]:
+    def call():
+        response = client.request(method, path, **kwargs)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+        return response
+
+    return call
+
+
+def _in_session(session: Session, call: Callable[[Session], object]) -> Callable[[], object]:
+    # Service writes are rolled back so every repeat sees the generated data set.
+    def run():
+        try:
+            return call(session)
+        finally:
+            session.rollback()
+
+    return run
+
+
+def build_cases(client: TestClient, session: Session, data: dict) -> list[Case]:
+    end: date = data["end"]
+    month_ago = end - timedelta(days=30)
+    start: date = data["start"]
+    account, instrument = data["accounts"][0], data["instruments"][0]
+    series = {"start": start.isoformat(), "end": end.isoformat()}
+    rows = [
+        {"account_id": account, "instrument_id": item, "valuation_date": end.isoformat(), "value_jpy": 1000.0}
+        for item in data["instruments"][:1000]
+    ]
+
+    def endpoint(name: str, method: str, route: str, path: str | None = None, **kwargs) -> Case:
+        return Case(name, _request(client, method, f"/api{path or route}", **kwargs), (method, f"/api{route}"))
+
+    def service(name: str, call: Callable[[Session], object]) -> Case:
+        return Case(name, _in_session(session, call))
+
+    def job(name: str, route: str, path: str | None = None, **kwargs) -> Case:
+        # Timed from submission until the worker has finished the job.
+        submit = _request(client, "POST", f"/api{path or route}", **kwargs)
+
+        def run():
+            job_runner.wait(submit().json()["id"])
+
+        return Case(name, run, ("POST", f"/api{route}"))
+
+    fx_csv = "currency,rate_date,rate_jpy\n" + "".join(
+        f"USD,{(end - timedelta(days=n)).isoformat()},{150 + n % 7}\n" for n in range(365)
+    )
+    # Statement ids make every repeat after the first a duplicate-only pass.
+    import_csv = "source_id,ticker,transaction_date,transaction_type,quantity,amount\n" + "".join(
+        f"B{n},F{n % 100:05d},{(end - timedelta(days=n % 30)).isoformat()},buy,1,1000\n" for n in range(2000)
+    )
+    monte_carlo = {
+        "horizon_months": 360,
+        "annual_return": 0.05,
+        "monthly_contribution": 1e5,
+        "start_value": 1e6,
+        "paths": 2000,
+        "seed": 1,
+    }
+    finished_job = client.post("/api/jobs", json={"kind": "monte_carlo", "params": monte_carlo}).json()["id"]
+    job_runner.wait(finished_job)
+    fx_currencies, fx_codes = currency_codes(["USD", "JPY"] * 50_000)
+    fx_days = np.full(100_000, end.toordinal())
+    values = np.linspace(1e6, 5e6, 16)
+    weights = np.full(16, 1 / 16)
+    series_x = np.arange(100_000.0)
+    series_y = np.random.default_rng(0).random(100_000)
+    return [
+        endpoint("GET /health", "GET", "/health"),
+        endpoint("GET /metrics", "GET", "/metrics"),
+        endpoint("POST /accounts", "POST", "/accounts", json={"name": "Bench", "account_type": "bank"}),
+        endpoint("POST /instruments", "POST", "/instruments", json={"name": "Bench", "instrument_type": "fund"}),
+        endpoint("POST /valuations", "POST", "/valuations", json=rows[0]),
+        endpoint("POST /valuations/bulk", "POST", "/valuations/bulk", json=rows),
+        endpoint(
+            "POST /valuations/revalue",
+            "POST",
+            "/valuations/revalue",
+            json={"start": month_ago.isoformat(), "end": end.isoformat(), "account_id": account},
+        ),
+        endpoint(
+            "POST /fx-rates/bulk", "POST", "/fx-rates/bulk", content=fx_csv, headers={"content-type": "text/csv"}
+        ),
+        endpoint(
+            "POST /imports csv", "POST", "/imports", f"/imports?account_id={account}", content=import_csv
+        ),
+        job(
+            "POST /imports/jobs csv",
+            "/imports/jobs",
+            f"/imports/jobs?account_id={account}",
+            content=import_csv,
+        ),
+        job("POST /jobs monte_carlo", "/jobs", json={"kind": "monte_carlo", "params": monte_carlo}),
+        job("POST /jobs rebuild_snapshots", "/jobs", json={"kind": "rebuild_snapshots"}),
+        job(
+            "POST /jobs revalue",
+            "/jobs",
+            json={"kind": "revalue", "params": {"start": month_ago.isoformat(), "end": end.isoformat()}},
+        ),
+        endpoint("GET /jobs", "GET", "/jobs"),
+        endpoint("GET /jobs/{job_id}", "GET", "/jobs/{job_id}", f"/jobs/{finished_job}"),
+        endpoint("POST /jobs/{job_id}/cancel", "POST", "/jobs/{job_id}/cancel", f"/jobs/{finished_job}/cancel"),
+        endpoint(
+            "POST /classifications",
+            "POST",
+            "/classifications",
+            json={"instrument_id": instrument, "taxonomy_node_id": data["leaf_id"]},
+        ),
+        endpoint(
+            "POST /target-allocations",
+            "POST",
+            "/target-allocations",
+            json={"taxonomy_id": data["taxonomy_id"], "taxonomy_node_id": data["root_id"], "target_weight": 0.5},
+        ),
+        endpoint(
+            "POST /transactions",
+            "POST",
+            "/transactions",
+            json={
+                "account_id": account,
+                "instrument_id": instrument,
+                "transaction_date": end.isoformat(),
+                "transaction_type": "buy",
+                "quantity": 1,
+                "amount_jpy": 1000,
+            },
+        ),
+        endpoint("POST /ledger/sync", "POST", "/ledger/sync"),
+        endpoint("GET /holdings", "GET", "/holdings", params={"date": end.isoformat()}),
+        endpoint("GET /portfolio/allocation", "GET", "/portfolio/allocation", params={"date": end.isoformat()}),
+        endpoint(
+            "GET /portfolio/allocation rollup",
+            "GET",
+            "/portfolio/allocation",
+            params={"date": end.isoformat(), "rollup": "true"},
+        ),
+        endpoint("GET /portfolio/deviation", "GET", "/portfolio/deviation", params={"date": end.isoformat()}),
+        endpoint(
+            "GET /portfolio/allocation/matrix month",
+            "GET",
+            "/portfolio/allocation/matrix",
+            params={"start": start.isoformat(), "end": end.isoformat(), "frequency": "month"},
+        ),
+        endpoint(
+            "GET /portfolio/deviation/matrix month",
+            "GET",
+            "/portfolio/deviation/matrix",
+            params={"start": start.isoformat(), "end": end.isoformat(), "frequency": "month"},
+        ),
+        endpoint("GET /portfolio/timeseries month", "GET", "/portfolio/timeseries", params=series),
+        endpoint(
+            "GET /portfolio/timeseries day max_points",
+            "GET",
+            "/portfolio/timeseries",
+            params={**series, "group_by": "day", "max_points": 200},
+        ),
+        endpoint(
+            "GET /portfolio/timeseries week metrics breakdown",
+            "GET",
+            "/portfolio/timeseries",
+            params={**series, "group_by": "week", "metrics": "true", "breakdown": "account"},
+        ),
+        endpoint("GET /portfolio/cache", "GET", "/portfolio/cache"),
+        endpoint("GET /portfolio/column-store", "GET", "/portfolio/column-store"),
+        endpoint(
+            "POST /simulations/forecast",
+            "POST",
+            "/simulations/forecast",
+            json={
+                "horizon_months": 360,
+                "annual_return": 0.05,
+                "monthly_contribution": 100000,
+                "include_scenarios": True,
+            },
+        ),
+        endpoint(
+            "POST /simulations/forecast monte_carlo",
+            "POST",
+            "/simulations/forecast",
+            json={
+                "horizon_months": 360,
+                "annual_return": 0.05,
+                "monthly_contribution": 100000,
+                "mode": "monte_carlo",
+                "paths": 2000,
+                "seed": 1,
+            },
+        ),
+        endpoint(
+            "POST /simulations/forecast/grid",
+            "POST",
+            "/simulations/forecast/grid",
+            json={
+                "horizon_months": 360,
+                "annual_returns": [0.01 * step for step in range(10)],
+                "monthly_contributions": [10000.0 * step for step in range(10)],
+                "start_values": [0.0, 1e6, 1e7],
+                "include_values": False,
+            },
+        ),
+        endpoint(
+            "POST /simulations/contribution-plan",
+            "POST",
+            "/simulations/contribution-plan",
+            json={"plan_id": data["plan_id"], "date": end.isoformat(), "horizon_months": 120},
+        ),
+        endpoint("GET /exports/valuations csv", "GET", "/exports/{kind}", "/exports/valuations"),
+        endpoint(
+            "GET /exports/prices ndjson",
+            "GET",
+            "/exports/{kind}",
+            "/exports/prices",
+            params={"format": "ndjson", "instrument_id": instrument},
+        ),
+        service("get_allocation", lambda db: portfolio.get_allocation(db, end, "asset_class", rollup=True)),
+        service("get_deviation", lambda db: portfolio.get_deviation(db, end, "asset_class")),
+        service("get_timeseries", lambda db: portfolio.get_timeseries(db, start, end, "month", metrics=True)),
+        service("refresh_snapshot_range", lambda db: refresh_snapshot_range(db, month_ago, end)),
+        service("revalue_positions", lambda db: revalue_positions(db, month_ago, end)),
+        service(
+            "convert_to_jpy",
+            lambda db: convert_to_jpy(db, fx_currencies, fx_codes, fx_days, np.ones(100_000)),
+        ),
+        service("sync_ledger", sync_ledger),
+        service("get_holdings", lambda db: get_holdings(db, end)),
+        service(
+            "project_contribution_plan",
+            lambda db: project_contribution_plan(db, data["plan_id"], end, "asset_class", 120),
+        ),
+        service(
+            "export_batches",
+            lambda db: sum(len(batch) for batch in export_batches(db, EXPORT_SOURCES["valuations"])),
+        ),
+        Case(
+            "forecast_batch",
+            lambda: calculations.forecast_batch(np.zeros(100), np.full(100, 0.05), np.full(100, 1e5), 360),
+        ),
+        Case("simulate_forecast", lambda: calculations.simulate_forecast(1e6, 0.05, 0.15, 1e5, 360, 2000, seed=1)),
+        Case(
+            "project_contributions",
+            lambda: calculations.project_contributions(values, weights, 1e5, np.zeros(16), weights, 120),
+        ),
+        Case("lttb_indices", lambda: calculations.lttb_indices(series_x, series_y, 500)),
+    ]
+
+
+def run_cases(cases: list[Case], repeats: int) -> dict[str, dict]:
+    results = {}
+    for case in cases:
+        case.run()  # warm-up: imports, statement caches, SQLite page cache
+        timings = []
+        for _ in range(repeats):
+            began = time.perf_counter()
+            case.run()
+            timings.append((time.perf_counter() - began) * 1000)
+        timings.sort()
+        results[case.name] = {
+            "median_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        }
+    return results
+
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference and result["median_ms"] > reference["median_ms"] * tolerance:
+            regressions.append(
+                f"{name}: {result['median_ms']:.2f}ms vs baseline {reference['median_ms']:.2f}ms"
+            )
+    return regressions
+
+
+def dump(results: dict, path) -> None:
+    with open(path, "w") as handle:
+        json.dump(results, handle, indent=2, sort_keys=True)
+        handle.write("\n")
@@ -0,0 +1,185 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from app.models.accounts import Account
+from app.models.contributions import ContributionAllocationRule, ContributionPlan
+from app.models.instruments import Instrument
+from app.models.portfolio import Price, Transaction
+from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode
+from app.services.ledger import sync_ledger
+from app.services.snapshots import rebuild_snapshots
+from app.services.valuations import CompiledValuationUpsert
+
+INSERT_CHUNK = 50_000
+END_DATE = date(2024, 12, 31)
+
+
+@dataclass(frozen=True)
+class Scale:
+    accounts: int
+    instruments: int
+    holdings_per_account: int
+    taxonomy_depth: int
+    taxonomy_fanout: int
+    days: int
+
+
+SCALES = {
+    "tiny": Scale(
+        accounts=2, instruments=12, holdings_per_account=5, taxonomy_depth=2, taxonomy_fanout=2, days=90
+    ),
+    "small": Scale(
+        accounts=5, instruments=200, holdings_per_account=20, taxonomy_depth=3, taxonomy_fanout=3, days=730
+    ),
+    "production": Scale(
+        accounts=20, instruments=2000, holdings_per_account=100, taxonomy_depth=4, taxonomy_fanout=4, days=3650
+    ),
+}
+
+
+def _insert_chunks(session: Session, table, rows: list[dict]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK):
+        session.execute(insert(table), rows[start : start + INSERT_CHUNK])
+
+
+def _taxonomy(session: Session, scale: Scale) -> tuple[Taxonomy, list[TaxonomyNode], list[TaxonomyNode]]:
+    taxonomy = Taxonomy(name="asset_class")
+    session.add(taxonomy)
+    level = [None]
+    roots: list[TaxonomyNode] = []
+    for depth in range(scale.taxonomy_depth):
+        next_level = []
+        for parent in level:
+            for branch in range(scale.taxonomy_fanout):
+                name = f"{parent.name}/{branch}" if parent is not None else f"Class {branch}"
+                node = TaxonomyNode(name=name, taxonomy=taxonomy, parent_id=parent.id if parent else None)
+                session.add(node)
+                next_level.append(node)
+        session.flush()
+        if depth == 0:
+            roots = next_level
+        level = next_level
+    return taxonomy, roots, level
+
+
+def generate(session: Session, scale: Scale, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    days = np.array([END_DATE - timedelta(days=offset) for offset in range(scale.days - 1, -1, -1)])
+    weekdays = days[[day.weekday() < 5 for day in days]]
+
+    accounts = [Account(name=f"Account {index}", account_type="brokerage") for index in range(scale.accounts)]
+    instruments = [
+        Instrument(name=f"Fund {index}", ticker=f"F{index:05d}", instrument_type="fund")
+        for index in range(scale.instruments)
+    ]
+    session.add_all(accounts + instruments)
+    session.flush()
+    taxonomy, roots, leaves = _taxonomy(session, scale)
+
+    leaf_ids = np.array([leaf.id for leaf in leaves])
+    _insert_chunks(
+        session,
+        InstrumentClassification,
+        [
+            {"instrument_id": instrument.id, "taxonomy_node_id": int(node_id)}
+            for instrument, node_id in zip(instruments, rng.choice(leaf_ids, len(instruments)))
+        ],
+    )
+    session.add_all(
+        TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=root.id, target_weight=1 / len(roots))
+        for root in roots
+    )
+    plan = ContributionPlan(name="Monthly", start_date=weekdays[0], monthly_amount=100_000)
+    plan.allocation_rules = [ContributionAllocationRule(taxonomy_node_id=root.id, weight=1.0) for root in roots]
+    session.add(plan)
+
+    # Geometric random walk per instrument over business days.
+    returns = rng.normal(0.0003, 0.01, (len(instruments), len(weekdays)))
+    prices = 1000 * np.exp(np.cumsum(returns, axis=1))
+    _insert_chunks(
+        session,
+        Price,
+        [
+            {"instrument_id": instrument.id, "price_date": day, "price": float(price)}
+            for instrument, row in zip(instruments, prices)
+            for day, price in zip(weekdays, row)
+        ],
+    )
+
+    month_starts = np.flatnonzero(
+        np.concatenate(([True], [a.month != b.month for a, b in zip(weekdays[1:], weekdays[:-1])]))
+    )
+    transactions = []
+    valuation_columns: dict[str, list] = {
+        "account_id": [],
+        "instrument_id": [],
+        "valuation_date": [],
+        "value_jpy": [],
+    }
+    holdings_per_account = min(scale.holdings_per_account, len(instruments))
+    for account in accounts:
+        held = rng.choice(len(instruments), holdings_per_account, replace=False)
+        for index in held:
+            instrument = instruments[index]
+            units = rng.uniform(1, 10, len(month_starts))
+            quantity = np.zeros(len(weekdays))
+            quantity[month_starts] = units
+            quantity = np.cumsum(quantity)
+            for position, amount in zip(month_starts, units):
+                price = prices[index, position]
+                transactions.append(
+                    {
+                        "account_id": account.id,
+                        "instrument_id": instrument.id,
+                        "transaction_date": weekdays[position],
+                        "transaction_type": "buy",
+                        "quantity": float(amount),
+                        "amount_jpy": float(amount * price),
+                    }
+                )
+            valuation_columns["account_id"] += [account.id] * len(weekdays)
+            valuation_columns["instrument_id"] += [instrument.id] * len(weekdays)
+            valuation_columns["valuation_date"] += list(weekdays)
+            valuation_columns["value_jpy"] += (quantity * prices[index]).tolist()
+        transactions += [
+            {
+                "account_id": account.id,
+                "instrument_id": None,
+                "transaction_date": weekdays[position],
+                "transaction_type": "deposit",
+                "quantity": None,
+                "amount_jpy": 100_000.0,
+            }
+            for position in month_starts
+        ]
+    _insert_chunks(session, Transaction, transactions)
+
+    upsert = CompiledValuationUpsert(session.connection())
+    total = len(valuation_columns["value_jpy"])
+    for start in range(0, total, INSERT_CHUNK):
+        upsert.execute_columns(
+            session.connection(),
+            {name: column[start : start + INSERT_CHUNK] for name, column in valuation_columns.items()},
+        )
+    rebuild_snapshots(session)
+    sync_ledger(session)
+    session.flush()
+    return {
+        "accounts": [account.id for account in accounts],
+        "instruments": [instrument.id for instrument in instruments],
+        "taxonomy_id": taxonomy.id,
+        "root_id": roots[0].id,
+        "leaf_id": leaves[-1].id,
+        "plan_id": plan.id,
+        "start": weekdays[0],
+        "end": weekdays[-1],
+        "valuations": total,
+        "prices": int(prices.size),
+        "transactions": len(transactions),
+    }
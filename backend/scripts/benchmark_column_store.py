@@ -0,0 +1,75 @@
+import argparse
+import json
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.services.calculations import period_ends, period_keys
+from app.services.columnar import valuation_store
+from app.services.portfolio import get_timeseries
+
+
+def best_of(repeats: int, call) -> float:
+    timings = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - began)
+    return min(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Timeseries latency over a synthetic valuation store")
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    first = date(2015, 1, 1)
+    ordinals = (first.toordinal() + rng.integers(0, args.days, args.rows)).astype(np.int32)
+    store = valuation_store
+    began = time.perf_counter()
+    store.replace(
+        ordinals,
+        rng.integers(1, 20, args.rows).astype(np.int32),
+        rng.integers(1, 5000, args.rows).astype(np.int32),
+        rng.uniform(1e4, 1e7, args.rows),
+    )
+    print(f"build {time.perf_counter() - began:.2f}s, {store.stats()['bytes'] / 2**20:.0f} MiB")
+
+    last = first + timedelta(days=args.days - 1)
+    # With the store loaded, plain series never reach the database.
+    with Session(create_engine("sqlite://")) as session:
+        for group_by in ("year", "quarter", "month", "week", "day"):
+            elapsed = best_of(args.repeats, lambda: get_timeseries(session, first, last, group_by))
+            print(f"timeseries {group_by:7s} {elapsed * 1000:.3f}ms")
+        for max_points in (None, 500):
+            elapsed = best_of(args.repeats, lambda: get_timeseries(session, first, last, "day", max_points=max_points))
+            points = get_timeseries(session, first, last, "day", max_points=max_points)
+            payload = len(json.dumps(points))
+            print(f"timeseries day max_points={max_points} {elapsed * 1000:.3f}ms, {payload / 1024:.0f} KiB")
+
+
+    # Breakdowns and allocations group the same rows by holding or taxonomy node
+    # at each period's closing date; 5000 instruments in 50 leaf nodes under 5 roots.
+    instruments = np.arange(1, 5000)
+    pairs = (instruments, 6 + instruments % 50)
+    leaves = np.arange(6, 56)
+    paths = (np.repeat(leaves, 2), np.column_stack((leaves, 1 + leaves % 5)).ravel())
+    for group_by in ("month", "day"):
+        ordinals, _ = store.daily_totals(first, last)
+        ends = period_ends(period_keys(ordinals, group_by))
+        closing = ordinals[ends]
+        for name, call in (
+            ("account", lambda: store.holding_totals(closing, "account")),
+            ("instrument", lambda: store.holding_totals(closing, "instrument")),
+            ("node", lambda: store.node_totals(closing, pairs)),
+            ("node rollup", lambda: store.node_totals(closing, pairs, paths)),
+        ):
+            elapsed = best_of(args.repeats, call)
+            print(f"group by {name:11s} per {group_by:5s} {elapsed * 1000:.3f}ms")
@@ -0,0 +1,123 @@
+import argparse
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import get_sqlite_pragmas
+from app.db.session import create_engines
+from app.models.accounts import Account
+from app.models.base import Base
+from app.models.instruments import Instrument
+from app.models.taxonomies import InstrumentClassification, Taxonomy, TaxonomyNode
+from app.services.portfolio import get_allocation
+from app.services.valuations import ValuationBulkLoader
+
+PROFILES = {
+    "default": {"journal_mode": "DELETE"},
+    "tuned": get_sqlite_pragmas(),
+}
+
+
+def seed(session, instruments: int) -> list[int]:
+    account = Account(name="Bench", account_type="brokerage", institution="Bench")
+    taxonomy = Taxonomy(name="asset_class")
+    nodes = [TaxonomyNode(name=name, taxonomy=taxonomy) for name in ("Equity", "Bond", "Cash")]
+    session.add_all([account, taxonomy, *nodes])
+    session.flush()
+    for index in range(instruments):
+        instrument = Instrument(name=f"Fund {index}", ticker=f"F{index}", instrument_type="fund")
+        session.add(instrument)
+        session.flush()
+        session.add(
+            InstrumentClassification(instrument_id=instrument.id, taxonomy_node_id=nodes[index % 3].id)
+        )
+    session.commit()
+    return [account.id]
+
+
+def run(profile: str, seconds: float, readers: int, batch: int, instruments: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{Path(directory) / 'bench.db'}"
+        engine, read_engine = create_engines(url, PROFILES[profile])
+        Base.metadata.create_all(bind=engine)
+        write_factory = sessionmaker(bind=engine, autoflush=False)
+        read_factory = sessionmaker(bind=read_engine, autoflush=False)
+        with write_factory() as session:
+            account_id = seed(session, instruments)[0]
+
+        start = date(2024, 1, 1)
+        stop = threading.Event()
+        latencies: list[float] = []
+        written = 0
+
+        def writer() -> None:
+            nonlocal written
+            day = 0
+            while not stop.is_set():
+                valuation_date = start + timedelta(days=day % 365)
+                rows = [
+                    {
+                        "account_id": account_id,
+                        "instrument_id": 1 + (i % instruments),
+                        "valuation_date": valuation_date - timedelta(days=i // instruments),
+                        "value_jpy": 1000.0 + i,
+                    }
+                    for i in range(batch)
+                ]
+                with write_factory() as session:
+                    loader = ValuationBulkLoader(session)
+                    loader.load(rows)
+                    loader.result()
+                    session.commit()
+                written += batch
+                day += 1
+
+        def reader() -> None:
+            samples = []
+            day = 0
+            while not stop.is_set():
+                began = time.perf_counter()
+                with read_factory() as session:
+                    get_allocation(session, start + timedelta(days=day % 365), "asset_class")
+                samples.append(time.perf_counter() - began)
+                day += 1
+            latencies.extend(samples)
+
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        read_engine.dispose()
+
+    latencies.sort()
+    return {
+        "reads": len(latencies),
+        "rows_written": written,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read latency under a concurrent bulk writer")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=5000)
+    parser.add_argument("--instruments", type=int, default=50)
+    args = parser.parse_args()
+    for name in PROFILES:
+        result = run(name, args.seconds, args.readers, args.batch, args.instruments)
+        print(
+            f"{name:8s} reads={result['reads']:6d} rows_written={result['rows_written']:8d} "
+            f"p50={result['p50_ms']:.2f}ms p99={result['p99_ms']:.2f}ms max={result['max_ms']:.2f}ms"
+        )
@@ -0,0 +1,66 @@
+import argparse
+import json
+import time
+
+from pydantic import TypeAdapter
+
+from app.api.caching import encode_json
+from app.schemas.portfolio import AllocationItem, TimeseriesPoint
+
+
+def timeseries_payload(count: int) -> list[dict]:
+    return [
+        {
+            "period": f"{2000 + index // 365}-{index % 12 + 1:02d}-{index % 28 + 1:02d}",
+            "total_value_jpy": 1_000_000.0 + index * 137.5,
+            "net_flow_jpy": 0.0,
+            "period_return": None if index == 0 else 0.0012 * (index % 7 - 3),
+            "cumulative_return": index * 0.0004,
+            "drawdown": -0.01 * (index % 5),
+            "volatility": None if index < 12 else 0.18,
+        }
+        for index in range(count)
+    ]
+
+
+def allocation_payload(count: int) -> list[dict]:
+    return [
+        {
+            "taxonomy_node_id": index + 1,
+            "taxonomy_node_name": f"Node {index}",
+            "parent_id": None if index < 10 else index % 10 + 1,
+            "value_jpy": 10_000.0 * (index + 1),
+            "weight": 1 / count,
+        }
+        for index in range(count)
+    ]
+
+
+def per_item(repeats: int, count: int, call) -> float:
+    timings = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - began)
+    return min(timings) / count * 1e9
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-item JSON encoding cost for portfolio payloads")
+    parser.add_argument("--items", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    cases = [
+        ("timeseries", timeseries_payload(args.items), TypeAdapter(list[TimeseriesPoint]), True),
+        ("allocation", allocation_payload(args.items), TypeAdapter(list[AllocationItem]), False),
+    ]
+    for name, payload, adapter, exclude_none in cases:
+        encoders = {
+            "pydantic validate+dump": lambda: encode_json(payload, adapter, exclude_none, fast=False),
+            "stdlib json": lambda: json.dumps(payload).encode(),
+            "fast path (orjson)": lambda: encode_json(payload, adapter, exclude_none, fast=True),
+        }
+        for label, encode in encoders.items():
+            cost = per_item(args.repeats, args.items, encode)
+            print(f"{name:10s} {label:24s} {cost:8.0f} ns/item  {len(encode()) / 1024:6.0f} KiB")
@@ -0,0 +1,32 @@
+import argparse
+import dataclasses
+import time
+
+from app.db.session import SessionLocal, engine
+from app.models.base import Base
+from benchmarks.synthetic import SCALES, generate
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fill the configured database with synthetic portfolio data")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for field in dataclasses.fields(SCALES["small"]):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=int, help=f"override {field.name}")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    overrides = {
+        field.name: getattr(args, field.name)
+        for field in dataclasses.fields(SCALES[args.scale])
+        if getattr(args, field.name) is not None
+    }
+    scale = dataclasses.replace(SCALES[args.scale], **overrides)
+    Base.metadata.create_all(bind=engine)
+    began = time.perf_counter()
+    with SessionLocal() as session:
+        summary = generate(session, scale, seed=args.seed)
+        session.commit()
+    print(
+        f"{scale}: {summary['valuations']} valuations, {summary['prices']} prices, "
+        f"{summary['transactions']} transactions in {time.perf_counter() - began:.1f}s"
+    )
@@ -0,0 +1,27 @@
+import argparse
+import json
+
+from app.db.session import SessionLocal
+from app.services.imports import IMPORT_KINDS, import_statement
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import broker statements in CSV or OFX format")
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--format", choices=["csv", "ofx"], default="csv")
+    parser.add_argument("--kind", choices=list(IMPORT_KINDS), default="transactions")
+    parser.add_argument("--account-id", type=int)
+    parser.add_argument("--mapping", type=json.loads, help='CSV column mapping, e.g. {"amount": "Net Amount"}')
+    parser.add_argument("--workers", type=int, help="validation processes (defaults to IMPORT_WORKERS)")
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        for path in args.paths:
+            with open(path, "rb") as handle:
+                result = import_statement(
+                    session, handle, args.format, args.kind, args.account_id, args.mapping, args.workers
+                ).result()
+            inserted = ", ".join(f"{count} {kind}" for kind, count in result["inserted"].items())
+            print(f"{path}: {result['received']} rows, inserted {inserted}, {result['duplicates']} duplicates")
+            for error in result["errors"]:
+                print(f"  row {error['row']}: {'; '.join(error['errors'])}")
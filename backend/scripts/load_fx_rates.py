@@ -0,0 +1,22 @@
+import argparse
+import csv
+
+from app.db.session import SessionLocal
+from app.services.fx import FxRateLoader
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Upsert FX rates from CSV files with currency,rate_date,rate_jpy columns")
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        loader = FxRateLoader(session)
+        for path in args.paths:
+            with open(path, newline="", encoding="utf-8") as handle:
+                loader.load(csv.DictReader(handle))
+        result = loader.result()
+        session.commit()
+    print(f"Upserted {result['upserted']} of {result['received']} FX rates")
+    for error in result["errors"]:
+        print(f"row {error['row']}: {'; '.join(error['errors'])}")
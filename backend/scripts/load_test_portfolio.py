@@ -0,0 +1,134 @@
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.api.routes import portfolio, portfolio_async
+from app.core.cache import response_cache
+from app.db.async_session import create_async_engines, get_async_db
+from app.db.session import create_engines, get_db
+from app.models.accounts import Account
+from app.models.base import Base
+from app.models.instruments import Instrument
+from app.models.taxonomies import InstrumentClassification, Taxonomy, TaxonomyNode
+from app.services.snapshots import rebuild_snapshots
+from app.services.valuations import ValuationBulkLoader
+
+START = date(2024, 1, 1)
+
+
+def seed(url: str, instruments: int, days: int) -> None:
+    engine, read_engine = create_engines(url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        account = Account(name="Load", account_type="brokerage")
+        taxonomy = Taxonomy(name="asset_class")
+        nodes = [TaxonomyNode(name=f"Node {index}", taxonomy=taxonomy) for index in range(5)]
+        session.add_all([account, taxonomy, *nodes])
+        session.flush()
+        funds = [Instrument(name=f"Fund {index}", instrument_type="fund") for index in range(instruments)]
+        session.add_all(funds)
+        session.flush()
+        session.add_all(
+            InstrumentClassification(instrument_id=fund.id, taxonomy_node_id=nodes[index % 5].id)
+            for index, fund in enumerate(funds)
+        )
+        loader = ValuationBulkLoader(session)
+        loader.load(
+            {
+                "account_id": account.id,
+                "instrument_id": fund.id,
+                "valuation_date": START + timedelta(days=day),
+                "value_jpy": 1000.0 + day,
+            }
+            for day in range(days)
+            for fund in funds
+        )
+        loader.flush()
+        rebuild_snapshots(session)
+        session.commit()
+    read_engine.dispose()
+    engine.dispose()
+
+
+def build_app(mode: str, url: str) -> tuple[FastAPI, object]:
+    app = FastAPI()
+    if mode == "async":
+        _, read_engine = create_async_engines(url.replace("sqlite:", "sqlite+aiosqlite:"))
+        factory = async_sessionmaker(bind=read_engine, expire_on_commit=False)
+
+        async def override():
+            async with factory() as db:
+                yield db
+
+        app.include_router(portfolio_async.router, prefix="/api")
+        app.dependency_overrides[get_async_db] = override
+    else:
+        _, read_engine = create_engines(url)
+        factory = sessionmaker(bind=read_engine)
+
+        def override():
+            with factory() as db:
+                yield db
+
+        app.include_router(portfolio.router, prefix="/api")
+        app.dependency_overrides[get_db] = override
+    return app, read_engine
+
+
+async def load(app: FastAPI, requests: int, concurrency: int, days: int) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load") as client:
+
+        async def one(index: int) -> None:
+            as_of = START + timedelta(days=index % days)
+            async with semaphore:
+                began = time.perf_counter()
+                response = await client.get("/api/portfolio/allocation", params={"date": as_of.isoformat()})
+                latencies.append(time.perf_counter() - began)
+                response.raise_for_status()
+
+        began = time.perf_counter()
+        await asyncio.gather(*(one(index) for index in range(requests)))
+        elapsed = time.perf_counter() - began
+    return elapsed, sorted(latencies)
+
+
+async def dispose(engine) -> None:
+    result = engine.dispose()
+    if asyncio.iscoroutine(result):
+        await result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sync and async portfolio request paths")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--instruments", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    # Every request must reach the database for the comparison to mean anything.
+    response_cache.maxsize = 0
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{Path(directory) / 'load.db'}"
+        seed(url, args.instruments, args.days)
+        for mode in ("sync", "async"):
+            app, engine = build_app(mode, url)
+            elapsed, latencies = asyncio.run(load(app, args.requests, args.concurrency, args.days))
+            asyncio.run(dispose(engine))
+            print(
+                f"{mode:5s} {args.requests / elapsed:8.1f} req/s "
+                f"p50={statistics.median(latencies) * 1000:.2f}ms "
+                f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:.2f}ms"
+            )
@@ -0,0 +1,9 @@
+from app.db.session import SessionLocal
+from app.services.snapshots import rebuild_snapshots
+
+
+if __name__ == "__main__":
+    with SessionLocal() as session:
+        dates = rebuild_snapshots(session)
+        session.commit()
+    print(f"Rebuilt portfolio snapshots for {dates} dates")
@@ -9,6 +9,7 @@ from app.models.contributions import ContributionPlan
 from app.models.instruments import Instrument
 from app.models.portfolio import Valuation
 from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode
+from app.services.snapshots import rebuild_snapshots
 
 
 def seed(session: Session) -> None:
@@ -52,4 +53,6 @@ if __name__ == "__main__":
     Base.metadata.create_all(bind=engine)
     with SessionLocal() as session:
         seed(session)
+        session.flush()
+        rebuild_snapshots(session)
         session.commit()
@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import models  # noqa: F401
+from app.core.cache import response_cache
+from app.db.guards import install_strict_loading
+from app.db.session import get_db
+from app.main import app
+from app.services.fx import fx_rates
+from app.services.jobs import job_runner
+from app.models.base import Base
+
+# Every test runs with implicit lazy loads disabled so N+1 access patterns fail fast.
+install_strict_loading()
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    fx_rates.clear()
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+@pytest.fixture
+def session(session_factory):
+    with session_factory() as session:
+        yield session
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch, tmp_path):
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    response_cache.clear()
+    # Startup must not pick up jobs from the configured database.
+    monkeypatch.setenv("RESUME_JOBS", "false")
+    monkeypatch.setattr(job_runner, "data_dir", tmp_path / "jobs")
+    with TestClient(app) as client:
+        yield client
+    app.dependency_overrides.clear()
+    response_cache.clear()
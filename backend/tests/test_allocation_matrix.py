@@ -0,0 +1,106 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode
+from app.services.portfolio import get_allocation, get_deviation, get_deviation_matrix
+from app.services.taxonomies import rebuild_taxonomy_paths
+
+DATES = ["2024-01-15", "2024-01-31", "2024-02-29", "2024-03-29"]
+
+
+@pytest.fixture
+def ids(client, session) -> dict:
+    account = Account(name="Main", account_type="brokerage")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    bond = Instrument(name="Bond", instrument_type="fund")
+    taxonomy = Taxonomy(name="asset_class")
+    risk = TaxonomyNode(name="Risk", taxonomy=taxonomy)
+    session.add_all([account, fund, bond, taxonomy, risk])
+    session.flush()
+    equity = TaxonomyNode(name="Equity", taxonomy=taxonomy, parent_id=risk.id)
+    fixed = TaxonomyNode(name="Fixed income", taxonomy=taxonomy)
+    session.add_all([equity, fixed])
+    session.flush()
+    session.add(InstrumentClassification(instrument_id=fund.id, taxonomy_node_id=equity.id))
+    session.add(InstrumentClassification(instrument_id=bond.id, taxonomy_node_id=fixed.id))
+    session.add(TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=equity.id, target_weight=0.7))
+    session.add(TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=fixed.id, target_weight=0.3))
+    rebuild_taxonomy_paths(session)
+    session.commit()
+    rows = [
+        (fund.id, DATES[0], 50),
+        (fund.id, DATES[1], 100),
+        (bond.id, DATES[1], 100),
+        (fund.id, DATES[2], 140),
+        (bond.id, DATES[2], 60),
+        (fund.id, DATES[3], 80),
+    ]
+    client.post(
+        "/api/valuations/bulk",
+        json=[
+            {"account_id": account.id, "instrument_id": instrument, "valuation_date": day, "value_jpy": value}
+            for instrument, day, value in rows
+        ],
+    )
+    return {"risk": risk.id, "equity": equity.id, "fixed": fixed.id}
+
+
+def test_range_resolves_to_period_closing_dates(client, ids) -> None:
+    matrix = client.get(
+        "/api/portfolio/allocation/matrix", params={"start": "2024-01-01", "end": "2024-12-31"}
+    ).json()
+    assert matrix["dates"] == ["2024-01-31", "2024-02-29", "2024-03-29"]
+    assert [node["taxonomy_node_name"] for node in matrix["nodes"]] == ["Equity", "Fixed income"]
+    assert matrix["total_value_jpy"] == [200.0, 200.0, 140.0]
+    assert matrix["value_jpy"] == [[100.0, 100.0], [140.0, 60.0], [80.0, 60.0]]
+    assert matrix["weight"][:2] == [[0.5, 0.5], [0.7, 0.3]]
+
+
+@pytest.mark.parametrize("rollup", [False, True])
+def test_matrix_matches_single_date_deviation(client, session, ids, rollup) -> None:
+    dates = [date.fromisoformat(day) for day in DATES]
+    matrix = get_deviation_matrix(session, "asset_class", dates, rollup=rollup)
+    for row, day in enumerate(dates):
+        single = {item["taxonomy_node_id"]: item for item in get_deviation(session, day, "asset_class", rollup)}
+        for column, node in enumerate(matrix["nodes"]):
+            expected = single.get(node["taxonomy_node_id"])
+            if expected is None:
+                assert matrix["actual_weight"][row][column] == 0.0
+                continue
+            assert matrix["actual_weight"][row][column] == pytest.approx(expected["actual_weight"])
+            assert matrix["diff_value_jpy"][row][column] == pytest.approx(expected["diff_value_jpy"])
+        allocation = get_allocation(session, day, "asset_class", rollup)
+        assert {item["taxonomy_node_id"] for item in allocation} <= {
+            node["taxonomy_node_id"] for node in matrix["nodes"]
+        }
+
+
+def test_matrix_query_count_does_not_grow_with_dates(client, session, ids) -> None:
+    statements = []
+    engine = session.get_bind()
+
+    def count(*args) -> None:
+        statements.append(args[2])
+
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        get_deviation_matrix(session, "asset_class", [date.fromisoformat(day) for day in DATES])
+        few = len(statements)
+        statements.clear()
+        get_deviation_matrix(session, "asset_class", start=date(2000, 1, 1), end=date(2030, 1, 1), frequency="day")
+        many = len(statements)
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    assert few == 4
+    assert many == few
+
+
+def test_matrix_requires_dates_or_range(client, ids) -> None:
+    assert client.get("/api/portfolio/deviation/matrix").status_code == 422
+    response = client.get("/api/portfolio/deviation/matrix", params={"dates": DATES[1:3]})
+    assert response.status_code == 200
+    assert response.json()["target_weight"] == [0.7, 0.3]
@@ -0,0 +1,82 @@
+from datetime import date
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.snapshots import PortfolioSnapshotTotal
+from app.models.taxonomies import InstrumentClassification, Taxonomy, TaxonomyNode
+from app.services.portfolio import get_allocation, get_allocation_matrix, get_timeseries
+from app.services.snapshots import rebuild_snapshots
+
+
+@pytest.fixture
+def ids(client, session) -> dict:
+    # Two accounts revalued on different days: the classic sawtooth setup.
+    main = Account(name="Main", account_type="brokerage")
+    bank = Account(name="Bank", account_type="bank")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    equity = TaxonomyNode(name="Equity", taxonomy=Taxonomy(name="asset_class"))
+    session.add_all([main, bank, fund, equity])
+    session.flush()
+    session.add(InstrumentClassification(instrument_id=fund.id, taxonomy_node_id=equity.id))
+    session.commit()
+    rows = [
+        (main.id, fund.id, "2024-01-10", 100),
+        (bank.id, None, "2024-01-15", 50),
+        (main.id, fund.id, "2024-01-20", 120),
+        (bank.id, None, "2024-01-25", 40),
+    ]
+    client.post(
+        "/api/valuations/bulk",
+        json=[
+            {"account_id": account, "instrument_id": instrument, "valuation_date": day, "value_jpy": value}
+            for account, instrument, day, value in rows
+        ],
+    )
+    return {"main": main.id, "bank": bank.id, "fund": fund.id, "equity": equity.id}
+
+
+def test_daily_series_carries_each_holding_forward(session, ids) -> None:
+    assert get_timeseries(session, date(2024, 1, 1), date(2024, 1, 31), "day") == [
+        {"period": "2024-01-10", "total_value_jpy": 100.0},
+        {"period": "2024-01-15", "total_value_jpy": 150.0},
+        {"period": "2024-01-20", "total_value_jpy": 170.0},
+        {"period": "2024-01-25", "total_value_jpy": 160.0},
+    ]
+
+
+def test_allocation_uses_latest_valuation_on_or_before_date(session, ids) -> None:
+    assert get_allocation(session, date(2024, 1, 12), "asset_class")[0]["value_jpy"] == 100
+    assert get_allocation(session, date(2024, 1, 31), "asset_class")[0]["value_jpy"] == 120
+    assert get_allocation(session, date(2024, 1, 1), "asset_class") == []
+
+
+def test_matrix_dates_resolve_as_of(session, ids) -> None:
+    matrix = get_allocation_matrix(
+        session, "asset_class", [date(2024, 1, 1), date(2024, 1, 12), date(2024, 1, 31)]
+    )
+    assert matrix["total_value_jpy"] == [0.0, 100.0, 120.0]
+    assert matrix["weight"] == [[0.0], [1.0], [1.0]]
+
+
+def test_account_breakdown_carries_forward(client, ids) -> None:
+    points = client.get(
+        "/api/portfolio/timeseries",
+        params={"start": "2024-01-16", "end": "2024-01-31", "group_by": "day", "breakdown": "account"},
+    ).json()
+    assert [[item["value_jpy"] for item in point["breakdown"]] for point in points] == [[120.0, 50.0], [120.0, 40.0]]
+
+
+def test_backdated_write_refreshes_later_snapshots(client, session, ids) -> None:
+    client.post(
+        "/api/valuations",
+        json={"account_id": ids["main"], "instrument_id": ids["fund"], "valuation_date": "2024-01-12", "value_jpy": 90},
+    )
+    totals = session.query(PortfolioSnapshotTotal.snapshot_date, PortfolioSnapshotTotal.total_value_jpy).order_by(
+        PortfolioSnapshotTotal.snapshot_date
+    )
+    incremental = totals.all()
+    assert [row.total_value_jpy for row in incremental] == [100.0, 90.0, 140.0, 170.0, 160.0]
+    rebuild_snapshots(session)
+    assert totals.all() == incremental
@@ -0,0 +1,98 @@
+import asyncio
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.api.routes import portfolio_async
+from app.core.cache import response_cache
+from app.db.async_session import create_async_engines, get_async_db
+from app.db.session import create_engines
+from app.models.accounts import Account
+from app.models.base import Base
+from app.models.instruments import Instrument
+from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode
+from app.schemas.valuations import ValuationCreate
+from app.services import portfolio
+from app.services.valuations import upsert_valuation
+
+AS_OF = date(2024, 1, 31)
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    url = f"sqlite:///{tmp_path / 'async.db'}"
+    engine, read_engine = create_engines(url)
+    Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        account = Account(name="Main", account_type="brokerage")
+        fund = Instrument(name="Fund", instrument_type="fund")
+        taxonomy = Taxonomy(name="asset_class")
+        equity = TaxonomyNode(name="Equity", taxonomy=taxonomy)
+        cash = TaxonomyNode(name="Cash", taxonomy=taxonomy)
+        session.add_all([account, fund, taxonomy, equity, cash])
+        session.flush()
+        session.add(InstrumentClassification(instrument_id=fund.id, taxonomy_node_id=equity.id))
+        session.add(TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=equity.id, target_weight=0.6))
+        session.add(TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=cash.id, target_weight=0.4))
+        session.flush()
+        upsert_valuation(
+            session,
+            ValuationCreate(account_id=account.id, instrument_id=fund.id, valuation_date=AS_OF, value_jpy=300),
+        )
+        session.commit()
+        expected = {
+            "allocation": portfolio.get_allocation(session, AS_OF, "asset_class"),
+            "deviation": portfolio.get_deviation(session, AS_OF, "asset_class", rollup=True),
+            "timeseries": portfolio.get_timeseries(session, date(2024, 1, 1), AS_OF, "month", breakdown="instrument"),
+            "deviation_matrix": jsonable_encoder(portfolio.get_deviation_matrix(session, "asset_class", [AS_OF])),
+        }
+    read_engine.dispose()
+    engine.dispose()
+    return url.replace("sqlite:", "sqlite+aiosqlite:"), expected
+
+
+def test_async_routes_serve_portfolio_reads(database_url, monkeypatch) -> None:
+    url, expected = database_url
+
+    def blocking_run_sync(*args, **kwargs):
+        raise AssertionError("portfolio reads must await their statements, not run a sync session")
+
+    monkeypatch.setattr(AsyncSession, "run_sync", blocking_run_sync)
+    app = FastAPI()
+    app.include_router(portfolio_async.router, prefix="/api")
+    engine, read_engine = create_async_engines(url)
+
+    async def override_get_async_db():
+        async with async_sessionmaker(bind=read_engine)() as db:
+            yield db
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    response_cache.clear()
+    with TestClient(app) as client:
+        response = client.get("/api/portfolio/allocation", params={"date": "2024-01-31"})
+        assert response.json() == expected["allocation"]
+        # The same read plans as the sync routes, with each statement awaited.
+        deviation = client.get("/api/portfolio/deviation", params={"date": "2024-01-31", "rollup": True})
+        assert deviation.json() == expected["deviation"]
+        timeseries = client.get(
+            "/api/portfolio/timeseries",
+            params={"start": "2024-01-01", "end": "2024-01-31", "breakdown": "instrument"},
+        )
+        assert timeseries.json() == expected["timeseries"]
+        matrix = client.get("/api/portfolio/deviation/matrix", params={"dates": ["2024-01-31"]})
+        assert matrix.json() == expected["deviation_matrix"]
+        revalidated = client.get(
+            "/api/portfolio/allocation",
+            params={"date": "2024-01-31"},
+            headers={"If-None-Match": response.headers["etag"]},
+        )
+        assert revalidated.status_code == 304
+        assert client.get("/api/portfolio/cache").json()["hits"] == 1
+    response_cache.clear()
+    asyncio.run(read_engine.dispose())
+    asyncio.run(engine.dispose())
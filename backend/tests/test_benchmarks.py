@@ -0,0 +1,20 @@
+from fastapi.routing import APIRoute
+
+from app.main import app
+from benchmarks.suite import build_cases, run_cases
+from benchmarks.synthetic import SCALES, generate
+
+
+def test_suite_covers_every_route_and_runs(client, session) -> None:
+    data = generate(session, SCALES["tiny"])
+    session.commit()
+    cases = build_cases(client, session, data)
+
+    routes = {
+        (method, route.path) for route in app.routes if isinstance(route, APIRoute) for method in route.methods
+    }
+    assert routes <= {case.endpoint for case in cases if case.endpoint}
+
+    results = run_cases(cases, repeats=1)
+    assert set(results) == {case.name for case in cases}
+    assert all(result["median_ms"] > 0 for result in results.values())
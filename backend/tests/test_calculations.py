@@ -1,6 +1,23 @@
+from datetime import date
+
+import numpy as np
 import pytest
 
-from app.services.calculations import calculate_allocation, calculate_deviation, forecast_values
+from app.services.calculations import (
+    OPEN_ENDED,
+    allocate_to_targets,
+    calculate_allocation,
+    calculate_deviation,
+    carry_forward,
+    forecast_values,
+    lttb_indices,
+    period_ends,
+    period_keys,
+    period_label,
+    project_contributions,
+    simulate_forecast,
+    timeseries_metrics,
+)
 
 
 def test_calculate_allocation() -> None:
@@ -25,3 +42,172 @@ def test_forecast_values() -> None:
     assert values[0] == 1000
     assert values[1] == 1110.0
     assert values[2] == 1221.1
+
+
+def test_simulate_forecast_without_volatility_matches_deterministic() -> None:
+    result = simulate_forecast(
+        start_value=1000,
+        annual_return=0.12,
+        annual_volatility=0.0,
+        monthly_contribution=100,
+        months=30,
+        paths=50,
+        target_value=4000,
+        seed=1,
+        block_months=7,
+    )
+    expected = forecast_values(start_value=1000, annual_return=0.12, monthly_contribution=100, months=30)
+    for band in result["percentiles"].values():
+        assert band == pytest.approx(expected, abs=0.01)
+    assert result["target_probability"] == 1.0
+
+
+def test_simulate_forecast_percentile_bands_are_ordered() -> None:
+    result = simulate_forecast(
+        start_value=0,
+        annual_return=0.05,
+        annual_volatility=0.2,
+        monthly_contribution=1000,
+        months=120,
+        paths=2000,
+        target_value=150_000,
+        seed=7,
+    )
+    bands = [result["percentiles"][f"p{p}"] for p in (5, 25, 50, 75, 95)]
+    assert all(len(band) == 121 for band in bands)
+    for lower, upper in zip(bands, bands[1:]):
+        assert all(low <= high for low, high in zip(lower, upper))
+    assert 0.0 < result["target_probability"] < 1.0
+
+
+def test_allocate_to_targets_fills_largest_gaps_first() -> None:
+    values = np.array([700.0, 100.0, 200.0])
+    targets = np.array([0.5, 0.3, 0.2])
+    assert allocate_to_targets(values, targets, 100).tolist() == [0.0, 100.0, 0.0]
+    assert allocate_to_targets(values, targets, 1000).tolist() == pytest.approx([300.0, 500.0, 200.0])
+
+
+def test_project_contributions_honours_fixed_and_weight_rules() -> None:
+    values = np.array([700.0, 100.0, 200.0])
+    targets = np.array([0.5, 0.3, 0.2])
+    contributions, projected = project_contributions(
+        values,
+        targets,
+        monthly_amount=100,
+        fixed_amounts=np.array([0.0, 0.0, 10.0]),
+        rule_weights=np.array([0.5, 0.5, 0.0]),
+        months=3,
+        rebalance_mode="fixed",
+    )
+    assert contributions.tolist() == [[45.0, 45.0, 10.0]] * 3
+    assert projected[-1].tolist() == pytest.approx([835.0, 235.0, 230.0])
+
+    contributions, projected = project_contributions(
+        values,
+        targets,
+        monthly_amount=100,
+        fixed_amounts=np.array([0.0, 0.0, 10.0]),
+        rule_weights=np.zeros(3),
+        months=36,
+    )
+    assert contributions.sum(axis=1) == pytest.approx([100.0] * 36)
+    assert contributions[:, 2].min() >= 10.0
+    assert projected[-1] / projected[-1].sum() == pytest.approx(targets, abs=0.01)
+
+
+
+def test_target_projection_matches_month_by_month_water_filling() -> None:
+    rng = np.random.default_rng(3)
+    for annual_return in (0.0, 0.06, -0.04):
+        values = rng.random(9) * 1e6
+        values[0] *= 20
+        # Targets short of 100% and fixed amounts make the funded set change
+        # several times over the horizon.
+        targets = rng.random(9) * 0.9 / 9 * 2
+        fixed = np.where(rng.random(9) < 0.3, 5000.0, 0.0)
+        contributions, projected = project_contributions(
+            values, targets, 80_000, fixed, np.zeros(9), 480, annual_return=annual_return
+        )
+
+        current = values.copy()
+        for month in range(480):
+            current = current * (1 + annual_return / 12) + fixed
+            allocation = allocate_to_targets(current, targets, 80_000 - fixed.sum())
+            assert contributions[month] == pytest.approx(fixed + allocation, rel=1e-9, abs=1e-6)
+            current = current + allocation
+            assert projected[month + 1] == pytest.approx(current, rel=1e-9)
+
+
+def test_period_keys_and_labels_cover_every_granularity() -> None:
+    ordinals = np.array([date(2023, 12, 31).toordinal(), date(2024, 1, 1).toordinal(), date(2024, 4, 2).toordinal()])
+    labels = {
+        group_by: [period_label(int(key), group_by) for key in period_keys(ordinals, group_by)]
+        for group_by in ("day", "week", "month", "quarter", "year")
+    }
+    assert labels == {
+        "day": ["2023-12-31", "2024-01-01", "2024-04-02"],
+        "week": ["2023-W52", "2024-W01", "2024-W14"],
+        "month": ["2023-12", "2024-01", "2024-04"],
+        "quarter": ["2023-Q4", "2024-Q1", "2024-Q2"],
+        "year": ["2023", "2024", "2024"],
+    }
+    assert period_ends(period_keys(ordinals, "year")).tolist() == [0, 2]
+
+
+def test_timeseries_metrics_exclude_cash_flows() -> None:
+    closing = np.array([100.0, 220.0, 198.0, 237.6])
+    flows = np.array([0.0, 100.0, 0.0, 0.0])
+    metrics = timeseries_metrics(closing, flows, window=2, periods_per_year=12)
+
+    assert np.isnan(metrics["period_return"][0])
+    assert metrics["period_return"][1:] == pytest.approx([0.2, -0.1, 0.2])
+    assert metrics["cumulative_return"] == pytest.approx([0.0, 0.2, 0.08, 0.296])
+    assert metrics["drawdown"] == pytest.approx([0.0, 0.0, -0.1, 0.0])
+    assert np.isnan(metrics["volatility"][:2]).all()
+    assert metrics["volatility"][2] == pytest.approx(np.std([0.2, -0.1], ddof=1) * np.sqrt(12))
+
+
+def test_lttb_keeps_endpoints_and_spikes() -> None:
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[437] = 10.0
+    indices = lttb_indices(x, y, 50)
+
+    assert len(indices) == 50
+    assert indices[0] == 0 and indices[-1] == 999
+    assert np.all(np.diff(indices) > 0)
+    assert 437 in indices
+    assert lttb_indices(x[:10], y[:10], 50).tolist() == list(range(10))
+
+
+def test_carry_forward_matches_latest_value_per_holding() -> None:
+    rng = np.random.default_rng(7)
+    holdings = rng.integers(0, 6, 200)
+    ordinals = rng.integers(0, 60, 200)
+    values = rng.integers(1, 1000, 200).astype(float)
+    latest = {}
+    for holding, ordinal, value in zip(holdings, ordinals, values):
+        latest[(holding, ordinal)] = value
+    keys = sorted(latest)
+    valid_from = np.array([ordinal for _, ordinal in keys])
+    valid_to = np.array(
+        [
+            next_ordinal if next_holding == holding else OPEN_ENDED
+            for (holding, _), (next_holding, next_ordinal) in zip(keys, keys[1:] + [(-1, 0)])
+        ]
+    )
+    days = np.arange(10, 70, 3)
+
+    sums = carry_forward(days, valid_from, valid_to, np.array([latest[key] for key in keys]))[:, 0]
+    expected = [
+        sum(
+            latest[max(key for key in keys if key[0] == holding and key[1] <= day)]
+            for holding in {key[0] for key in keys if key[1] <= day}
+        )
+        for day in days
+    ]
+    assert sums.tolist() == expected
+    by_holding = carry_forward(
+        days, valid_from, valid_to, np.ones(len(keys)), np.array([holding for holding, _ in keys]), 6
+    )
+    assert by_holding.max() == 1
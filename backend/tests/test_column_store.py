@@ -0,0 +1,171 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.snapshots import PortfolioSnapshotTotal
+from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode
+from app.services.columnar import ValuationColumnStore, valuation_store
+from app.services.portfolio import (
+    get_allocation,
+    get_allocation_matrix,
+    get_deviation,
+    get_deviation_matrix,
+    get_timeseries,
+)
+from app.services.snapshots import rebuild_snapshots
+from app.services.taxonomies import rebuild_taxonomy_paths
+
+
+def _by_node(items: list[dict]) -> list[dict]:
+    return sorted(items, key=lambda item: item["taxonomy_node_id"])
+
+
+# Reads the column store answers when loaded, each compared against the
+# snapshot tables. Allocation rows come back in node order from the store.
+STORE_READS = [
+    lambda session: _by_node(get_allocation(session, date(2024, 2, 15), "asset_class")),
+    lambda session: _by_node(get_allocation(session, date(2024, 3, 31), "asset_class", rollup=True)),
+    lambda session: _by_node(get_deviation(session, date(2024, 1, 31), "asset_class", rollup=True)),
+    lambda session: get_allocation_matrix(
+        session, "asset_class", [date(2024, 1, 1), date(2024, 2, 1), date(2024, 3, 9)]
+    ),
+    lambda session: get_allocation_matrix(
+        session, "asset_class", start=date(2024, 1, 1), end=date(2024, 3, 31), frequency="week", rollup=True
+    ),
+    lambda session: get_deviation_matrix(session, "asset_class", [date(2024, 1, 31), date(2024, 3, 1)], rollup=True),
+    lambda session: get_timeseries(session, date(2024, 1, 1), date(2024, 3, 31), "month", breakdown="account"),
+    lambda session: get_timeseries(session, date(2024, 1, 1), date(2024, 3, 31), "day", breakdown="instrument"),
+    lambda session: get_timeseries(session, date(2024, 1, 10), date(2024, 3, 31), "week", breakdown="taxonomy"),
+]
+
+
+@pytest.fixture
+def store():
+    yield valuation_store
+    valuation_store.clear()
+
+
+def _post(client, account_id, instrument_id, valuation_date, value) -> None:
+    client.post(
+        "/api/valuations",
+        json={
+            "account_id": account_id,
+            "instrument_id": instrument_id,
+            "valuation_date": valuation_date,
+            "value_jpy": value,
+        },
+    )
+
+
+@pytest.fixture
+def ids(client, session) -> dict:
+    account = Account(name="Main", account_type="brokerage")
+    funds = [Instrument(name=f"Fund {index}", instrument_type="fund") for index in range(2)]
+    session.add_all([account, *funds])
+    session.commit()
+    for day, value in (("2024-01-15", 100), ("2024-01-31", 200), ("2024-02-29", 300)):
+        _post(client, account.id, funds[0].id, day, value)
+        _post(client, account.id, funds[1].id, day, value / 2)
+    _post(client, account.id, None, "2024-02-29", 50)
+    return {"account": account.id, "funds": [fund.id for fund in funds]}
+
+
+@pytest.fixture
+def classified(session, ids) -> None:
+    taxonomy = Taxonomy(name="asset_class")
+    risk = TaxonomyNode(name="Risk", taxonomy=taxonomy)
+    session.add_all([taxonomy, risk])
+    session.flush()
+    equity = TaxonomyNode(name="Equity", taxonomy=taxonomy, parent_id=risk.id)
+    fixed = TaxonomyNode(name="Fixed income", taxonomy=taxonomy)
+    session.add_all([equity, fixed])
+    session.flush()
+    session.add(InstrumentClassification(instrument_id=ids["funds"][0], taxonomy_node_id=equity.id))
+    session.add(InstrumentClassification(instrument_id=ids["funds"][1], taxonomy_node_id=fixed.id))
+    session.add(TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=equity.id, target_weight=0.7))
+    session.add(TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=fixed.id, target_weight=0.3))
+    rebuild_taxonomy_paths(session)
+    session.flush()
+    rebuild_snapshots(session)
+    session.commit()
+
+
+def test_store_group_bys_match_snapshot_queries(client, session, ids, classified, store) -> None:
+    expected = [read(session) for read in STORE_READS]
+    store.load(session)
+    assert [read(session) for read in STORE_READS] == expected
+
+    # A backdated write lands in the store's delta; the group-bys have to see it.
+    _post(client, ids["account"], ids["funds"][1], "2024-01-20", 70)
+    _post(client, ids["account"], ids["funds"][0], "2024-03-05", 0)
+    assert store.stats()["delta_dates"] == 2
+    loaded = [read(session) for read in STORE_READS]
+    store.clear()
+    assert loaded == [read(session) for read in STORE_READS]
+
+
+def test_store_timeseries_matches_snapshots(session, ids, store) -> None:
+    expected = {
+        group_by: get_timeseries(session, date(2024, 1, 1), date(2024, 3, 31), group_by)
+        for group_by in ("month", "day")
+    }
+    store.load(session)
+    assert store.stats()["rows"] == 7
+    for group_by, points in expected.items():
+        assert get_timeseries(session, date(2024, 1, 1), date(2024, 3, 31), group_by) == points
+    assert get_timeseries(session, date(2024, 1, 16), date(2024, 2, 1), "day") == [
+        {"period": "2024-01-31", "total_value_jpy": 300.0}
+    ]
+
+
+def test_writes_are_applied_to_loaded_store(client, session, ids, store) -> None:
+    store.load(session)
+    _post(client, ids["account"], ids["funds"][0], "2024-01-31", 1000)
+    _post(client, ids["account"], ids["funds"][0], "2024-03-01", 10)
+
+    stats = client.get("/api/portfolio/column-store").json()
+    assert (stats["loaded"], stats["delta_dates"], stats["delta_rows"]) == (True, 2, 3)
+    assert stats["bytes"] > 0
+    response = client.get("/api/portfolio/timeseries", params={"start": "2024-01-01", "end": "2024-03-31"})
+    expected = [
+        {"period": "2024-01", "total_value_jpy": 1100.0},
+        {"period": "2024-02", "total_value_jpy": 500.0},
+        # Fund 1 and cash were last valued on 2024-02-29 and carry forward.
+        {"period": "2024-03", "total_value_jpy": 210.0},
+    ]
+    assert response.json() == expected
+    store.clear()
+    assert get_timeseries(session, date(2024, 1, 1), date(2024, 3, 31), "month") == expected
+
+
+def test_compaction_folds_refreshed_dates_into_base(session, ids) -> None:
+    store = ValuationColumnStore(compact_dates=1)
+    store.load(session)
+    before = store.daily_totals(date(2024, 1, 1), date(2024, 3, 31))
+    store.refresh_dates(session, [date(2024, 1, 15), date(2024, 2, 29), date(2024, 3, 1)])
+
+    stats = store.stats()
+    assert (stats["rows"], stats["dates"], stats["delta_dates"]) == (7, 3, 0)
+    after = store.daily_totals(date(2024, 1, 1), date(2024, 3, 31))
+    assert all(np.array_equal(left, right) for left, right in zip(after, before))
+    assert np.all(np.diff(store.ordinals) >= 0)
+
+
+def test_backdated_writes_match_snapshot_totals(client, session, ids, store) -> None:
+    store.load(session)
+    rng = np.random.default_rng(3)
+    for _ in range(12):
+        day = date(2024, 1, 1).toordinal() + int(rng.integers(0, 90))
+        fund = ids["funds"][int(rng.integers(0, 2))]
+        _post(client, ids["account"], fund, date.fromordinal(day).isoformat(), int(rng.integers(1, 500)))
+        days, totals = store.daily_totals(date(2024, 1, 1), date(2024, 3, 31))
+        snapshots = (
+            session.query(PortfolioSnapshotTotal.snapshot_date, PortfolioSnapshotTotal.total_value_jpy)
+            .order_by(PortfolioSnapshotTotal.snapshot_date)
+            .all()
+        )
+        assert [date.fromordinal(int(ordinal)) for ordinal in days] == [row.snapshot_date for row in snapshots]
+        assert totals.tolist() == [row.total_value_jpy for row in snapshots]
@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import get_sqlite_pragmas
+from app.db.session import create_engines
+
+
+@pytest.fixture
+def engines(tmp_path):
+    engine, read_engine = create_engines(f"sqlite:///{tmp_path / 'tuned.db'}", get_sqlite_pragmas())
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, value REAL)"))
+        connection.execute(text("INSERT INTO items (value) VALUES (1.0)"))
+    yield engine, read_engine
+    read_engine.dispose()
+    engine.dispose()
+
+
+def test_file_database_gets_tuned_pragmas(engines) -> None:
+    engine, read_engine = engines
+    with engine.connect() as connection:
+        assert connection.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert connection.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert connection.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    with read_engine.connect() as connection:
+        assert connection.execute(text("PRAGMA query_only")).scalar() == 1
+
+
+def test_read_engine_rejects_writes(engines) -> None:
+    _, read_engine = engines
+    with read_engine.connect() as connection:
+        with pytest.raises(OperationalError):
+            connection.execute(text("INSERT INTO items (value) VALUES (2.0)"))
+
+
+def test_reads_do_not_wait_on_open_write_transaction(engines) -> None:
+    engine, read_engine = engines
+    with engine.connect() as writer:
+        writer.execute(text("BEGIN IMMEDIATE"))
+        writer.execute(text("INSERT INTO items (value) VALUES (2.0)"))
+        with read_engine.connect() as reader:
+            reader.execute(text("PRAGMA busy_timeout=0"))
+            assert reader.execute(text("SELECT count(*) FROM items")).scalar() == 1
+        writer.execute(text("COMMIT"))
+    with read_engine.connect() as reader:
+        assert reader.execute(text("SELECT count(*) FROM items")).scalar() == 2
+
+
+def test_memory_database_shares_one_engine() -> None:
+    engine, read_engine = create_engines("sqlite://")
+    assert engine is read_engine
+    engine.dispose()
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Price, Valuation
+from app.services.exports import EXPORT_SOURCES, export_batches
+
+
+@pytest.fixture
+def ids(session) -> dict:
+    main = Account(name="Main", account_type="brokerage")
+    other = Account(name="Other", account_type="bank")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    session.add_all([main, other, fund])
+    session.flush()
+    start = date(2024, 1, 1)
+    session.add_all(
+        Valuation(
+            account_id=account.id,
+            instrument_id=fund.id,
+            valuation_date=start + timedelta(days=day),
+            value_jpy=1000 + day,
+        )
+        for account in (main, other)
+        for day in range(10)
+    )
+    session.add(Price(instrument_id=fund.id, price_date=start, price=12.5))
+    session.commit()
+    return {"main": main.id, "other": other.id, "fund": fund.id}
+
+
+def test_csv_export_streams_filtered_rows(client, ids) -> None:
+    response = client.get(
+        "/api/exports/valuations",
+        params={"account_id": ids["main"], "start": "2024-01-03", "end": "2024-01-05"},
+    )
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="valuations.csv"' in response.headers["content-disposition"]
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["valuation_date"] for row in rows] == ["2024-01-03", "2024-01-04", "2024-01-05"]
+    assert {row["account_id"] for row in rows} == {str(ids["main"])}
+
+
+def test_ndjson_export_keeps_nulls_and_dates(client, ids) -> None:
+    response = client.get("/api/exports/prices", params={"format": "ndjson"})
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert records == [
+        {"id": 1, "instrument_id": ids["fund"], "price_date": "2024-01-01", "price": 12.5, "currency": "JPY"}
+    ]
+    assert client.get("/api/exports/prices", params={"account_id": ids["main"]}).status_code == 422
+
+
+def test_parquet_and_arrow_exports_round_trip(client, ids) -> None:
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    parquet = client.get("/api/exports/valuations", params={"format": "parquet", "account_id": ids["other"]})
+    table = pq.read_table(io.BytesIO(parquet.content))
+    assert table.num_rows == 10
+    assert table.schema.field("valuation_date").type == pa.date32()
+    assert table.column("value_jpy").to_pylist()[-1] == 1009
+
+    arrow = client.get("/api/exports/valuations", params={"format": "arrow"})
+    assert pa.ipc.open_stream(arrow.content).read_all().num_rows == 20
+
+
+def test_export_batches_are_bounded(session, ids) -> None:
+    batches = list(export_batches(session, EXPORT_SOURCES["valuations"], batch_size=7))
+    assert [len(batch) for batch in batches] == [7, 7, 6]
+    assert [row[0] for batch in batches for row in batch] == list(range(1, 21))
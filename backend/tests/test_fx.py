@@ -0,0 +1,111 @@
+from datetime import date
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import FxRate, Position, Price, Valuation
+from app.services.fx import convert_to_jpy, currency_codes, fx_rates
+from app.services.revaluation import revalue_positions
+
+
+def _add_rates(session, currency: str, rates: dict[date, float]) -> None:
+    session.add_all(FxRate(currency=currency, rate_date=day, rate_jpy=rate) for day, rate in rates.items())
+    session.commit()
+
+
+def test_convert_to_jpy_uses_latest_rate_on_or_before_each_date(engine, session) -> None:
+    _add_rates(session, "USD", {date(2024, 1, 2): 140.0, date(2024, 1, 5): 145.0})
+    names, codes = currency_codes(["USD", "JPY", "USD", "USD", "EUR"])
+    ordinals = np.array([date(2024, 1, day).toordinal() for day in (1, 1, 3, 8, 3)])
+
+    converted = convert_to_jpy(session, names, codes, ordinals, np.full(5, 2.0))
+    assert np.isnan(converted[0])
+    assert converted[1:4].tolist() == [2.0, 280.0, 290.0]
+    assert np.isnan(converted[4])
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    converted = convert_to_jpy(session, names, codes, ordinals, np.ones(5))
+    assert statements == []
+    assert converted[2] == pytest.approx(140.0)
+
+
+def test_bulk_endpoint_upserts_csv_rates_and_clears_the_cache(client, session) -> None:
+    _add_rates(session, "USD", {date(2024, 1, 2): 140.0})
+    names, codes = currency_codes(["USD"])
+    ordinal = np.array([date(2024, 1, 3).toordinal()])
+    assert convert_to_jpy(session, names, codes, ordinal, np.ones(1))[0] == 140.0
+    loads = fx_rates.loads
+
+    csv_body = "currency,rate_date,rate_jpy\nUSD,2024-01-02,141.5\nUSD,2024-01-03,142\nusd,2024-01-04,1\n"
+    response = client.post("/api/fx-rates/bulk", content=csv_body, headers={"content-type": "text/csv"})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["received"], body["upserted"]) == (3, 2)
+    assert [error["row"] for error in body["errors"]] == [2]
+
+    session.expire_all()
+    assert session.query(FxRate).count() == 2
+    assert convert_to_jpy(session, names, codes, ordinal, np.ones(1))[0] == 142.0
+    assert fx_rates.loads == loads + 1
+
+
+def test_revaluation_converts_foreign_prices_at_the_valuation_date(session) -> None:
+    account = Account(name="Main", account_type="brokerage")
+    stock = Instrument(name="US Stock", instrument_type="stock")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    session.add_all([account, stock, fund])
+    session.flush()
+    session.add_all(
+        [
+            Position(account_id=account.id, instrument_id=stock.id, quantity=10),
+            Position(account_id=account.id, instrument_id=fund.id, quantity=1),
+            Price(instrument_id=stock.id, price_date=date(2024, 1, 2), price=5, currency="USD"),
+            Price(instrument_id=fund.id, price_date=date(2024, 1, 2), price=1000),
+            Price(instrument_id=fund.id, price_date=date(2024, 1, 3), price=1000),
+            Price(instrument_id=fund.id, price_date=date(2024, 1, 4), price=1000),
+        ]
+    )
+    session.commit()
+    _add_rates(session, "USD", {date(2024, 1, 3): 140.0, date(2024, 1, 4): 150.0})
+
+    result = revalue_positions(session, date(2024, 1, 1), date(2024, 1, 4))
+    session.commit()
+
+    # No USD rate exists yet on Jan 2, so the stock is only valued from Jan 3,
+    # with its Jan 2 quote converted at each day's rate.
+    assert result == {"positions": 2, "dates": 3, "upserted": 5}
+    values = {
+        (row.instrument_id, row.valuation_date): row.value_jpy
+        for row in session.query(Valuation).filter(Valuation.instrument_id == stock.id)
+    }
+    assert values == {(stock.id, date(2024, 1, 3)): 7000.0, (stock.id, date(2024, 1, 4)): 7500.0}
+
+
+def test_rates_read_across_a_clear_or_past_the_ttl_are_reloaded(engine, session, monkeypatch) -> None:
+    _add_rates(session, "USD", {date(2024, 1, 2): 140.0})
+    names, codes = currency_codes(["USD"])
+    ordinal = np.array([date(2024, 1, 3).toordinal()])
+    loads = fx_rates.loads
+
+    # A write committed and cleared while the series is being read.
+    def clear(*args) -> None:
+        fx_rates.clear(["USD"])
+
+    event.listen(engine, "before_cursor_execute", clear)
+    convert_to_jpy(session, names, codes, ordinal, np.ones(1))
+    event.remove(engine, "before_cursor_execute", clear)
+    convert_to_jpy(session, names, codes, ordinal, np.ones(1))
+    assert fx_rates.loads == loads + 2
+    convert_to_jpy(session, names, codes, ordinal, np.ones(1))
+    assert fx_rates.loads == loads + 2
+
+    monkeypatch.setattr(fx_rates, "ttl_seconds", 0)
+    fx_rates.clear()
+    convert_to_jpy(session, names, codes, ordinal, np.ones(1))
+    convert_to_jpy(session, names, codes, ordinal, np.ones(1))
+    assert fx_rates.loads == loads + 4
+
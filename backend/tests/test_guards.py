@@ -0,0 +1,54 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import selectinload
+
+from app.db.guards import QueryBudgetExceeded, install_query_budget, uninstall_query_budget
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Valuation
+
+
+def _seed(session) -> None:
+    for index in range(3):
+        account = Account(name=f"Account {index}", account_type="bank")
+        instrument = Instrument(name=f"Fund {index}", instrument_type="fund")
+        session.add_all([account, instrument])
+        session.flush()
+        session.add(
+            Valuation(
+                account_id=account.id,
+                instrument_id=instrument.id,
+                valuation_date=date(2024, 1, 1),
+                value_jpy=1000.0,
+            )
+        )
+    session.commit()
+    session.expunge_all()
+
+
+def test_implicit_lazy_load_raises(session) -> None:
+    _seed(session)
+    account = session.scalars(select(Account)).first()
+    with pytest.raises(InvalidRequestError):
+        account.valuations
+
+
+def test_explicit_eager_load_is_allowed(session) -> None:
+    _seed(session)
+    accounts = session.scalars(select(Account).options(selectinload(Account.valuations))).all()
+    assert [len(account.valuations) for account in accounts] == [1, 1, 1]
+
+
+def test_query_budget_stops_runaway_sessions(session_factory) -> None:
+    install_query_budget()
+    try:
+        with session_factory(info={"query_budget": 2}) as session:
+            session.scalars(select(Account)).all()
+            session.scalars(select(Instrument)).all()
+            with pytest.raises(QueryBudgetExceeded):
+                session.scalars(select(Valuation)).all()
+    finally:
+        uninstall_query_budget()
@@ -0,0 +1,185 @@
+import io
+import json
+from datetime import date
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import FxRate, Price, Transaction, Valuation
+from app.services.imports import (
+    StatementImporter,
+    import_statement,
+    iter_csv_rows,
+    shutdown_validation_pool,
+)
+from app.services.ledger import get_holdings
+
+OFX = """OFXHEADER:100
+DATA:OFXSGML
+
+<OFX><INVSTMTMSGSRSV1><INVSTMTTRNRS><INVSTMTRS>
+<CURDEF>USD
+<INVTRANLIST>
+<BUYSTOCK><INVBUY><INVTRAN><FITID>T1<DTTRADE>20240105120000.000[-5:EST]</INVTRAN>
+<SECID><UNIQUEID>037833100<UNIQUEIDTYPE>CUSIP</SECID>
+<UNITS>10<UNITPRICE>5<TOTAL>-50</INVBUY><BUYTYPE>BUY</BUYSTOCK>
+<INVBANKTRAN><STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20240102<TRNAMT>100<FITID>C1</STMTTRN></INVBANKTRAN>
+</INVTRANLIST>
+<INVPOSLIST>
+<POSSTOCK><INVPOS><SECID><UNIQUEID>037833100<UNIQUEIDTYPE>CUSIP</SECID>
+<UNITS>10<UNITPRICE>6<MKTVAL>60<DTPRICEASOF>20240110</INVPOS></POSSTOCK>
+</INVPOSLIST>
+</INVSTMTRS></INVSTMTTRNRS></INVSTMTMSGSRSV1>
+<SECLISTMSGSRSV1><SECLIST>
+<STOCKINFO><SECINFO><SECID><UNIQUEID>037833100<UNIQUEIDTYPE>CUSIP</SECID>
+<SECNAME>Apple<TICKER>AAPL</SECINFO></STOCKINFO>
+</SECLIST></SECLISTMSGSRSV1></OFX>
+"""
+
+
+def _seed(session) -> tuple[int, int]:
+    account = Account(name="Broker", account_type="brokerage")
+    instrument = Instrument(name="Apple", ticker="AAPL", instrument_type="stock")
+    session.add_all([account, instrument])
+    session.commit()
+    return account.id, instrument.id
+
+
+def _csv(lines: list[str]) -> io.BytesIO:
+    return io.BytesIO("\n".join(lines).encode())
+
+
+def test_csv_import_maps_columns_and_skips_rows_already_imported(session) -> None:
+    account_id, instrument_id = _seed(session)
+    lines = [
+        "Date,Symbol,Action,Shares,Net",
+        "2024-01-05,aapl,buy,10,1000",
+        "2024-01-05,aapl,buy,10,1000",
+        "2024-01-06,MSFT,buy,1,10",
+        "2024-01-07,AAPL,sell,,oops",
+    ]
+    mapping = {
+        "transaction_date": "Date",
+        "ticker": "Symbol",
+        "transaction_type": "Action",
+        "quantity": "Shares",
+        "amount": "Net",
+    }
+
+    result = import_statement(session, _csv(lines), "csv", "transactions", account_id, mapping).result()
+    assert result["received"] == 4
+    assert result["inserted"] == {"transactions": 2, "valuations": 0, "prices": 0}
+    assert [error["row"] for error in result["errors"]] == [2, 3]
+    assert "unknown ticker" in result["errors"][0]["errors"][0]
+    # Identical lines without a statement id are separate trades.
+    assert get_holdings(session, date(2024, 1, 5))[0]["quantity"] == 20
+
+    again = import_statement(session, _csv(lines), "csv", "transactions", account_id, mapping).result()
+    assert again["inserted"]["transactions"] == 0
+    assert again["duplicates"] == 2
+    assert session.query(Transaction).filter(Transaction.instrument_id == instrument_id).count() == 2
+
+
+def test_csv_mapping_rejects_unknown_fields() -> None:
+    with pytest.raises(ValueError, match="price"):
+        next(iter_csv_rows(io.StringIO("a\n1\n"), "transactions", {"price": "a"}))
+
+
+def test_ofx_import_converts_to_jpy_and_resolves_securities_listed_later(session) -> None:
+    account_id, instrument_id = _seed(session)
+    session.add(FxRate(currency="USD", rate_date=date(2024, 1, 1), rate_jpy=150.0))
+    session.commit()
+
+    result = import_statement(session, io.BytesIO(OFX.encode()), "ofx", account_id=account_id).result()
+    assert result["errors"] == []
+    assert result["inserted"] == {"transactions": 2, "valuations": 1, "prices": 1}
+
+    transactions = {row.transaction_type: row for row in session.query(Transaction)}
+    assert transactions["buy"].instrument_id == instrument_id
+    assert (transactions["buy"].quantity, transactions["buy"].amount_jpy) == (10, 7500.0)
+    assert transactions["deposit"].amount_jpy == 15000.0
+    valuation = session.query(Valuation).one()
+    assert (valuation.valuation_date, valuation.value_jpy) == (date(2024, 1, 10), 9000.0)
+    price = session.query(Price).one()
+    assert (price.price, price.currency) == (6.0, "USD")
+    assert get_holdings(session, date(2024, 1, 10))[0]["cost_basis_jpy"] == 7500.0
+
+    again = import_statement(session, io.BytesIO(OFX.encode()), "ofx", account_id=account_id).result()
+    assert again["duplicates"] == 4
+
+
+def test_ofx_rows_without_a_rate_are_reported(session) -> None:
+    account_id, _ = _seed(session)
+    result = import_statement(session, io.BytesIO(OFX.encode()), "ofx", account_id=account_id).result()
+    assert [error["row"] for error in result["errors"]] == [0, 1, 2]
+    assert result["inserted"] == {"transactions": 0, "valuations": 0, "prices": 1}
+
+
+def test_worker_pool_matches_inline_validation(session_factory) -> None:
+    rows = [
+        ("valuations", {"account_id": "1", "ticker": "AAPL", "valuation_date": f"2024-01-{day:02d}", "value": day})
+        for day in range(1, 29)
+    ]
+    rows.append(("valuations", {"account_id": "1", "valuation_date": "2024-01-01", "value": "x"}))
+    results = []
+    for workers in (0, 2, 2):
+        with session_factory() as session:
+            if workers == 0:
+                _seed(session)
+            session.query(Valuation).delete()
+            session.commit()
+            results.append(StatementImporter(session, workers=workers, chunk_size=5).run(rows))
+    try:
+        assert results[0] == results[1] == results[2]
+        assert results[1]["inserted"]["valuations"] == 28
+    finally:
+        shutdown_validation_pool()
+
+
+def test_price_imports_keep_one_price_per_instrument_and_day(session) -> None:
+    _, instrument_id = _seed(session)
+    header = "ticker,price_date,price"
+    first = import_statement(
+        session, _csv([header, "AAPL,2024-01-05,10", "AAPL,2024-01-05,11", "AAPL,2024-01-08,12"]), kind="prices"
+    ).result()
+    assert (first["inserted"]["prices"], first["duplicates"]) == (2, 1)
+
+    second = import_statement(session, _csv([header, "AAPL,2024-01-05,13"]), kind="prices").result()
+    assert second["inserted"]["prices"] == 1
+    prices = session.query(Price).filter(Price.instrument_id == instrument_id).order_by(Price.price_date)
+    assert [(price.price_date, price.price) for price in prices] == [(date(2024, 1, 5), 13.0), (date(2024, 1, 8), 12.0)]
+
+
+def test_imports_endpoint_reads_the_body_and_rejects_bad_mappings(client, session) -> None:
+    account_id, _ = _seed(session)
+    body = "transaction_date,transaction_type,amount\n2024-01-02,deposit,1000\n"
+    params = {"account_id": account_id, "mapping": json.dumps({"amount": "amount"})}
+    response = client.post("/api/imports", params=params, content=body)
+    assert response.status_code == 200
+    assert response.json()["inserted"]["transactions"] == 1
+
+    assert client.post("/api/imports", params={"mapping": "{"}, content=body).status_code == 422
+    assert client.post("/api/imports", params={"mapping": '{"nope": "x"}'}, content=body).status_code == 422
+
+
+def test_resumed_import_skips_written_chunks_and_keeps_repeated_rows(session) -> None:
+    account_id, _ = _seed(session)
+    deposit = {"account_id": account_id, "transaction_date": "2024-01-02", "transaction_type": "deposit"}
+    rows = [("transactions", {**deposit, "amount": "100"})] * 5 + [("transactions", deposit)]
+    saved = []
+
+    def interrupt(importer: StatementImporter) -> None:
+        session.commit()
+        saved.append(importer.state())
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        StatementImporter(session, workers=0, chunk_size=2, checkpoint=interrupt).run(rows)
+    assert saved[0]["written"] == 2
+
+    result = StatementImporter(session, workers=0, chunk_size=2, resume=saved[0]).run(rows)
+    assert result["inserted"]["transactions"] == 5
+    assert result["duplicates"] == 0
+    assert [error["row"] for error in result["errors"]] == [5]
+    assert session.query(Transaction).count() == 5
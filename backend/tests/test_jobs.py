@@ -0,0 +1,181 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.jobs import Job
+from app.models.portfolio import Position, Price, Valuation
+from app.models.snapshots import PortfolioSnapshotTotal
+from app.services import jobs
+from app.services.calculations import simulate_forecast
+from app.services.jobs import JobRunner
+from app.services.revaluation import revalue_positions
+from app.services.snapshots import rebuild_snapshots
+
+MONTE_CARLO = {
+    "horizon_months": 60,
+    "annual_return": 0.05,
+    "monthly_contribution": 1000,
+    "start_value": 10_000,
+    "paths": 500,
+    "target_value": 80_000,
+    "seed": 7,
+}
+
+
+@pytest.fixture
+def runner(tmp_path):
+    runner = JobRunner(workers=1, data_dir=str(tmp_path))
+    yield runner
+    runner.stop()
+
+
+def _job(session, job_id: int) -> Job:
+    return session.get(Job, job_id, populate_existing=True)
+
+
+def _interrupt_after_first_checkpoint(runner: JobRunner, engine, job_id: int) -> None:
+    runner.stopping.set()
+    runner._run(engine, job_id)
+    runner.stopping.clear()
+
+
+def _seed_prices(session, days: int = 10) -> int:
+    account = Account(name="Main", account_type="brokerage")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    session.add_all([account, fund])
+    session.flush()
+    session.add(Position(account_id=account.id, instrument_id=fund.id, quantity=10))
+    session.add_all(
+        Price(instrument_id=fund.id, price_date=date(2024, 1, 1) + timedelta(days=day), price=100 + day)
+        for day in range(days)
+    )
+    session.commit()
+    return account.id
+
+
+def _totals(session) -> list[tuple[date, float]]:
+    rows = session.query(PortfolioSnapshotTotal).order_by(PortfolioSnapshotTotal.snapshot_date)
+    return [(row.snapshot_date, row.total_value_jpy) for row in rows]
+
+
+def test_interrupted_monte_carlo_resumes_from_its_last_block(engine, session, runner, tmp_path) -> None:
+    job = runner.create(session, "monte_carlo", MONTE_CARLO)
+    _interrupt_after_first_checkpoint(runner, engine, job.id)
+
+    interrupted = _job(session, job.id)
+    assert (interrupted.status, interrupted.completed, interrupted.total) == ("queued", 1, 3)
+    assert interrupted.checkpoint["month"] == 24
+    assert [path.name for path in tmp_path.iterdir()] == [f"job-{job.id}-24.npz"]
+
+    runner._run(engine, job.id)
+    finished = _job(session, job.id)
+    assert (finished.status, finished.completed) == ("succeeded", 3)
+    expected = simulate_forecast(
+        MONTE_CARLO["start_value"],
+        MONTE_CARLO["annual_return"],
+        0.15,
+        MONTE_CARLO["monthly_contribution"],
+        MONTE_CARLO["horizon_months"],
+        MONTE_CARLO["paths"],
+        target_value=MONTE_CARLO["target_value"],
+        seed=MONTE_CARLO["seed"],
+    )
+    assert finished.result == expected
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_snapshot_rebuild_in_windows_matches_a_full_rebuild(engine, session, runner, monkeypatch) -> None:
+    _seed_prices(session)
+    revalue_positions(session, date(2024, 1, 1), date(2024, 1, 10))
+    session.commit()
+    expected = _totals(session)
+    # A stale snapshot on a date without valuations must disappear too.
+    session.add(PortfolioSnapshotTotal(snapshot_date=date(2024, 2, 1), total_value_jpy=1))
+    session.commit()
+
+    monkeypatch.setattr(jobs, "JOB_SNAPSHOT_DAYS", 3)
+    job = runner.create(session, "rebuild_snapshots", {})
+    _interrupt_after_first_checkpoint(runner, engine, job.id)
+    assert _job(session, job.id).checkpoint == {"snapshots_from": "2024-01-04"}
+
+    runner._run(engine, job.id)
+    finished = _job(session, job.id)
+    assert (finished.status, finished.completed, finished.total, finished.result) == ("succeeded", 4, 4, {"dates": 10})
+    session.expire_all()
+    assert _totals(session) == expected
+
+
+def test_revaluation_job_matches_the_synchronous_revaluation(engine, session, runner, monkeypatch) -> None:
+    account_id = _seed_prices(session)
+    expected = revalue_positions(session, date(2024, 1, 2), date(2024, 1, 9), account_id)
+    session.commit()
+    values = {(row.valuation_date, row.value_jpy) for row in session.query(Valuation)}
+    totals = _totals(session)
+    session.query(Valuation).delete()
+    rebuild_snapshots(session)
+    session.commit()
+
+    monkeypatch.setattr(jobs, "JOB_REVALUE_DAYS", 3)
+    job = runner.create(session, "revalue", {"start": "2024-01-02", "end": "2024-01-09", "account_id": account_id})
+    _interrupt_after_first_checkpoint(runner, engine, job.id)
+    assert _job(session, job.id).checkpoint["revalued_to"] == "2024-01-04"
+
+    runner._run(engine, job.id)
+    assert _job(session, job.id).result == expected
+    session.expire_all()
+    assert {(row.valuation_date, row.value_jpy) for row in session.query(Valuation)} == values
+    assert _totals(session) == totals
+
+
+def test_cancel_stops_queued_jobs_at_once_and_running_jobs_at_a_checkpoint(engine, session, runner) -> None:
+    queued = runner.create(session, "monte_carlo", MONTE_CARLO)
+    assert runner.cancel(session, queued.id).status == "cancelled"
+    runner._run(engine, queued.id)
+    assert _job(session, queued.id).completed == 0
+
+    running = runner.create(session, "monte_carlo", MONTE_CARLO)
+    session.query(Job).filter(Job.id == running.id).update({"status": "running"})
+    session.commit()
+    assert runner.cancel(session, running.id).cancel_requested
+    session.query(Job).filter(Job.id == running.id).update({"status": "queued"})
+    session.commit()
+    runner._run(engine, running.id)
+    cancelled = _job(session, running.id)
+    assert (cancelled.status, cancelled.completed) == ("cancelled", 1)
+
+
+def test_startup_resumes_jobs_left_running(session_factory, session, runner) -> None:
+    job = runner.create(session, "monte_carlo", MONTE_CARLO)
+    session.query(Job).filter(Job.id == job.id).update({"status": "running"})
+    session.commit()
+
+    assert runner.resume_interrupted(session_factory) == 1
+    runner.wait(job.id, timeout=30)
+    assert _job(session, job.id).status == "succeeded"
+
+
+def test_jobs_endpoints_submit_poll_and_cancel(client, session) -> None:
+    account = Account(name="Broker", account_type="brokerage")
+    session.add(account)
+    session.commit()
+    body = "transaction_date,transaction_type,amount\n2024-01-02,deposit,1000\n2024-01-03,withdrawal,200\n"
+
+    response = client.post("/api/imports/jobs", params={"account_id": account.id}, content=body)
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    jobs.job_runner.wait(job_id, timeout=30)
+    job = client.get(f"/api/jobs/{job_id}").json()
+    assert (job["kind"], job["status"], job["completed"]) == ("import", "succeeded", 2)
+    assert job["result"]["inserted"]["transactions"] == 2
+    assert not list(jobs.job_runner.data_dir.iterdir())
+
+    assert [item["id"] for item in client.get("/api/jobs", params={"status": "succeeded"}).json()] == [job_id]
+    assert client.post(f"/api/jobs/{job_id}/cancel").json()["status"] == "succeeded"
+    assert client.get("/api/jobs/999").status_code == 404
+    assert client.post("/api/jobs", json={"kind": "nope"}).status_code == 422
+    assert client.post("/api/jobs", json={"kind": "import"}).status_code == 422
+    assert client.post("/api/jobs", json={"kind": "monte_carlo", "params": {"paths": 0}}).status_code == 422
+    oversized = {**MONTE_CARLO, "horizon_months": 1201}
+    assert client.post("/api/jobs", json={"kind": "monte_carlo", "params": oversized}).status_code == 422
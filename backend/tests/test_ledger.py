@@ -0,0 +1,114 @@
+from datetime import date
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Position, PositionCheckpoint, Transaction
+from app.services.ledger import get_holdings, sync_ledger
+
+
+@pytest.fixture
+def ids(session) -> dict:
+    account = Account(name="Main", account_type="brokerage")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    stock = Instrument(name="Stock", instrument_type="stock")
+    session.add_all([account, fund, stock])
+    session.commit()
+    return {"account": account.id, "fund": fund.id, "stock": stock.id}
+
+
+def _transaction(ids, instrument: str, day: date, kind: str, quantity: float, amount: float) -> Transaction:
+    return Transaction(
+        account_id=ids["account"],
+        instrument_id=ids[instrument],
+        transaction_date=day,
+        transaction_type=kind,
+        quantity=quantity,
+        amount_jpy=amount,
+    )
+
+
+def test_replay_builds_positions_and_average_cost(session, ids) -> None:
+    session.add_all(
+        [
+            _transaction(ids, "fund", date(2024, 1, 5), "buy", 10, 1000),
+            _transaction(ids, "fund", date(2024, 1, 5), "buy", 10, 1400),
+            _transaction(ids, "fund", date(2024, 2, 1), "sell", 5, 700),
+            _transaction(ids, "stock", date(2024, 1, 10), "buy", 3, 300),
+            _transaction(ids, "stock", date(2024, 1, 20), "dividend", None, 12),
+        ]
+    )
+    session.flush()
+    assert sync_ledger(session) == {"positions": 2, "transactions": 5, "checkpoints": 4}
+
+    positions = {position.instrument_id: position.quantity for position in session.query(Position)}
+    assert positions == {ids["fund"]: 15, ids["stock"]: 3}
+    holdings = {holding["instrument_id"]: holding for holding in get_holdings(session, date(2024, 1, 31))}
+    assert holdings[ids["fund"]]["quantity"] == 20
+    assert holdings[ids["fund"]]["cost_basis_jpy"] == 2400
+    later = {holding["instrument_id"]: holding for holding in get_holdings(session, date(2024, 3, 1))}
+    assert later[ids["fund"]]["cost_basis_jpy"] == pytest.approx(1800)
+    assert get_holdings(session, date(2024, 1, 1)) == []
+
+
+def test_appended_transactions_replay_from_last_checkpoint(session, engine, ids) -> None:
+    session.add_all(
+        [
+            _transaction(ids, "fund", date(2024, 1, day), "buy", 1, 100)
+            for day in range(1, 29)
+        ]
+        + [_transaction(ids, "stock", date(2024, 1, 2), "buy", 1, 100)]
+    )
+    session.flush()
+    sync_ledger(session)
+
+    session.add(_transaction(ids, "fund", date(2024, 1, 20), "sell", 4, 500))
+    session.flush()
+    assert sync_ledger(session) == {"positions": 1, "transactions": 10, "checkpoints": 9}
+    assert session.query(PositionCheckpoint).count() == 29
+    holdings = {holding["instrument_id"]: holding["quantity"] for holding in get_holdings(session, date(2024, 1, 31))}
+    assert holdings == {ids["fund"]: 24, ids["stock"]: 1}
+    assert sync_ledger(session)["transactions"] == 0
+
+
+def test_transactions_committed_below_already_synced_ids_are_replayed(session, ids) -> None:
+    later = _transaction(ids, "fund", date(2024, 1, 10), "buy", 5, 500)
+    later.id = 50
+    session.add(later)
+    session.flush()
+    sync_ledger(session)
+
+    # A lower id whose writer committed only after the sync above.
+    earlier = _transaction(ids, "fund", date(2024, 1, 5), "buy", 2, 200)
+    earlier.id = 10
+    session.add(earlier)
+    session.flush()
+    assert sync_ledger(session) == {"positions": 1, "transactions": 2, "checkpoints": 2}
+    assert get_holdings(session, date(2024, 1, 31))[0]["quantity"] == 7
+    assert sync_ledger(session)["transactions"] == 0
+
+
+def test_holdings_endpoint(client, session, ids) -> None:
+    response = client.post(
+        "/api/transactions",
+        json={
+            "account_id": ids["account"],
+            "instrument_id": ids["fund"],
+            "transaction_date": "2024-01-05",
+            "transaction_type": "buy",
+            "quantity": 2,
+            "amount_jpy": 200,
+        },
+    )
+    assert response.status_code == 200
+    holdings = client.get("/api/holdings", params={"date": "2024-01-31"}).json()
+    assert holdings == [
+        {
+            "account_id": ids["account"],
+            "instrument_id": ids["fund"],
+            "as_of": "2024-01-05",
+            "quantity": 2.0,
+            "cost_basis_jpy": 200.0,
+        }
+    ]
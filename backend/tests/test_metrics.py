@@ -0,0 +1,84 @@
+import logging
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.api.routes import metrics
+from app.core.metrics import install_metrics, registry, uninstall_metrics
+from app.db.session import get_db
+
+
+@pytest.fixture
+def metrics_client(session_factory):
+    app = FastAPI()
+    install_metrics(app)
+
+    @app.get("/broken")
+    def broken(db: Session = Depends(get_db)) -> dict:
+        db.execute(text("SELECT * FROM missing_table"))
+        return {}
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int, db: Session = Depends(get_db)) -> dict:
+        db.execute(text("SELECT 1"))
+        db.execute(text("SELECT :item_id"), {"item_id": item_id})
+        return {"id": item_id}
+
+    def override_get_db():
+        with session_factory() as db:
+            yield db
+
+    app.include_router(metrics.router, prefix="/api")
+    app.dependency_overrides[get_db] = override_get_db
+    registry.reset()
+    with TestClient(app) as client:
+        yield client
+    uninstall_metrics()
+    registry.reset()
+
+
+def test_requests_are_recorded_by_route_template(metrics_client) -> None:
+    metrics_client.get("/items/1")
+    metrics_client.get("/items/2")
+    metrics_client.get("/missing")
+
+    body = metrics_client.get("/api/metrics").text
+    assert (
+        'asset_tracker_request_duration_seconds_count{method="GET",route="/items/{item_id}",status="200"} 2'
+        in body
+    )
+    assert 'asset_tracker_request_duration_seconds_count{method="GET",route="unmatched",status="404"} 1' in body
+    assert 'asset_tracker_request_queries_bucket{method="GET",route="/items/{item_id}",le="2"} 2' in body
+    assert 'asset_tracker_request_queries_bucket{method="GET",route="/items/{item_id}",le="1"} 0' in body
+    assert 'asset_tracker_request_queries_sum{method="GET",route="/items/{item_id}"} 4' in body
+
+
+def test_failed_statements_leave_no_timing_state_on_the_connection(metrics_client, session_factory) -> None:
+    with pytest.raises(Exception):
+        metrics_client.get("/broken")
+    metrics_client.get("/items/1")
+
+    with session_factory() as db:
+        assert db.connection().info == {}
+    body = metrics_client.get("/api/metrics").text
+    assert 'asset_tracker_request_queries_sum{method="GET",route="/items/{item_id}"} 2' in body
+
+
+def test_metrics_endpoint_uses_prometheus_content_type(metrics_client) -> None:
+    response = metrics_client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE asset_tracker_request_duration_seconds histogram" in response.text
+
+
+def test_slow_queries_are_logged_with_parameters(metrics_client, monkeypatch, caplog) -> None:
+    monkeypatch.setattr(registry, "slow_query_seconds", 0.0)
+    with caplog.at_level(logging.WARNING, logger="app.core.metrics"):
+        metrics_client.get("/items/42")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("SELECT ?" in message and "42" in message for message in messages)
+    assert "asset_tracker_slow_queries_total 2" in metrics_client.get("/api/metrics").text
@@ -0,0 +1,66 @@
+from datetime import date
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.models.snapshots import PortfolioSnapshot, PortfolioSnapshotTotal
+from app.services.snapshots import rebuild_snapshots
+
+
+def _alembic_config() -> Config:
+    # No ini file, so env.py leaves the test run's logging configuration alone.
+    config = Config()
+    config.set_main_option("script_location", str(Path(__file__).resolve().parents[1] / "alembic"))
+    return config
+
+
+def _snapshot_state(session) -> tuple[list, list]:
+    nodes = session.query(PortfolioSnapshot).order_by(PortfolioSnapshot.snapshot_date, PortfolioSnapshot.taxonomy_node_id)
+    totals = session.query(PortfolioSnapshotTotal).order_by(PortfolioSnapshotTotal.snapshot_date)
+    return (
+        [(row.snapshot_date, row.taxonomy_node_id, row.value_jpy) for row in nodes],
+        [(row.snapshot_date, row.total_value_jpy) for row in totals],
+    )
+
+
+def test_upgrade_rebuilds_snapshots_with_carried_forward_holdings(tmp_path, monkeypatch) -> None:
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    monkeypatch.setenv("DATABASE_URL", url)
+    config = _alembic_config()
+    command.upgrade(config, "0003_read_path_indexes")
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for statement in [
+            "INSERT INTO accounts (id, name, account_type) VALUES (1, 'Main', 'brokerage')",
+            "INSERT INTO instruments (id, name, instrument_type) VALUES (1, 'Equity Fund', 'fund'), (2, 'Bond Fund', 'fund')",
+            "INSERT INTO taxonomies (id, name) VALUES (1, 'asset_class')",
+            "INSERT INTO taxonomy_nodes (id, taxonomy_id, name) VALUES (1, 1, 'Equity'), (2, 1, 'Bonds')",
+            "INSERT INTO instrument_classifications (instrument_id, taxonomy_node_id) VALUES (1, 1), (2, 2)",
+            # Each date revalues only some holdings; the rest carry forward.
+            """
+            INSERT INTO valuations (account_id, instrument_id, valuation_date, value_jpy) VALUES
+                (1, 1, '2024-01-01', 100), (1, 2, '2024-01-01', 50), (1, 2, '2024-01-02', 50),
+                (1, NULL, '2024-01-03', 30), (1, 1, '2024-01-05', 120)
+            """,
+        ]:
+            connection.execute(text(statement))
+
+    command.upgrade(config, "head")
+    with Session(engine) as session:
+        migrated = _snapshot_state(session)
+        assert migrated[1] == [
+            (date(2024, 1, 1), 150),
+            (date(2024, 1, 2), 150),
+            (date(2024, 1, 3), 180),
+            (date(2024, 1, 5), 200),
+        ]
+        rebuild_snapshots(session)
+        assert _snapshot_state(session) == migrated
+
+    command.downgrade(config, "0012_transaction_ledger_sync")
+    with Session(engine) as session:
+        assert _snapshot_state(session)[1][1] == (date(2024, 1, 2), 50)
+    engine.dispose()
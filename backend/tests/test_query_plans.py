@@ -0,0 +1,122 @@
+import inspect
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Transaction
+from app.models.taxonomies import InstrumentClassification, Taxonomy, TaxonomyNode
+from app.schemas.valuations import ValuationCreate
+from app.services import portfolio
+from app.services.columnar import valuation_store
+from app.services.valuations import upsert_valuation
+
+AS_OF = date(2024, 1, 31)
+
+# Every public function in app.services.portfolio must be listed here so that
+# new read paths are checked against the indexes as soon as they are added.
+PORTFOLIO_CALLS = {
+    "get_allocation": [
+        lambda session: portfolio.get_allocation(session, AS_OF, "asset_class"),
+        lambda session: portfolio.get_allocation(session, AS_OF, "asset_class", rollup=True),
+    ],
+    "get_deviation": [
+        lambda session: portfolio.get_deviation(session, AS_OF, "asset_class"),
+        lambda session: portfolio.get_deviation(session, AS_OF, "asset_class", rollup=True),
+    ],
+    "get_allocation_matrix": [
+        lambda session: portfolio.get_allocation_matrix(session, "asset_class", [AS_OF]),
+        lambda session: portfolio.get_allocation_matrix(
+            session, "asset_class", start=date(2024, 1, 1), end=AS_OF, frequency="week", rollup=True
+        ),
+    ],
+    "get_deviation_matrix": [
+        lambda session: portfolio.get_deviation_matrix(session, "asset_class", [AS_OF]),
+        lambda session: portfolio.get_deviation_matrix(session, "asset_class", [AS_OF], rollup=True),
+    ],
+    "get_timeseries": [
+        lambda session: portfolio.get_timeseries(session, date(2024, 1, 1), AS_OF, "month"),
+        lambda session: portfolio.get_timeseries(session, date(2024, 1, 1), AS_OF, "day"),
+        lambda session: portfolio.get_timeseries(session, date(2024, 1, 1), AS_OF, "quarter", metrics=True),
+        lambda session: portfolio.get_timeseries(session, date(2024, 1, 1), AS_OF, "week", breakdown="account"),
+        lambda session: portfolio.get_timeseries(session, date(2024, 1, 1), AS_OF, "year", breakdown="instrument"),
+        lambda session: portfolio.get_timeseries(session, date(2024, 1, 1), AS_OF, "month", breakdown="taxonomy"),
+    ],
+}
+
+
+def _seed(session) -> None:
+    # One row per table so every read path, including the per-period follow-up
+    # queries, actually executes and gets its plan checked.
+    account = Account(name="Main", account_type="brokerage")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    node = TaxonomyNode(name="Equity", taxonomy=Taxonomy(name="asset_class"))
+    session.add_all([account, fund, node])
+    session.flush()
+    session.add(InstrumentClassification(instrument_id=fund.id, taxonomy_node_id=node.id))
+    session.add(
+        Transaction(account_id=account.id, transaction_date=AS_OF, transaction_type="deposit", amount_jpy=100)
+    )
+    session.flush()
+    upsert_valuation(
+        session, ValuationCreate(account_id=account.id, instrument_id=fund.id, valuation_date=AS_OF, value_jpy=100)
+    )
+    session.commit()
+
+
+def _capture_statements(engine, calls, session) -> list[tuple[str, object]]:
+    statements: list[tuple[str, object]] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        for call in calls:
+            call(session)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return statements
+
+
+def test_every_portfolio_query_is_covered() -> None:
+    public = {
+        name
+        for name, value in inspect.getmembers(portfolio, inspect.isfunction)
+        if value.__module__ == portfolio.__name__ and not name.startswith("_")
+    }
+    # Each get_* runs the matching *_reads plan, which the async routes drive too.
+    plans = {name.removeprefix("get_") + "_reads" for name in PORTFOLIO_CALLS}
+    assert public == set(PORTFOLIO_CALLS) | plans
+
+
+@pytest.mark.parametrize("column_store", [False, True])
+@pytest.mark.parametrize("name", sorted(PORTFOLIO_CALLS))
+def test_portfolio_queries_do_not_scan(name, column_store, engine, session) -> None:
+    _seed(session)
+    if column_store:
+        # The store answers from memory but still reads nodes and classifications.
+        valuation_store.load(session)
+    try:
+        statements = _capture_statements(engine, PORTFOLIO_CALLS[name], session)
+    finally:
+        valuation_store.clear()
+    assert statements
+
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+            # Reading back a CTE the statement built itself is not a table scan.
+            ctes = {f"SCAN {row[3].split()[1]}" for row in plan if row[3].startswith("MATERIALIZE ")}
+            scans = [
+                row[3]
+                for row in plan
+                if row[3].startswith("SCAN")
+                and row[3] != "SCAN CONSTANT ROW"
+                and row[3] not in ctes
+                and not row[3].startswith("SCAN (subquery-")
+            ]
+            assert not scans, f"{name} regressed to a table scan: {scans}\n{statement}"
@@ -0,0 +1,129 @@
+from datetime import date
+
+import pytest
+
+from app.core.cache import response_cache
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Transaction
+from app.models.taxonomies import Taxonomy, TaxonomyNode
+
+
+def _setup(client, session) -> dict:
+    account = Account(name="Main", account_type="brokerage")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    taxonomy = Taxonomy(name="asset_class")
+    equity = TaxonomyNode(name="Equity", taxonomy=taxonomy)
+    session.add_all([account, fund, taxonomy, equity])
+    session.commit()
+    client.post("/api/classifications", json={"instrument_id": fund.id, "taxonomy_node_id": equity.id})
+    client.post(
+        "/api/valuations",
+        json={"account_id": account.id, "instrument_id": fund.id, "valuation_date": "2024-01-31", "value_jpy": 100},
+    )
+    return {"account": account.id, "fund": fund.id, "taxonomy": taxonomy.id, "equity": equity.id}
+
+
+def test_portfolio_responses_are_cached_with_etags(client, session) -> None:
+    _setup(client, session)
+    first = client.get("/api/portfolio/allocation", params={"date": "2024-01-31"})
+    etag = first.headers["etag"]
+    assert first.json()[0]["value_jpy"] == 100
+
+    revalidated = client.get(
+        "/api/portfolio/allocation", params={"date": "2024-01-31"}, headers={"If-None-Match": etag}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+
+    stats = client.get("/api/portfolio/cache").json()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_writes_invalidate_only_affected_entries(client, session) -> None:
+    ids = _setup(client, session)
+    client.get("/api/portfolio/allocation", params={"date": "2024-01-31"})
+    deviation = client.get("/api/portfolio/deviation", params={"date": "2024-01-31"})
+    series_params = {"start": "2024-01-01", "end": "2024-01-31", "group_by": "day"}
+    timeseries = client.get("/api/portfolio/timeseries", params=series_params)
+
+    client.post(
+        "/api/valuations",
+        json={"account_id": ids["account"], "instrument_id": ids["fund"], "valuation_date": "2024-02-29", "value_jpy": 50},
+    )
+    assert client.get("/api/portfolio/cache").json()["size"] == 3
+
+    client.post(
+        "/api/target-allocations",
+        json={"taxonomy_id": ids["taxonomy"], "taxonomy_node_id": ids["equity"], "target_weight": 0.5},
+    )
+    assert client.get("/api/portfolio/cache").json()["size"] == 2
+    updated = client.get("/api/portfolio/deviation", params={"date": "2024-01-31"})
+    assert updated.headers["etag"] != deviation.headers["etag"]
+    assert updated.json()[0]["target_weight"] == 0.5
+
+    client.post(
+        "/api/valuations/bulk",
+        json=[{"account_id": ids["account"], "instrument_id": ids["fund"], "valuation_date": "2024-01-15", "value_jpy": 70}],
+    )
+    refreshed = client.get("/api/portfolio/timeseries", params=series_params)
+    assert refreshed.headers["etag"] != timeseries.headers["etag"]
+    assert refreshed.json() == [
+        {"period": "2024-01-15", "total_value_jpy": 70.0},
+        {"period": "2024-01-31", "total_value_jpy": 100.0},
+    ]
+    # Valuations carry forward, so the earlier write also dropped the 2024-01-31 entries.
+    assert client.get("/api/portfolio/cache").json()["size"] == 1
+
+
+def test_fast_json_matches_validated_output(client, session, monkeypatch) -> None:
+    pytest.importorskip("orjson")
+    from app.api import caching
+
+    ids = _setup(client, session)
+    session.add(
+        Transaction(
+            account_id=ids["account"], transaction_date=date(2024, 1, 5), transaction_type="deposit", amount_jpy=10
+        )
+    )
+    session.commit()
+    requests = [
+        ("/api/portfolio/allocation", {"date": "2024-01-31", "rollup": "true"}),
+        ("/api/portfolio/deviation", {"date": "2024-01-31"}),
+        (
+            "/api/portfolio/timeseries",
+            {"start": "2024-01-01", "end": "2024-01-31", "metrics": "true", "breakdown": "instrument"},
+        ),
+    ]
+    validated = [client.get(path, params=params).content for path, params in requests]
+
+    response_cache.clear()
+    monkeypatch.setattr(caching, "FAST_JSON", True)
+    fast = [client.get(path, params=params).content for path, params in requests]
+    assert fast == validated
+
+
+def test_response_computed_across_an_invalidation_is_not_cached(client, session, monkeypatch) -> None:
+    from app.api.routes import portfolio as routes
+
+    ids = _setup(client, session)
+    allocation_reads = routes.allocation_reads
+
+    def racing_write(*args, **kwargs):
+        result = yield from allocation_reads(*args, **kwargs)
+        # A write that commits while the response is being computed.
+        client.post(
+            "/api/valuations",
+            json={
+                "account_id": ids["account"],
+                "instrument_id": ids["fund"],
+                "valuation_date": "2024-01-31",
+                "value_jpy": 300,
+            },
+        )
+        return result
+
+    monkeypatch.setattr(routes, "allocation_reads", racing_write)
+    assert client.get("/api/portfolio/allocation", params={"date": "2024-01-31"}).json()[0]["value_jpy"] == 100
+    monkeypatch.undo()
+    assert client.get("/api/portfolio/allocation", params={"date": "2024-01-31"}).json()[0]["value_jpy"] == 300
@@ -0,0 +1,91 @@
+from datetime import date
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Position, Price, Transaction, Valuation
+from app.models.snapshots import PortfolioSnapshotTotal
+from app.services.ledger import sync_ledger
+from app.services.revaluation import revalue_positions
+
+
+def test_revalue_positions_uses_latest_price_on_or_before_each_date(session) -> None:
+    account = Account(name="Main", account_type="brokerage")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    stock = Instrument(name="Stock", instrument_type="stock")
+    session.add_all([account, fund, stock])
+    session.flush()
+    session.add_all(
+        [
+            Position(account_id=account.id, instrument_id=fund.id, quantity=10),
+            Position(account_id=account.id, instrument_id=stock.id, quantity=2),
+            Price(instrument_id=fund.id, price_date=date(2023, 12, 29), price=100),
+            Price(instrument_id=fund.id, price_date=date(2024, 1, 3), price=110),
+            Price(instrument_id=stock.id, price_date=date(2024, 1, 4), price=50),
+            Price(instrument_id=fund.id, price_date=date(2024, 1, 5), price=120),
+        ]
+    )
+    session.commit()
+
+    result = revalue_positions(session, date(2024, 1, 1), date(2024, 1, 5))
+    session.commit()
+
+    assert result == {"positions": 2, "dates": 3, "upserted": 5}
+    values = {
+        (row.instrument_id, row.valuation_date): row.value_jpy
+        for row in session.query(Valuation).all()
+    }
+    assert values == {
+        (fund.id, date(2024, 1, 3)): 1100,
+        (fund.id, date(2024, 1, 4)): 1100,
+        (stock.id, date(2024, 1, 4)): 100,
+        (fund.id, date(2024, 1, 5)): 1200,
+        (stock.id, date(2024, 1, 5)): 100,
+    }
+    totals = {row.snapshot_date: row.total_value_jpy for row in session.query(PortfolioSnapshotTotal)}
+    assert totals[date(2024, 1, 5)] == pytest.approx(1300)
+
+    session.query(Position).filter(Position.instrument_id == fund.id).update({"quantity": 20})
+    assert revalue_positions(session, date(2024, 1, 5), date(2024, 1, 5))["upserted"] == 2
+    assert session.query(Valuation).count() == 5
+
+
+def test_revalue_positions_uses_ledger_quantity_as_of_each_date(session) -> None:
+    account = Account(name="Main", account_type="brokerage")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    session.add_all([account, fund])
+    session.flush()
+    session.add_all(
+        [
+            Transaction(
+                account_id=account.id,
+                instrument_id=fund.id,
+                transaction_date=date(2024, 1, 3),
+                transaction_type="buy",
+                quantity=10,
+                amount_jpy=1000,
+            ),
+            Transaction(
+                account_id=account.id,
+                instrument_id=fund.id,
+                transaction_date=date(2024, 1, 5),
+                transaction_type="sell",
+                quantity=4,
+                amount_jpy=480,
+            ),
+            Price(instrument_id=fund.id, price_date=date(2023, 6, 30), price=90),
+            Price(instrument_id=fund.id, price_date=date(2023, 12, 29), price=100),
+            Price(instrument_id=fund.id, price_date=date(2024, 1, 4), price=110),
+            Price(instrument_id=fund.id, price_date=date(2024, 1, 5), price=120),
+            Price(instrument_id=fund.id, price_date=date(2024, 1, 8), price=130),
+        ]
+    )
+    session.flush()
+    sync_ledger(session)
+    session.commit()
+
+    assert revalue_positions(session, date(2024, 1, 2), date(2024, 1, 8))["upserted"] == 3
+    values = {row.valuation_date: row.value_jpy for row in session.query(Valuation).all()}
+    # Nothing was held on 2024-01-02; the sale leaves 6 units from 2024-01-05.
+    assert values == {date(2024, 1, 4): 1100, date(2024, 1, 5): 720, date(2024, 1, 8): 780}
@@ -0,0 +1,161 @@
+from datetime import date
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.contributions import ContributionAllocationRule, ContributionPlan
+from app.models.instruments import Instrument
+from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode
+from app.schemas.valuations import ValuationCreate
+from app.services.calculations import forecast_values
+from app.services.valuations import upsert_valuation
+
+
+def test_forecast_scenarios_match_single_forecasts(client) -> None:
+    response = client.post(
+        "/api/simulations/forecast",
+        json={"horizon_months": 24, "annual_return": 0.05, "monthly_contribution": 1000, "include_scenarios": True},
+    )
+    scenarios = {scenario["label"]: scenario["values"] for scenario in response.json()["scenarios"]}
+    assert scenarios["base"] == forecast_values(0, 0.05, 1000, 24)
+    assert scenarios["optimistic"] == forecast_values(0, 0.06, 1000, 24)
+    assert scenarios["pessimistic"] == forecast_values(0, 0.04, 1000, 24)
+
+
+def test_forecast_grid_covers_every_parameter_set(client) -> None:
+    response = client.post(
+        "/api/simulations/forecast/grid",
+        json={
+            "horizon_months": 12,
+            "annual_returns": [0.0, 0.03, 0.07],
+            "monthly_contributions": [100, 200],
+            "start_values": [0, 5000],
+        },
+    )
+    points = response.json()["points"]
+    assert len(points) == 12
+    for point in points:
+        expected = forecast_values(point["start_value"], point["annual_return"], point["monthly_contribution"], 12)
+        assert point["values"] == expected
+        assert point["final_value"] == expected[-1]
+
+
+def test_forecast_grid_rejects_oversized_grids(client) -> None:
+    response = client.post(
+        "/api/simulations/forecast/grid",
+        json={"horizon_months": 12, "annual_returns": [0.01] * 101, "monthly_contributions": [1.0] * 100},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("horizon_months", [-1, 1201])
+def test_forecasts_reject_out_of_range_horizons(client, horizon_months) -> None:
+    forecast = client.post(
+        "/api/simulations/forecast",
+        json={"horizon_months": horizon_months, "annual_return": 0.05, "monthly_contribution": 1000},
+    )
+    grid = client.post(
+        "/api/simulations/forecast/grid",
+        json={"horizon_months": horizon_months, "annual_returns": [0.05], "monthly_contributions": [1000]},
+    )
+    assert (forecast.status_code, grid.status_code) == (422, 422)
+
+
+@pytest.mark.parametrize("horizon_months", [0, 1201, 10**13])
+def test_contribution_plan_rejects_out_of_range_horizons(client, horizon_months) -> None:
+    response = client.post(
+        "/api/simulations/contribution-plan",
+        json={"plan_id": 1, "date": "2024-01-31", "horizon_months": horizon_months},
+    )
+    assert response.status_code == 422
+
+
+def test_forecast_accepts_a_zero_horizon(client) -> None:
+    for mode in ("deterministic", "monte_carlo"):
+        response = client.post(
+            "/api/simulations/forecast",
+            json={"horizon_months": 0, "annual_return": 0.05, "monthly_contribution": 1000, "mode": mode},
+        )
+        assert response.status_code == 200
+
+
+def test_contribution_plan_projection(client, session) -> None:
+    account = Account(name="Main", account_type="brokerage")
+    equity_fund = Instrument(name="Equity Fund", instrument_type="fund")
+    taxonomy = Taxonomy(name="asset_class")
+    equity = TaxonomyNode(name="Equity", taxonomy=taxonomy)
+    cash = TaxonomyNode(name="Cash", taxonomy=taxonomy)
+    plan = ContributionPlan(name="Monthly", start_date=date(2024, 1, 1), monthly_amount=1000)
+    session.add_all([account, equity_fund, taxonomy, equity, cash, plan])
+    session.flush()
+    session.add_all(
+        [
+            InstrumentClassification(instrument_id=equity_fund.id, taxonomy_node_id=equity.id),
+            TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=equity.id, target_weight=0.5),
+            TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=cash.id, target_weight=0.5),
+            ContributionAllocationRule(plan_id=plan.id, taxonomy_node_id=equity.id, fixed_amount=100),
+        ]
+    )
+    upsert_valuation(
+        session,
+        ValuationCreate(account_id=account.id, instrument_id=equity_fund.id, valuation_date=date(2024, 1, 31), value_jpy=5000),
+    )
+    session.commit()
+
+    response = client.post(
+        "/api/simulations/contribution-plan",
+        json={"plan_id": plan.id, "date": "2024-01-31", "horizon_months": 12},
+    )
+    body = response.json()
+    assert response.status_code == 200
+    assert body["contributions"][0] == [100.0, 900.0]
+    nodes = {node["taxonomy_node_name"]: node for node in body["nodes"]}
+    assert nodes["Equity"]["current_value_jpy"] == 5000
+    assert nodes["Cash"]["projected_value_jpy"] + nodes["Equity"]["projected_value_jpy"] == 17000
+    assert len(body["values"]) == 13
+
+    missing = client.post(
+        "/api/simulations/contribution-plan",
+        json={"plan_id": plan.id + 1, "date": "2024-01-31", "horizon_months": 12},
+    )
+    assert missing.status_code == 404
+
+
+def test_contribution_plan_waits_for_its_start_and_skips_inactive_plans(client, session) -> None:
+    account = Account(name="Main", account_type="brokerage")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    taxonomy = Taxonomy(name="asset_class")
+    equity = TaxonomyNode(name="Equity", taxonomy=taxonomy)
+    later = ContributionPlan(name="Later", start_date=date(2024, 4, 1), monthly_amount=1000)
+    paused = ContributionPlan(name="Paused", start_date=date(2024, 1, 1), monthly_amount=1000, is_active=0)
+    session.add_all([account, fund, taxonomy, equity, later, paused])
+    session.flush()
+    session.add_all(
+        [
+            InstrumentClassification(instrument_id=fund.id, taxonomy_node_id=equity.id),
+            TargetAllocation(taxonomy_id=taxonomy.id, taxonomy_node_id=equity.id, target_weight=1.0),
+        ]
+    )
+    upsert_valuation(
+        session,
+        ValuationCreate(account_id=account.id, instrument_id=fund.id, valuation_date=date(2024, 1, 31), value_jpy=5000),
+    )
+    session.commit()
+
+    def project(plan_id: int) -> dict:
+        response = client.post(
+            "/api/simulations/contribution-plan",
+            json={"plan_id": plan_id, "date": "2024-01-31", "horizon_months": 6, "annual_return": 0.12},
+        )
+        assert response.status_code == 200
+        return response.json()
+
+    # February and March pass before the April start; growth still applies.
+    body = project(later.id)
+    assert body["contributions"] == [[0.0], [0.0], [1000.0], [1000.0], [1000.0], [1000.0]]
+    assert body["values"][:3] == [[5000.0], [5050.0], [5100.5]]
+    assert body["values"][3] == [pytest.approx(5100.5 * 1.01 + 1000)]
+
+    body = project(paused.id)
+    assert body["contributions"] == [[0.0]] * 6
+    assert body["values"][-1] == [pytest.approx(round(5000 * 1.01**6, 2))]
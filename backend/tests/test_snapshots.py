@@ -0,0 +1,143 @@
+from datetime import date
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.snapshots import PortfolioSnapshot, PortfolioSnapshotTotal
+from app.models.taxonomies import InstrumentClassification, Taxonomy, TaxonomyNode
+from app.services.portfolio import get_allocation, get_timeseries
+from app.services.snapshots import rebuild_snapshots
+from app.services.valuations import ValuationBulkLoader
+
+
+@pytest.fixture
+def portfolio(session) -> dict:
+    account = Account(name="Main", account_type="brokerage")
+    equity_fund = Instrument(name="Equity Fund", instrument_type="fund")
+    bond_fund = Instrument(name="Bond Fund", instrument_type="fund")
+    taxonomy = Taxonomy(name="asset_class")
+    equity = TaxonomyNode(name="Equity", taxonomy=taxonomy)
+    bonds = TaxonomyNode(name="Bonds", taxonomy=taxonomy)
+    session.add_all([account, equity_fund, bond_fund, taxonomy, equity, bonds])
+    session.flush()
+    session.add_all(
+        [
+            InstrumentClassification(instrument_id=equity_fund.id, taxonomy_node_id=equity.id),
+            InstrumentClassification(instrument_id=bond_fund.id, taxonomy_node_id=bonds.id),
+        ]
+    )
+    session.commit()
+    return {"account": account.id, "equity_fund": equity_fund.id, "bond_fund": bond_fund.id}
+
+
+def _load(session, rows) -> None:
+    loader = ValuationBulkLoader(session)
+    loader.load(rows)
+    loader.result()
+    session.commit()
+
+
+def _snapshot_state(session) -> tuple[list, list]:
+    nodes = session.query(PortfolioSnapshot).order_by(
+        PortfolioSnapshot.snapshot_date, PortfolioSnapshot.taxonomy_node_id
+    )
+    totals = session.query(PortfolioSnapshotTotal).order_by(PortfolioSnapshotTotal.snapshot_date)
+    return (
+        [(row.snapshot_date, row.taxonomy_node_id, row.value_jpy) for row in nodes],
+        [(row.snapshot_date, row.total_value_jpy) for row in totals],
+    )
+
+
+def test_bulk_load_maintains_snapshots(session, portfolio) -> None:
+    account = portfolio["account"]
+    _load(
+        session,
+        [
+            {"account_id": account, "instrument_id": portfolio["equity_fund"], "valuation_date": "2024-01-31", "value_jpy": 600},
+            {"account_id": account, "instrument_id": portfolio["bond_fund"], "valuation_date": "2024-01-31", "value_jpy": 400},
+            {"account_id": account, "valuation_date": "2024-01-31", "value_jpy": 100},
+            {"account_id": account, "instrument_id": portfolio["equity_fund"], "valuation_date": "2024-02-29", "value_jpy": 700},
+        ],
+    )
+    _load(
+        session,
+        [{"account_id": account, "instrument_id": portfolio["equity_fund"], "valuation_date": "2024-01-31", "value_jpy": 800}],
+    )
+
+    allocation = {item["taxonomy_node_name"]: item for item in get_allocation(session, date(2024, 1, 31), "asset_class")}
+    assert allocation["Equity"]["value_jpy"] == 800
+    assert allocation["Equity"]["weight"] == pytest.approx(2 / 3)
+    assert get_timeseries(session, date(2024, 1, 1), date(2024, 2, 29), "month") == [
+        {"period": "2024-01", "total_value_jpy": 1300.0},
+        # Bonds and cash were not revalued in February and carry forward.
+        {"period": "2024-02", "total_value_jpy": 1200.0},
+    ]
+
+    incremental = _snapshot_state(session)
+    rebuild_snapshots(session)
+    assert _snapshot_state(session) == incremental
+
+
+def test_writes_in_any_order_match_a_rebuild(session, portfolio) -> None:
+    account = portfolio["account"]
+    other = Account(name="Other", account_type="bank")
+    session.add(other)
+    session.commit()
+    writes = [
+        (account, portfolio["equity_fund"], "2024-03-31", 300),
+        (account, portfolio["bond_fund"], "2024-02-29", 200),
+        # Backdated to before every snapshot, between two, and onto an existing date.
+        (account, portfolio["equity_fund"], "2024-01-15", 100),
+        (other.id, None, "2024-02-10", 50),
+        (account, portfolio["equity_fund"], "2024-02-29", 250),
+        (account, portfolio["bond_fund"], "2024-02-29", 0),
+        (other.id, portfolio["bond_fund"], "2024-03-31", 70),
+        (account, portfolio["equity_fund"], "2024-01-15", 120),
+    ]
+    for account_id, instrument_id, valuation_date, value in writes:
+        _load(
+            session,
+            [{"account_id": account_id, "instrument_id": instrument_id, "valuation_date": valuation_date, "value_jpy": value}],
+        )
+        incremental = _snapshot_state(session)
+        rebuild_snapshots(session)
+        assert _snapshot_state(session) == incremental
+
+
+def test_multi_batch_loads_refresh_snapshots_once_to_match_a_rebuild(session, portfolio) -> None:
+    account = portfolio["account"]
+    _load(
+        session,
+        [
+            {"account_id": account, "instrument_id": portfolio["equity_fund"], "valuation_date": "2024-01-31", "value_jpy": 600},
+            {"account_id": account, "instrument_id": portfolio["bond_fund"], "valuation_date": "2024-03-31", "value_jpy": 400},
+        ],
+    )
+    loader = ValuationBulkLoader(session, batch_size=2)
+    for batch in (
+        [
+            {"account_id": account, "instrument_id": portfolio["bond_fund"], "valuation_date": "2024-01-15", "value_jpy": 300},
+            {"account_id": account, "valuation_date": "2024-02-29", "value_jpy": 50},
+        ],
+        [
+            {"account_id": account, "instrument_id": portfolio["equity_fund"], "valuation_date": "2024-03-31", "value_jpy": 650},
+            {"account_id": account, "valuation_date": "not a date", "value_jpy": 1},
+            {"account_id": account, "instrument_id": portfolio["equity_fund"], "valuation_date": "2023-12-31", "value_jpy": 500},
+        ],
+    ):
+        loader.load(batch)
+    result = loader.result()
+    session.commit()
+    assert (result["upserted"], [error["row"] for error in result["errors"]]) == (4, [3])
+
+    assert _snapshot_state(session)[1] == [
+        (date(2023, 12, 31), 500.0),
+        (date(2024, 1, 15), 800.0),
+        (date(2024, 1, 31), 900.0),
+        (date(2024, 2, 29), 950.0),
+        (date(2024, 3, 31), 1100.0),
+    ]
+    incremental = _snapshot_state(session)
+    rebuild_snapshots(session)
+    assert _snapshot_state(session) == incremental
@@ -0,0 +1,77 @@
+from datetime import date
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.taxonomies import InstrumentClassification, TargetAllocation, Taxonomy, TaxonomyNode, TaxonomyNodePath
+from app.schemas.valuations import ValuationCreate
+from app.services.portfolio import get_allocation, get_deviation
+from app.services.taxonomies import rebuild_taxonomy_paths
+from app.services.valuations import upsert_valuation
+
+
+def _paths(session) -> set[tuple[int, int, int]]:
+    return {(path.ancestor_id, path.descendant_id, path.depth) for path in session.query(TaxonomyNodePath)}
+
+
+@pytest.fixture
+def tree(session) -> dict:
+    taxonomy = Taxonomy(name="asset_class")
+    equity = TaxonomyNode(name="Equity", taxonomy=taxonomy)
+    domestic = TaxonomyNode(name="Domestic", taxonomy=taxonomy)
+    foreign = TaxonomyNode(name="Foreign", taxonomy=taxonomy)
+    large = TaxonomyNode(name="Large", taxonomy=taxonomy)
+    bonds = TaxonomyNode(name="Bonds", taxonomy=taxonomy)
+    equity.children.extend([domestic, foreign])
+    domestic.children.append(large)
+    session.add_all([taxonomy, equity, domestic, foreign, large, bonds])
+    session.commit()
+    return {node.name: node for node in (equity, domestic, foreign, large, bonds)} | {"taxonomy": taxonomy}
+
+
+def test_closure_table_follows_node_changes(session, tree) -> None:
+    equity, domestic, large, bonds = (tree[name] for name in ("Equity", "Domestic", "Large", "Bonds"))
+    assert (equity.id, large.id, 2) in _paths(session)
+
+    domestic.parent_id = bonds.id
+    session.commit()
+    paths = _paths(session)
+    assert (equity.id, large.id, 2) not in paths
+    assert {(bonds.id, domestic.id, 1), (bonds.id, large.id, 2)} <= paths
+
+    incremental = _paths(session)
+    rebuild_taxonomy_paths(session)
+    assert _paths(session) == incremental
+
+
+def test_rollup_allocation_and_deviation_report_every_level(session, tree) -> None:
+    account = Account(name="Main", account_type="brokerage")
+    funds = {name: Instrument(name=f"{name} Fund", instrument_type="fund") for name in ("Large", "Foreign", "Bonds")}
+    session.add(account)
+    session.add_all(funds.values())
+    session.flush()
+    for name, fund in funds.items():
+        session.add(InstrumentClassification(instrument_id=fund.id, taxonomy_node_id=tree[name].id))
+    session.add(TargetAllocation(taxonomy_id=tree["taxonomy"].id, taxonomy_node_id=tree["Equity"].id, target_weight=0.6))
+    for name, value in (("Large", 300), ("Foreign", 300), ("Bonds", 400)):
+        upsert_valuation(
+            session,
+            ValuationCreate(account_id=account.id, instrument_id=funds[name].id, valuation_date=date(2024, 1, 31), value_jpy=value),
+        )
+    session.commit()
+
+    allocation = {item["taxonomy_node_name"]: item for item in get_allocation(session, date(2024, 1, 31), "asset_class", rollup=True)}
+    assert {name: item["value_jpy"] for name, item in allocation.items()} == {
+        "Equity": 600,
+        "Domestic": 300,
+        "Foreign": 300,
+        "Large": 300,
+        "Bonds": 400,
+    }
+    assert allocation["Equity"]["weight"] == pytest.approx(0.6)
+    assert allocation["Domestic"]["parent_id"] == tree["Equity"].id
+
+    deviation = {item["taxonomy_node_name"]: item for item in get_deviation(session, date(2024, 1, 31), "asset_class", rollup=True)}
+    assert deviation["Equity"]["diff_weight_pp"] == pytest.approx(0.0)
+    assert deviation["Bonds"]["diff_value_jpy"] == pytest.approx(400)
@@ -0,0 +1,108 @@
+from datetime import date
+
+import pytest
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Transaction
+from app.models.taxonomies import InstrumentClassification, Taxonomy, TaxonomyNode
+
+
+@pytest.fixture
+def ids(client, session) -> dict:
+    main = Account(name="Main", account_type="brokerage")
+    bank = Account(name="Bank", account_type="bank")
+    fund = Instrument(name="Fund", instrument_type="fund")
+    equity = TaxonomyNode(name="Equity", taxonomy=Taxonomy(name="asset_class"))
+    session.add_all([main, bank, fund, equity])
+    session.flush()
+    session.add(InstrumentClassification(instrument_id=fund.id, taxonomy_node_id=equity.id))
+    session.add(
+        Transaction(account_id=bank.id, transaction_date=date(2024, 2, 10), transaction_type="deposit", amount_jpy=100)
+    )
+    session.commit()
+    rows = [
+        (main.id, fund.id, "2024-01-15", 50),
+        (main.id, fund.id, "2024-01-31", 100),
+        (main.id, fund.id, "2024-02-29", 120),
+        (bank.id, None, "2024-02-29", 100),
+        (main.id, fund.id, "2024-04-30", 198),
+        (bank.id, None, "2024-04-30", 100),
+    ]
+    client.post(
+        "/api/valuations/bulk",
+        json=[
+            {"account_id": account, "instrument_id": instrument, "valuation_date": day, "value_jpy": value}
+            for account, instrument, day, value in rows
+        ],
+    )
+    return {"main": main.id, "bank": bank.id, "fund": fund.id, "equity": equity.id}
+
+
+def _series(client, **params) -> list[dict]:
+    return client.get("/api/portfolio/timeseries", params={"start": "2024-01-01", "end": "2024-12-31", **params}).json()
+
+
+def test_periods_report_closing_values(client, ids) -> None:
+    assert _series(client, group_by="quarter") == [
+        {"period": "2024-Q1", "total_value_jpy": 220.0},
+        {"period": "2024-Q2", "total_value_jpy": 298.0},
+    ]
+    assert _series(client, group_by="year") == [{"period": "2024", "total_value_jpy": 298.0}]
+    assert [point["period"] for point in _series(client, group_by="week")] == [
+        "2024-W03",
+        "2024-W05",
+        "2024-W09",
+        "2024-W18",
+    ]
+
+
+def test_metrics_are_net_of_deposits(client, ids) -> None:
+    points = _series(client, metrics=True, window=2)
+    assert [point["period"] for point in points] == ["2024-01", "2024-02", "2024-04"]
+    assert [point["net_flow_jpy"] for point in points] == [0.0, 100.0, 0.0]
+    assert "period_return" not in points[0]
+    assert points[1]["period_return"] == pytest.approx(0.2)
+    assert points[2]["period_return"] == pytest.approx(298 / 220 - 1)
+    assert points[2]["cumulative_return"] == pytest.approx(1.2 * 298 / 220 - 1)
+    assert points[2]["drawdown"] == 0.0
+    assert "volatility" in points[2]
+
+
+def test_breakdowns_split_the_closing_value(client, ids) -> None:
+    by_account = _series(client, group_by="quarter", breakdown="account")
+    assert by_account[0]["breakdown"] == [
+        {"key_id": ids["main"], "name": "Main", "value_jpy": 120.0},
+        {"key_id": ids["bank"], "name": "Bank", "value_jpy": 100.0},
+    ]
+    by_instrument = _series(client, group_by="year", breakdown="instrument")
+    assert by_instrument[0]["breakdown"] == [
+        {"key_id": ids["fund"], "name": "Fund", "value_jpy": 198.0},
+        {"name": "Unassigned", "value_jpy": 100.0},
+    ]
+    by_node = _series(client, group_by="month", breakdown="taxonomy")
+    assert [point["breakdown"] for point in by_node] == [
+        [{"key_id": ids["equity"], "name": "Equity", "value_jpy": value}] for value in (100.0, 120.0, 198.0)
+    ]
+
+
+def test_max_points_downsamples_after_aggregation(client, ids) -> None:
+    full = _series(client, group_by="day", metrics=True)
+    sampled = _series(client, group_by="day", metrics=True, max_points=3)
+    assert [point["period"] for point in full] == ["2024-01-15", "2024-01-31", "2024-02-29", "2024-04-30"]
+    assert len(sampled) == 3
+    assert sampled[0] == full[0] and sampled[-1] == full[-1]
+    assert sampled[1] in full[1:3]
+
+
+def test_reclassification_refreshes_taxonomy_breakdown(client, session, ids) -> None:
+    bonds = TaxonomyNode(name="Bonds", taxonomy_id=session.get(TaxonomyNode, ids["equity"]).taxonomy_id)
+    session.add(bonds)
+    session.commit()
+    assert _series(client, group_by="year", breakdown="taxonomy")[0]["breakdown"][0]["name"] == "Equity"
+
+    client.post("/api/classifications", json={"instrument_id": ids["fund"], "taxonomy_node_id": bonds.id})
+    assert _series(client, group_by="year", breakdown="taxonomy")[0]["breakdown"] == [
+        {"key_id": ids["equity"], "name": "Equity", "value_jpy": 198.0},
+        {"key_id": bonds.id, "name": "Bonds", "value_jpy": 198.0},
+    ]
@@ -0,0 +1,133 @@
+from datetime import date
+
+from app.models.accounts import Account
+from app.models.instruments import Instrument
+from app.models.portfolio import Valuation
+from app.services.valuations import ValuationBulkLoader
+
+
+def _seed_account_and_instrument(session) -> tuple[int, int]:
+    account = Account(name="Main", account_type="brokerage")
+    instrument = Instrument(name="Fund", instrument_type="fund")
+    session.add_all([account, instrument])
+    session.commit()
+    return account.id, instrument.id
+
+
+def test_bulk_loader_upserts_on_account_instrument_date(session) -> None:
+    account_id, instrument_id = _seed_account_and_instrument(session)
+    loader = ValuationBulkLoader(session, batch_size=2)
+    loader.load(
+        [
+            {"account_id": account_id, "instrument_id": instrument_id, "valuation_date": "2024-01-31", "value_jpy": 100},
+            {"account_id": account_id, "valuation_date": "2024-01-31", "value_jpy": 50},
+            {"account_id": account_id, "instrument_id": instrument_id, "valuation_date": "2024-01-31", "value_jpy": 120},
+            {"account_id": account_id, "valuation_date": "2024-01-31", "value_jpy": 70},
+        ]
+    )
+    result = loader.result()
+    session.commit()
+
+    assert result == {"received": 4, "upserted": 4, "errors": []}
+    rows = session.query(Valuation).order_by(Valuation.id).all()
+    assert [(row.instrument_id, row.value_jpy) for row in rows] == [(instrument_id, 120), (None, 70)]
+
+
+def test_bulk_loader_reports_invalid_rows_without_aborting(session) -> None:
+    account_id, _ = _seed_account_and_instrument(session)
+    loader = ValuationBulkLoader(session)
+    loader.load(
+        [
+            {"account_id": account_id, "valuation_date": "2024-01-31", "value_jpy": 1},
+            {"account_id": account_id, "valuation_date": "not-a-date", "value_jpy": 1},
+            "garbage",
+            {"account_id": account_id, "valuation_date": "2024-02-29", "value_jpy": 2},
+        ]
+    )
+    result = loader.result()
+
+    assert result["received"] == 4
+    assert result["upserted"] == 2
+    assert [error["row"] for error in result["errors"]] == [1, 2]
+    assert result["errors"][0]["errors"][0].startswith("valuation_date:")
+    assert result["errors"][1]["errors"] == ["row: expected an object"]
+
+
+def test_bulk_endpoint_accepts_ndjson_and_csv(client, session) -> None:
+    account_id, instrument_id = _seed_account_and_instrument(session)
+    ndjson = "\n".join(
+        [
+            f'{{"account_id": {account_id}, "instrument_id": {instrument_id}, "valuation_date": "2024-03-01", "value_jpy": 10}}',
+            "{not json",
+        ]
+    )
+    response = client.post(
+        "/api/valuations/bulk", content=ndjson, headers={"content-type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.json()["upserted"] == 1
+    assert response.json()["errors"][0]["row"] == 1
+
+    csv_body = (
+        "account_id,instrument_id,valuation_date,value_jpy\n"
+        f"{account_id},{instrument_id},2024-03-01,15\n"
+        f"{account_id},,2024-03-01,5\n"
+    )
+    response = client.post("/api/valuations/bulk", content=csv_body, headers={"content-type": "text/csv"})
+    assert response.json() == {"received": 2, "upserted": 2, "errors": []}
+
+    session.expire_all()
+    values = {row.instrument_id: row.value_jpy for row in session.query(Valuation).all()}
+    assert values == {instrument_id: 15, None: 5}
+    assert date(2024, 3, 1) in {row.valuation_date for row in session.query(Valuation).all()}
+
+
+def _in_chunks(body: str, size: int = 3):
+    data = body.encode()
+    return (data[start : start + size] for start in range(0, len(data), size))
+
+
+def test_bulk_endpoint_streams_json_arrays_and_quoted_csv_newlines(client, session) -> None:
+    account_id, instrument_id = _seed_account_and_instrument(session)
+    body = (
+        f'[{{"account_id": {account_id}, "instrument_id": {instrument_id}, "valuation_date": "2024-04-30", "value_jpy": 1.25e2}},'
+        f' {{"account_id": {account_id}, "valuation_date": "2024-04-30", "value_jpy": 40}}, 7]'
+    )
+    response = client.post(
+        "/api/valuations/bulk", content=_in_chunks(body), headers={"content-type": "application/json"}
+    )
+    assert response.json()["upserted"] == 2
+    assert response.json()["errors"] == [{"row": 2, "errors": ["row: expected an object"]}]
+
+    csv_body = (
+        "account_id,instrument_id,note,valuation_date,value_jpy\r\n"
+        f'{account_id},{instrument_id},"first line\r\nsecond, ""quoted"" line",2024-05-31,130\r\n'
+        f"{account_id},,,2024-05-31,45\r\n"
+    )
+    response = client.post("/api/valuations/bulk", content=_in_chunks(csv_body), headers={"content-type": "text/csv"})
+    assert response.json() == {"received": 2, "upserted": 2, "errors": []}
+
+    session.expire_all()
+    values = {(row.valuation_date, row.instrument_id): row.value_jpy for row in session.query(Valuation)}
+    assert values == {
+        (date(2024, 4, 30), instrument_id): 125,
+        (date(2024, 4, 30), None): 40,
+        (date(2024, 5, 31), instrument_id): 130,
+        (date(2024, 5, 31), None): 45,
+    }
+
+
+def test_bulk_endpoint_rejects_malformed_json(client, session) -> None:
+    account_id, _ = _seed_account_and_instrument(session)
+    row = f'{{"account_id": {account_id}, "valuation_date": "2024-04-30", "value_jpy": 40}}'
+    for body, detail in [
+        ('{"value_jpy": 1}', "JSON body must be an array"),
+        (f"[{row}", "Invalid JSON body: Expecting ']'"),
+        (f"[{row} {row}]", "Invalid JSON body: Expecting ',' delimiter"),
+        (f"[{row}] []", "Invalid JSON body: Extra data"),
+    ]:
+        response = client.post("/api/valuations/bulk", content=body, headers={"content-type": "application/json"})
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith(detail)
+    assert session.query(Valuation).count() == 0
+    assert client.post("/api/valuations/bulk", content=b"").json() == {"received": 0, "upserted": 0, "errors": []}